@@ -1,67 +1,87 @@
-import re
-import pandas as pd
-from flask import Flask, request, abort
+from flask import Flask, request, abort, jsonify
 from linebot import LineBotApi, WebhookHandler
 from linebot.models import PostbackEvent, TextSendMessage, MessageEvent, TextMessage
 from linebot.models import *
 import os
+import time
+import hmac
+import socket
+import threading
 import requests
-from groq import Groq
-from my_commands.lottery_gpt import lottery_gpt
-from my_commands.gold_gpt import gold_gpt
-from my_commands.platinum_gpt import platinum_gpt
-from my_commands.money_gpt import money_gpt
-from my_commands.one04_gpt import one04_gpt
-from my_commands.partjob_gpt import partjob_gpt
-from my_commands.crypto_coin_gpt import crypto_gpt
 from linebot.exceptions import LineBotApiError, InvalidSignatureError
-from my_commands.stock.stock_gpt import stock_gpt
-from my_commands.girlfriend_gpt import girlfriend_gpt
+from my_commands.stock.symbol_index import get_symbol_index
+from my_commands.command_router import build_router
+from my_commands.event_queue import EventQueue
+from my_commands.conversation_store import create_conversation_store
+from my_commands.history_budget import RollingSummarizer
+from my_commands.llm_gateway import get_reply
+from my_commands.http_client import http
+from my_commands.rate_limiter import groq_limiter
+from my_commands.single_flight import flights
+from my_commands.prefetch import Prefetcher
+from my_commands.lazy_loader import LazyCommand, lazy_commands, warm_up, import_report, process_uptime
 
 app = Flask(__name__)
 
-# 管理每個聊天室的角色模式（獨立狀態）
-chat_roles = {}
-
 # SET BASE URL
 base_url = os.getenv("BASE_URL")
 # Channel Access Token
 line_bot_api = LineBotApi(os.getenv('CHANNEL_ACCESS_TOKEN'))
 # Channel Secret
 handler = WebhookHandler(os.getenv('CHANNEL_SECRET'))
-# 初始化 Groq API client
-groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
 
-# 初始化對話歷史
-conversation_history = {}
-# 設定最大對話記憶長度
+# 設定最大對話記憶長度（實際送出的內容由 token 預算決定，超出的部分折疊成摘要）
 MAX_HISTORY_LEN = 10
-
-# 讀取 CSV 檔案，將其轉換為 DataFrame
-stock_data_df = pd.read_csv('name_df.csv')
-
-# 根據股號查找對應的股名
-def get_stock_name(stock_id):
-    result = stock_data_df[stock_data_df['股號'] == int(stock_id)]
-    if not result.empty:
-        return result.iloc[0]['股名']
-    return None
-
-# 建立 GPT 模型
-def get_reply(messages):
-    print ("* app.py get_reply")
-    try:
-        response = groq_client.chat.completions.create(
-            model="llama3-8b-8192",
-            messages=messages,
-            max_tokens=2000,
-            temperature=1.2
-        )
-        reply = response.choices[0].message.content
-        return reply
-    except Exception as groq_err:
-        reply = f"GROQ API 發生錯誤: {groq_err.message}"
-        return reply
+# 附加在最新使用者訊息後的提示（只在送出時加上，不寫入紀錄）
+USER_SUFFIX = ", 請以繁體中文回答我問題"
+
+# 各聊天室的對話紀錄與角色模式（獨立狀態），CONVERSATION_BACKEND=sqlite 時多個 worker 共用
+conversations = create_conversation_store(max_messages=MAX_HISTORY_LEN * 2)
+# 依 token 預算挑選對話紀錄，較舊的對話於背景折疊成摘要
+summarizer = RollingSummarizer(conversations)
+# 定期清除閒置聊天室的間隔（秒）
+EVICT_INTERVAL = int(os.getenv("CONVERSATION_EVICT_INTERVAL", 10 * 60))
+
+# 非同步 webhook 模式：/callback 驗證簽章後立即回應，事件交由背景工作池處理
+ASYNC_WEBHOOK = os.getenv("ASYNC_WEBHOOK", "0") == "1"
+event_queue = EventQueue(
+    max_workers=int(os.getenv("WEBHOOK_WORKERS", 4)),
+    max_pending=int(os.getenv("WEBHOOK_MAX_PENDING", 64)),
+) if ASYNC_WEBHOOK else None
+# reply token 的有效時間約一分鐘，超過此秒數就改用 push 傳送
+REPLY_TOKEN_TTL = int(os.getenv("REPLY_TOKEN_TTL", 50))
+# 載入動畫只是提示，於背景送出且不等待結果；佇列滿時直接略過
+loading_queue = EventQueue(max_workers=2, max_pending=16)
+LOADING_TIMEOUT = (2, 3)
+
+# 股號/股名索引，啟動時建立一次
+symbol_index = get_symbol_index()
+
+# 指令路由與對應的處理函數（"模組:函數"，第一次使用時才載入模組與 pandas、yfinance 等相依套件）
+router = build_router(name_lookup=symbol_index.get_code)
+COMMANDS = lazy_commands({
+    "lottery": "my_commands.lottery_gpt:lottery_gpt",
+    "stock": "my_commands.stock.stock_gpt:stock_gpt",
+    "compare": "my_commands.stock.stock_compare:stock_compare",
+    "gold": "my_commands.gold_gpt:gold_gpt",
+    "platinum": "my_commands.platinum_gpt:platinum_gpt",
+    "money": "my_commands.money_gpt:money_gpt",
+    "one04": "my_commands.one04_gpt:one04_gpt",
+    "partjob": "my_commands.partjob_gpt:partjob_gpt",
+    "crypto": "my_commands.crypto_coin_gpt:crypto_gpt",
+})
+girlfriend_gpt = LazyCommand("my_commands.girlfriend_gpt:girlfriend_gpt")
+
+# 熱門指令在背景依市場時段預先計算，查詢時直接回覆；其他指令查詢次數夠多時也會自動加入
+HOT_QUERIES = ["大盤", "美盤", "金價", "美金", "日幣", "比特幣"]
+prefetcher = Prefetcher(COMMANDS)
+PREFETCH = os.getenv("PREFETCH", "1") == "1"
+if PREFETCH:
+    for text in HOT_QUERIES:
+        prefetcher.register(router.route(text))
+# 伺服器開始接受請求後，於背景預先載入所有指令模組（WARMUP=0 時改為第一次使用才載入），完成後再啟動預先計算
+WARMUP = os.getenv("WARMUP", "1") == "1"
+WARMUP_DELAY = float(os.getenv("WARMUP_DELAY", 5))
 
 # 要檢查 LINE Webhook URL 的函數
 def check_line_webhook():
@@ -69,7 +89,7 @@ def check_line_webhook():
     headers = {
         "Authorization": f"Bearer {os.getenv('CHANNEL_ACCESS_TOKEN')}"
     }
-    response = requests.get(url, headers=headers)
+    response = http.get(url, headers=headers)
     if response.status_code == 200:
         current_webhook = response.json().get("endpoint", "無法取得 Webhook URL")
         print(f"當前 Webhook URL: {current_webhook}")
@@ -91,7 +111,7 @@ def start_loading_animation(chat_id, loading_seconds=5):
     }
 
     try:
-        response = requests.post(url, headers=headers, json=data)
+        response = http.post(url, headers=headers, json=data, timeout=LOADING_TIMEOUT)
         if response.status_code == 200:
             return response.status_code, response.json()  # 回傳JSON格式
         else:
@@ -101,6 +121,11 @@ def start_loading_animation(chat_id, loading_seconds=5):
         print(f"Exception during API request: {e}")
         return None, str(e)
 
+
+def start_loading_animation_async(chat_id, loading_seconds=5):
+    """在背景顯示載入動畫，不阻塞訊息處理"""
+    loading_queue.submit(start_loading_animation, chat_id, loading_seconds)
+
 # 更新 LINE Webhook URL 的函數
 def update_line_webhook():
     new_webhook_url = base_url + "/callback"
@@ -116,7 +141,7 @@ def update_line_webhook():
             "endpoint": new_webhook_url
         }
 
-        response = requests.put(url, headers=headers, json=payload)
+        response = http.put(url, headers=headers, json=payload)
         if response.status_code == 200:
             print(f"Webhook URL 更新成功: {new_webhook_url}")
         else:
@@ -125,12 +150,44 @@ def update_line_webhook():
         print("當前的 Webhook URL 已是最新，無需更新。")
 
 
+def wait_until_listening(port, timeout=30):
+    """等到本機 port 可以連線（伺服器已開始接受請求），逾時回傳 False"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def sync_webhook_in_background(port):
+    """伺服器開始接受請求後，於背景檢查並更新 Webhook URL（LINE 驗證 Webhook 時伺服器已可回應）"""
+    def run():
+        if not wait_until_listening(port):
+            print("伺服器尚未開始接受請求，仍嘗試更新 Webhook URL")
+        try:
+            update_line_webhook()
+        except Exception as e:
+            print(f"更新 Webhook URL 失敗: {e}")
+
+    threading.Thread(target=run, name="webhook-sync", daemon=True).start()
+
+
 # 監聽所有來自 /callback 的 Post Request
 @app.route("/callback", methods=['POST'])
 def callback():
     signature = request.headers['X-Line-Signature']
     body = request.get_data(as_text=True)
     app.logger.info("Request body: " + body)
+    if event_queue is not None:
+        # 先驗證簽章，通過後交給背景工作池，立即回應 LINE 避免逾時重送
+        if not handler.parser.signature_validator.validate(body, signature):
+            abort(400)
+        if event_queue.submit(handler.handle, body, signature):
+            return 'OK'
+        print("背景工作池已滿，改為同步處理")
     try:
         handler.handle(body, signature)
     except InvalidSignatureError:
@@ -148,88 +205,61 @@ def get_chat_id(event):
     else:
         return None
 
+# 回覆訊息：reply token 過期時改用 push 傳送
+def send_reply(event, chat_id, reply_text):
+    message = TextSendMessage(reply_text)
+    age = time.time() - event.timestamp / 1000
+    if age < REPLY_TOKEN_TTL:
+        try:
+            line_bot_api.reply_message(event.reply_token, message)
+            return
+        except LineBotApiError as e:
+            print(f"LINE 回覆失敗，改用 push: {e}")
+    if chat_id is None:
+        return
+    try:
+        line_bot_api.push_message(chat_id, message)
+    except LineBotApiError as e:
+        print(f"LINE 推播失敗: {e}")
+
 # 處理訊息
 @handler.add(MessageEvent, message=TextMessage)
 def handle_message(event):
-    global conversation_history
     chat_id = get_chat_id(event)  # 獲取聊天室 ID
     user_message = event.message.text
 
-    # 初始化使用者的對話歷史
-    if chat_id not in conversation_history:
-        conversation_history[chat_id] = []
-
-    # 初始化該聊天室的角色模式為 "base"（預設模式）
-    if chat_id not in chat_roles:
-        chat_roles[chat_id] = 'base'
+    # 將訊息加入對話歷史（每輪只記錄一次）
+    summarizer.evicted(chat_id, conversations.append(chat_id, "user", user_message))
 
-    # 將訊息加入對話歷史
-    conversation_history[chat_id].append({"role": "user", "content": user_message + ", 請以繁體中文回答我問題"})
+    # 解析指令
+    route = router.route(user_message)
 
-    # 台股代碼邏輯：4-5個數字，且可選擇性有一個英文字母
-    stock_code = re.search(r'\b\d{4,5}[A-Za-z]?\b', user_message)
-    # 美股代碼邏輯：1-5個字母
-    stock_symbol = re.search(r'\b[A-Za-z]{1,5}\b', user_message)
+    # 已預先計算的結果直接回覆
+    cached = None
+    if route.command in COMMANDS:
+        prefetcher.observe(route)
+        cached = prefetcher.lookup(route)
 
-    # 限制對話歷史長度
-    if len(conversation_history[chat_id]) > MAX_HISTORY_LEN * 2:
-        conversation_history[chat_id] = conversation_history[chat_id][-MAX_HISTORY_LEN * 2:]
+    #單人才會顯示 (...)，有快取結果時不需要
+    if event.source.type == 'user' and cached is None:
+        start_loading_animation_async(chat_id=chat_id, loading_seconds=5)
 
-    #單人才會顯示 (...)
-    if event.source.type == 'user':
-        start_loading_animation(chat_id=chat_id, loading_seconds=5)
-        
-    # 定義彩種關鍵字列表
-    lottery_keywords = ["威力彩", "大樂透", "539", "雙贏彩", "3星彩", "三星彩", "4星彩", "四星彩", "38樂合彩", "39樂合彩", "49樂合彩", "運彩"]
-
-    # 判斷是否為彩種相關查詢
-    if any(keyword in user_message for keyword in lottery_keywords):
-        reply_text = lottery_gpt(user_message)  # 呼叫對應的彩種處理函數
-    elif user_message.lower().startswith("大盤") or user_message.lower().startswith("台股"):
-        reply_text = stock_gpt("大盤")
-    elif user_message.lower().startswith("美盤") or user_message.lower().startswith("美股"):
-        reply_text = stock_gpt("美盤")   
-    elif any(user_message.lower().startswith(currency.lower()) for currency in ["金價", "金", "黃金", "gold"]):
-        reply_text = gold_gpt()
-    elif any(user_message.lower().startswith(currency.lower()) for currency in ["鉑", "鉑金", "platinum", "白金"]):
-        reply_text = platinum_gpt()
-    elif user_message.lower().startswith(tuple(["日幣", "日元", "jpy", "換日幣"])):
-        reply_text = money_gpt("JPY")
-    elif any(user_message.lower().startswith(currency.lower()) for currency in ["美金", "usd", "美元", "換美金"]):
-        reply_text = money_gpt("USD")
-    elif user_message.startswith("104:"):
-        reply_text = one04_gpt(user_message[4:])
-    elif user_message.startswith("pt:"):
-        reply_text = partjob_gpt(user_message[3:])
-    elif user_message.startswith("cb:"):
-        coin_id = user_message[3:].strip()
-        reply_text = crypto_gpt(coin_id)
-    elif user_message.startswith("$:"):
-        coin_id = user_message[2:].strip()
-        reply_text = crypto_gpt(coin_id)
-    elif stock_code:
-        stock_id = stock_code.group()
-        reply_text = stock_gpt(stock_id)
-    elif stock_symbol:
-        stock_id = stock_symbol.group()
-        reply_text = stock_gpt(stock_id)
-    elif user_message.startswith("比特幣"):
-        reply_text = crypto_gpt("bitcoin")
-    elif user_message.startswith("狗狗幣"):
-        reply_text = crypto_gpt("dogecoin")
-    elif user_message.startswith("老婆"):
-        chat_roles[chat_id] = 'gf'  # 該聊天室進入 "老婆模式"
+    if route.command in COMMANDS:
+        reply_text = cached or COMMANDS[route.command](*route.args)
+    elif route.command == "gf_on":
+        conversations.set_role(chat_id, 'gf')  # 該聊天室進入 "老婆模式"
         reply_text = girlfriend_gpt("主人")
-    elif user_message.startswith("離婚"):
-        chat_roles[chat_id] = 'base'  # 回到預設模式
-        reply_text = get_reply(conversation_history[chat_id])  # 呼叫 Groq API 取得回應
+    elif route.command == "gf_off":
+        conversations.set_role(chat_id, 'base')  # 回到預設模式
+        messages = summarizer.build_messages(chat_id, conversations.messages(chat_id, user_suffix=USER_SUFFIX))
+        reply_text = get_reply(messages)  # 呼叫 Groq API 取得回應
     else:
         # 根據該聊天室的角色模式進行回應
-        if chat_roles[chat_id] == 'gf':
+        if conversations.get_role(chat_id) == 'gf':
             reply_text = girlfriend_gpt("主人")
         else:
-            # 傳送最新對話歷史給 Groq
-            messages = conversation_history[chat_id][-MAX_HISTORY_LEN:]
+            # 傳送預算內的最新對話歷史（含摘要）給 Groq
+            messages = summarizer.build_messages(chat_id, conversations.messages(chat_id, user_suffix=USER_SUFFIX))
             try:
                 reply_text = get_reply(messages)  # 呼叫 Groq API 取得回應
             except Exception as e:
@@ -240,14 +270,10 @@ def handle_message(event):
         reply_text = "抱歉，目前無法提供回應，請稍後再試。"
 
     # 回應使用者
-    try:
-        line_bot_api.reply_message(event.reply_token, TextSendMessage(reply_text))
-    except LineBotApiError as e:
-        print(f"LINE 回覆失敗: {e}")
+    send_reply(event, chat_id, reply_text)
 
     # 將 GPT 的回應加入對話歷史
-    conversation_history[chat_id].append({"role": "user", "content": user_message})  # 加入歷史對話
-    conversation_history[chat_id].append({"role": "assistant", "content": reply_text})
+    summarizer.evicted(chat_id, conversations.append(chat_id, "assistant", reply_text))
 
 @handler.add(PostbackEvent)
 def handle_postback(event):
@@ -274,11 +300,68 @@ def welcome(event):
 def health_check():
     return 'OK', 200
 
+# /stats 的存取權杖：有設定時需帶 Authorization: Bearer <STATS_TOKEN>，未設定時只允許本機存取
+STATS_TOKEN = os.getenv("STATS_TOKEN")
+
+
+def stats_allowed():
+    if STATS_TOKEN:
+        supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+        return hmac.compare_digest(supplied.encode(), STATS_TOKEN.encode())
+    return request.remote_addr in ("127.0.0.1", "::1")
+
+
+# 記憶體用量，用於估算 worker 大小（唯讀，不會觸發清除）
+@app.route('/stats', methods=['GET'])
+def stats():
+    if not stats_allowed():
+        abort(403)
+    return jsonify({
+        "conversations": conversations.memory_usage(),
+        "groq_limiter": groq_limiter.stats(),
+        "single_flight": flights.stats(),
+        "prefetch": prefetcher.stats(),
+        "http": http.stats(),
+        "imports": import_report(STARTUP_SECONDS),
+    })
+
+
+# 啟動耗時（行程啟動到 app 模組載入完成，含直譯器啟動；無法取得時為 None）
+STARTUP_SECONDS = process_uptime()
+if STARTUP_SECONDS is not None:
+    print(f"* app 啟動耗時 {STARTUP_SECONDS * 1000:.0f} ms")
+
+
+def evict_idle_chats():
+    """背景定期清除閒置過久的聊天室（SQLite 時會寫入並刪除資料列）"""
+    while True:
+        time.sleep(EVICT_INTERVAL)
+        try:
+            conversations.evict_idle()
+        except Exception as e:
+            print(f"清除閒置聊天室失敗: {e}")
+
+
+def start_background_tasks():
+    """
+    延遲 WARMUP_DELAY 秒後才執行的背景工作（不論以 gunicorn 或直接執行，
+    此時伺服器已開始接受請求，預先載入不會拖慢冷啟動）。
+    """
+    threading.Thread(target=evict_idle_chats, name="conversation-evict", daemon=True).start()
+    then = prefetcher.start if PREFETCH else None
+    if WARMUP:
+        warm_up(COMMANDS, delay=WARMUP_DELAY, then=then)
+    elif then is not None:
+        then()
+
+
+start_background_tasks()
+
 # 啟動應用
 if __name__ == "__main__":
     port = int(os.environ.get('PORT', 5000))
     try:
-        update_line_webhook()  # 啟動時自動更新 Webhook URL
+        sync_webhook_in_background(port)  # 伺服器開始接受請求後自動更新 Webhook URL
         app.run(host='0.0.0.0', port=port)
     except Exception as e:
         print(f"伺服器啟動失敗: {e}")
@@ -1,5 +1,12 @@
-import requests
+import os
+import re
+import json
+import time
+import threading
+import datetime as dt
+from zoneinfo import ZoneInfo
 from bs4 import BeautifulSoup
+from my_commands.http_client import http
 
 class CaiyunfangweiCrawler:
     def __init__(self, url="https://calendar.8s8s.net/caiyunfangwei.php"):
@@ -7,7 +14,7 @@ class CaiyunfangweiCrawler:
 
     def get_caiyunfangwei(self):
         # 發送GET請求到目標網址
-        response = requests.get(self.url)
+        response = http.get(self.url, timeout=10)
 
         # 檢查請求是否成功
         if response.status_code == 200:
@@ -47,3 +54,122 @@ class CaiyunfangweiCrawler:
                 raise ValueError("找不到 class 為 'cd3_text' 的 div 元素。")
         else:
             raise ConnectionError(f"無法訪問網站，狀態碼：{response.status_code}")
+
+
+# 財神方位每天只變一次：依台灣日期快取，保存在磁碟上，跨日後由背景執行緒更新
+CACHE_PATH = os.getenv(
+    "CAIYUNFANGWEI_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.cache', 'caiyunfangwei.json'),
+)
+TZ = ZoneInfo("Asia/Taipei")
+# 跨日後多久開始抓取（網站更新需要一點時間），失敗後的重試間隔（秒）
+REFRESH_AFTER_MIDNIGHT = dt.timedelta(minutes=5)
+RETRY_INTERVAL = 10 * 60
+UNAVAILABLE = {"今天日期": "資料暫時無法取得", "今日歲次": "資料暫時無法取得", "財神方位": "資料暫時無法取得"}
+# 網頁「今天日期」中的國曆日期，例如 2024/06/19
+PAGE_DATE = re.compile(r'(\d{4})\D(\d{1,2})\D(\d{1,2})')
+
+
+def _page_date(info):
+    """網頁標示的國曆日期（YYYY-MM-DD），無法解析時回傳 None"""
+    match = PAGE_DATE.search(info.get("今天日期", ""))
+    try:
+        return dt.date(*map(int, match.groups())).isoformat() if match else None
+    except ValueError:
+        return None
+
+
+class DailyCaiyunfangwei:
+    """
+    每日快取的財神方位。
+
+    get() 不會連線：有今天的資料就回傳，否則回傳 UNAVAILABLE 並在背景更新，
+    網站失效時樂透回覆仍可正常產生，也不會把昨天的財神方位當成今天的。
+    """
+
+    def __init__(self, crawler=None, path=CACHE_PATH):
+        self.crawler = crawler or CaiyunfangweiCrawler()
+        self.path = path
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._last_attempt = 0.0
+        self._thread = None
+        self._entry = {}  # {"date": "YYYY-MM-DD", "info": {...}}
+        try:
+            with open(path, encoding='utf-8') as f:
+                self._entry = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    @staticmethod
+    def today():
+        return dt.datetime.now(TZ).date().isoformat()
+
+    def get(self):
+        entry = self._entry
+        if entry.get("date") == self.today():
+            return entry["info"]
+        self._refresh_async()
+        return UNAVAILABLE
+
+    def refresh(self):
+        """抓取今天的資料並寫入磁碟，成功時回傳 True"""
+        today = self.today()
+        try:
+            info = self.crawler.get_caiyunfangwei()
+        except Exception as e:
+            print(f"財神方位更新失敗: {e}")
+            return False
+        if self.today() != today:
+            # 抓取期間跨日，無法確定是哪一天的資料
+            print("財神方位更新期間跨日，稍後重試")
+            return False
+        page_date = _page_date(info)
+        if page_date is not None and page_date != today:
+            # 網站跨日後尚未更新
+            print(f"財神方位網頁尚未更新: {info.get('今天日期')}")
+            return False
+        self._entry = {"date": today, "info": info}
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entry, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"無法寫入財神方位快取: {e}")
+        return True
+
+    def _refresh_async(self):
+        with self._lock:
+            # 網站失效時不要每個請求都重試
+            if self._refreshing or time.monotonic() - self._last_attempt < RETRY_INTERVAL:
+                return
+            self._refreshing = True
+            self._last_attempt = time.monotonic()
+
+        def run():
+            try:
+                self.refresh()
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name="caiyunfangwei-refresh", daemon=True).start()
+
+    def start(self):
+        """啟動背景執行緒：每天跨日後更新，失敗時定期重試"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="caiyunfangwei-daily", daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while True:
+            if self._entry.get("date") != self.today() and not self.refresh():
+                time.sleep(RETRY_INTERVAL)
+                continue
+            now = dt.datetime.now(TZ)
+            next_run = dt.datetime.combine(now.date() + dt.timedelta(days=1), dt.time(), tzinfo=TZ) + REFRESH_AFTER_MIDNIGHT
+            time.sleep(max((next_run - now).total_seconds(), 1))
+
+
+daily_caiyunfangwei = DailyCaiyunfangwei()
@@ -1,4 +1,4 @@
-import requests
+from my_commands.http_client import http
 
 def get_btc_rate(currency='usd'):
     """
@@ -12,7 +12,7 @@ def get_btc_rate(currency='usd'):
         url = f'https://api.coingecko.com/api/v3/simple/price?ids=bitcoin&vs_currencies={currency}'
 
         # 發送 GET 請求到 API
-        response = requests.get(url)
+        response = http.get(url)
 
         # 檢查請求是否成功（狀態碼 200）
         if response.status_code == 200:
@@ -0,0 +1,249 @@
+import re
+from collections import deque, namedtuple
+
+# 路由結果：指令名稱與呼叫參數
+Route = namedtuple("Route", ["command", "args"])
+DEFAULT_ROUTE = Route("chat", ())
+
+# 台股代碼：4-5個數字，且可選擇性有一個英文字母
+TW_CODE_PATTERN = re.compile(r'\b\d{4,5}[A-Za-z]?\b')
+# 美股代碼：2-5個大寫字母，或 $ 前綴的 1-5 個大寫字母（如 $F）；小寫英文單字如 hi、ok 不視為代碼
+US_SYMBOL_PATTERN = re.compile(r'(?<![A-Za-z0-9$])(?:\$([A-Z]{1,5})|([A-Z]{2,5}))(?![A-Za-z])')
+# 常見的大寫英文單字與縮寫，不是股票代碼（$ 前綴的代碼不受此限）
+US_SYMBOL_STOPWORDS = frozenset({
+    # 對話用語
+    "OK", "HI", "YES", "NO", "LOL", "THX", "BYE", "HELLO", "HEY", "WOW", "OMG", "BTW", "FYI", "ASAP", "HAHA",
+    "SORRY", "THANK", "LOVE", "GOOD", "NICE", "COOL", "PLZ", "PLS", "WTF", "XD", "QQ",
+    # 常見英文單字
+    "AN", "AS", "AT", "BE", "BY", "DO", "GO", "HE", "IF", "IN", "IS", "IT", "ME", "MY", "OF", "ON", "OR", "SO",
+    "TO", "UP", "US", "WE", "AND", "ARE", "BUT", "CAN", "FOR", "HOW", "NOT", "THE", "WHAT", "WHY", "YOU",
+    "THINK", "THIS", "THAT", "WITH", "HAVE",
+    # 科技、財經縮寫
+    "AI", "GPT", "LINE", "BOT", "ID", "APP", "PM", "AM", "PC", "TV", "CEO", "CFO", "CTO", "ETF", "EPS", "ROE",
+    "ROA", "PE", "PB", "GDP", "CPI", "PPI", "IPO", "KD", "RSI", "MACD", "USA", "TW", "TWD", "USD", "JPY",
+    "EUR", "CNY", "NEWS", "BUY", "SELL", "TOP", "HOT",
+})
+
+LOTTERY_KEYWORDS = ["威力彩", "大樂透", "539", "雙贏彩", "3星彩", "三星彩", "4星彩", "四星彩", "38樂合彩", "39樂合彩", "49樂合彩", "運彩"]
+
+
+def find_us_symbols(message):
+    """取出訊息中的美股代碼：$ 前綴的一律採用，其餘排除停用字"""
+    return [prefixed or bare for prefixed, bare in US_SYMBOL_PATTERN.findall(message)
+            if prefixed or bare not in US_SYMBOL_STOPWORDS]
+
+
+def find_symbols(message, limit=6):
+    """取出訊息中不重複的台股/美股代碼（保持原順序）"""
+    symbols = TW_CODE_PATTERN.findall(message) + find_us_symbols(message)
+    return list(dict.fromkeys(symbols))[:limit]
+
+
+def _compare_symbols(message):
+    # 兩個以上的有效代碼（台股代碼，或通過停用字檢查的美股代碼）才進入多檔比較
+    symbols = find_symbols(message)
+    return symbols if len(symbols) >= 2 else None
+
+
+class AhoCorasick:
+    """多關鍵字子字串比對，一次掃描找出所有出現的關鍵字"""
+
+    def __init__(self, keywords):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        for keyword in keywords:
+            self._add(keyword)
+        self._build()
+
+    def _add(self, keyword):
+        state = 0
+        for ch in keyword:
+            if ch not in self._goto[state]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[state][ch] = len(self._goto) - 1
+            state = self._goto[state][ch]
+        self._output[state].append(keyword)
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._output[nxt] = self._output[nxt] + self._output[self._fail[nxt]]
+
+    def first(self, text):
+        """回傳第一個出現的關鍵字，沒有則回傳 None"""
+        state = 0
+        for ch in text:
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            if self._output[state]:
+                return self._output[state][0]
+        return None
+
+
+class PrefixTrie:
+    """前綴比對：找出所有是訊息開頭的已註冊前綴"""
+
+    _END = object()
+
+    def __init__(self):
+        self._root = {}
+
+    def add(self, prefix, value):
+        node = self._root
+        for ch in prefix:
+            node = node.setdefault(ch, {})
+        node.setdefault(self._END, []).append(value)
+
+    def matches(self, text):
+        node = self._root
+        found = []
+        for i, ch in enumerate(text):
+            node = node.get(ch)
+            if node is None:
+                break
+            for value in node.get(self._END, ()):
+                found.append((i + 1, value))
+        return found
+
+
+class CommandRouter:
+    """
+    宣告式指令路由。
+
+    每條規則有優先序（數字越小越優先）；關鍵字包含比對（Aho-Corasick）與前綴比對（trie）
+    各只掃描訊息一次，正規表示式與自訂判斷只在優先序可能勝出時才執行。
+    """
+
+    def __init__(self):
+        self._seq = 0
+        self._contains = []   # (priority, seq, command, keyword, build_args)
+        self._prefixes = []   # (priority, seq, command, prefix, build_args)
+        self._checks = []     # (priority, seq, command, match_func, build_args)
+        self._automaton = None
+        self._trie = None
+
+    def _next_seq(self):
+        self._seq += 1
+        return self._seq
+
+    def add_contains(self, command, keywords, priority, build_args=lambda message, keyword: (message,)):
+        """訊息包含任一關鍵字"""
+        for keyword in keywords:
+            self._contains.append((priority, self._next_seq(), command, keyword, build_args))
+        self._automaton = None
+
+    def add_prefix(self, command, prefixes, priority, build_args=lambda message, rest: ()):
+        """訊息以任一前綴開頭（不分大小寫）；build_args 收到原訊息與前綴後的剩餘文字"""
+        for prefix in prefixes:
+            self._prefixes.append((priority, self._next_seq(), command, prefix.lower(), build_args))
+        self._trie = None
+
+    def add_regex(self, command, pattern, priority, build_args=lambda message, match: (match.group(),)):
+        """預先編譯的正規表示式，search 成功即符合"""
+        compiled = re.compile(pattern)
+        self._checks.append((priority, self._next_seq(), command, compiled.search, build_args))
+        self._checks.sort(key=lambda rule: rule[:2])
+
+    def add_check(self, command, match_func, priority, build_args=lambda message, result: (result,)):
+        """自訂判斷：match_func(message) 回傳真值即符合"""
+        self._checks.append((priority, self._next_seq(), command, match_func, build_args))
+        self._checks.sort(key=lambda rule: rule[:2])
+
+    def compile(self):
+        keywords = {}
+        for rule in self._contains:
+            keyword = rule[3]
+            if keyword not in keywords or rule[:2] < keywords[keyword][:2]:
+                keywords[keyword] = rule
+        self._contains_by_keyword = keywords
+        self._automaton = AhoCorasick(keywords)
+        self._trie = PrefixTrie()
+        for rule in self._prefixes:
+            self._trie.add(rule[3], rule)
+        return self
+
+    def route(self, message):
+        if self._automaton is None or self._trie is None:
+            self.compile()
+
+        best = None  # (priority, seq, Route)
+
+        keyword = self._automaton.first(message)
+        if keyword is not None:
+            priority, seq, command, _, build_args = self._contains_by_keyword[keyword]
+            best = (priority, seq, Route(command, build_args(message, keyword)))
+
+        for length, (priority, seq, command, _, build_args) in self._trie.matches(message.lower()):
+            if best is None or (priority, seq) < best[:2]:
+                best = (priority, seq, Route(command, build_args(message, message[length:])))
+
+        for priority, seq, command, match_func, build_args in self._checks:
+            if best is not None and (priority, seq) > best[:2]:
+                break
+            result = match_func(message)
+            if result:
+                return Route(command, build_args(message, result))
+
+        return best[2] if best is not None else DEFAULT_ROUTE
+
+
+def build_router(name_lookup=None):
+    """
+    建立 LINE 訊息的預設指令表。
+
+    :param name_lookup: 股名 -> 股號的查詢函數（例如 SymbolIndex.get_code），None 表示不支援股名查詢。
+    """
+    router = CommandRouter()
+    router.add_contains("lottery", LOTTERY_KEYWORDS, priority=10)
+    router.add_prefix("stock", ["大盤", "台股"], priority=20, build_args=lambda message, rest: ("大盤",))
+    router.add_prefix("stock", ["美盤", "美股"], priority=21, build_args=lambda message, rest: ("美盤",))
+    router.add_prefix("gold", ["金價", "金", "黃金", "gold"], priority=22)
+    router.add_prefix("platinum", ["鉑", "鉑金", "platinum", "白金"], priority=23)
+    router.add_prefix("money", ["日幣", "日元", "jpy", "換日幣"], priority=24, build_args=lambda message, rest: ("JPY",))
+    router.add_prefix("money", ["美金", "usd", "美元", "換美金"], priority=25, build_args=lambda message, rest: ("USD",))
+    router.add_prefix("one04", ["104:"], priority=26, build_args=lambda message, rest: (rest,))
+    router.add_prefix("partjob", ["pt:"], priority=27, build_args=lambda message, rest: (rest,))
+    router.add_prefix("crypto", ["cb:", "$:"], priority=28, build_args=lambda message, rest: (rest.strip(),))
+    router.add_check("compare", _compare_symbols, priority=40)
+    router.add_regex("stock", TW_CODE_PATTERN.pattern, priority=50)
+    if name_lookup is not None:
+        router.add_check("stock", lambda message: name_lookup(message.strip()), priority=55)
+    router.add_check("stock", lambda message: find_us_symbols(message)[:1], priority=60,
+                     build_args=lambda message, result: (result[0],))
+    router.add_prefix("crypto", ["比特幣"], priority=70, build_args=lambda message, rest: ("bitcoin",))
+    router.add_prefix("crypto", ["狗狗幣"], priority=70, build_args=lambda message, rest: ("dogecoin",))
+    router.add_prefix("gf_on", ["老婆"], priority=80)
+    router.add_prefix("gf_off", ["離婚"], priority=81)
+    return router.compile()
+
+
+# 路由效能測試用的訊息（路由結果由 tests/test_command_router.py 檢查）
+BENCHMARK_MESSAGES = [
+    "威力彩", "今天539開什麼", "大盤", "台股今天如何", "金價", "日幣", "104:iOS", "pt:桃園", "cb: bitcoin",
+    "2330 2317 2454", "AAPL MSFT NVDA", "2330", "台積電", "AAPL", "$TSLA", "比特幣", "老婆", "hi",
+    "I love you", "我想問 ETF 推薦", "今天天氣如何",
+]
+
+
+def benchmark(rounds=2000):
+    """路由吞吐量（訊息/秒）"""
+    import timeit
+    router = build_router({"台積電": "2330"}.get)
+    elapsed = timeit.timeit(lambda: [router.route(m) for m in BENCHMARK_MESSAGES], number=rounds)
+    total = rounds * len(BENCHMARK_MESSAGES)
+    print(f"路由 {total} 則訊息耗時 {elapsed:.3f}s，約 {total / elapsed:,.0f} 則/秒")
+
+
+if __name__ == "__main__":
+    benchmark()
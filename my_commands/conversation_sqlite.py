@@ -0,0 +1,234 @@
+import os
+import time
+import atexit
+import sqlite3
+import threading
+from collections import OrderedDict
+from my_commands.conversation_store import ConversationBackend, DEFAULT_ROLE
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chat_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_chat ON messages (chat_id, id);
+CREATE TABLE IF NOT EXISTS summaries (
+    chat_id TEXT PRIMARY KEY,
+    summary TEXT NOT NULL,
+    marker TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS roles (
+    chat_id TEXT PRIMARY KEY,
+    role TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class SQLiteConversationStore(ConversationBackend):
+    """
+    以 SQLite（WAL 模式）保存對話紀錄與角色模式，讓多個 gunicorn worker 共用狀態。
+
+    - 對話訊息先放在記憶體佇列，由背景執行緒批次寫入。
+    - 角色模式立即寫入，切換模式後其他 worker 馬上看得到。
+    - 讀取時先查行程內快取；其他行程寫入資料庫後（PRAGMA data_version 改變）快取整個失效。
+    """
+
+    def __init__(self, path, max_messages=20, idle_seconds=24 * 60 * 60,
+                 cache_size=1000, flush_interval=0.2, batch_size=100):
+        self.path = path
+        self.max_messages = max_messages
+        self.idle_seconds = idle_seconds
+        self.cache_size = cache_size
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+        self._lock = threading.RLock()
+        self._pending = []  # (chat_id, role, content, created_at)
+        self._cache = OrderedDict()  # chat_id -> {"messages": [...], "role": str, "summary": (str, marker)}
+        self._data_version = self._read_data_version()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._flusher = threading.Thread(target=self._flush_loop, name="conversation-flush", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    # ---- 快取 ----
+
+    def _read_data_version(self):
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _validate_cache(self):
+        # 其他行程提交寫入後 data_version 會改變，本連線的寫入不影響
+        version = self._read_data_version()
+        if version != self._data_version:
+            self._data_version = version
+            self._cache.clear()
+
+    def _load(self, chat_id):
+        self._validate_cache()
+        entry = self._cache.get(chat_id)
+        if entry is not None:
+            self._cache.move_to_end(chat_id)
+            self.cache_hits += 1
+            return entry
+
+        self.cache_misses += 1
+        rows = self._conn.execute(
+            "SELECT role, content FROM messages WHERE chat_id = ? ORDER BY id DESC LIMIT ?",
+            (chat_id, self.max_messages),
+        ).fetchall()
+        messages = [(role, content) for role, content in reversed(rows)]
+        messages += [(role, content) for cid, role, content, _ in self._pending if cid == chat_id]
+        row = self._conn.execute("SELECT role FROM roles WHERE chat_id = ?", (chat_id,)).fetchone()
+        summary = self._conn.execute("SELECT summary, marker FROM summaries WHERE chat_id = ?", (chat_id,)).fetchone()
+        entry = {
+            "messages": messages[-self.max_messages:],
+            "role": row[0] if row else DEFAULT_ROLE,
+            "summary": tuple(summary) if summary else ('', None),
+        }
+        self._cache[chat_id] = entry
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return entry
+
+    # ---- 對外介面 ----
+
+    def get_role(self, chat_id):
+        with self._lock:
+            return self._load(chat_id)["role"]
+
+    def set_role(self, chat_id, role):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO roles (chat_id, role, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(chat_id) DO UPDATE SET role = excluded.role, updated_at = excluded.updated_at",
+                (chat_id, role, time.time()),
+            )
+            self._conn.commit()
+            self._load(chat_id)["role"] = role
+
+    def append(self, chat_id, role, content):
+        with self._lock:
+            entry = self._load(chat_id)
+            records = entry["messages"] + [(role, content)]
+            entry["messages"] = records[-self.max_messages:]
+            self._pending.append((chat_id, role, content, time.time()))
+            if len(self._pending) >= self.batch_size:
+                self._wakeup.set()
+        return self._render(records[:-self.max_messages], None, '')
+
+    def messages(self, chat_id, limit=None, user_suffix=''):
+        with self._lock:
+            records = list(self._load(chat_id)["messages"])
+        return self._render(records, limit, user_suffix)
+
+    def get_summary(self, chat_id):
+        with self._lock:
+            return self._load(chat_id)["summary"]
+
+    def set_summary(self, chat_id, summary, marker):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO summaries (chat_id, summary, marker, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(chat_id) DO UPDATE SET summary = excluded.summary, marker = excluded.marker, "
+                "updated_at = excluded.updated_at",
+                (chat_id, summary, marker, time.time()),
+            )
+            self._conn.commit()
+            self._load(chat_id)["summary"] = (summary, marker)
+
+    def evict_idle(self):
+        """刪除閒置過久的聊天室紀錄"""
+        cutoff = time.time() - self.idle_seconds
+        with self._lock:
+            self.flush()
+            self._conn.execute(
+                "DELETE FROM messages WHERE chat_id IN "
+                "(SELECT chat_id FROM messages GROUP BY chat_id HAVING MAX(created_at) < ?)",
+                (cutoff,),
+            )
+            self._conn.execute("DELETE FROM roles WHERE updated_at < ? AND role = ?", (cutoff, DEFAULT_ROLE))
+            self._conn.execute("DELETE FROM summaries WHERE updated_at < ?", (cutoff,))
+            self._conn.commit()
+            self._cache.clear()
+
+    def memory_usage(self):
+        with self._lock:
+            chats, messages = self._conn.execute(
+                "SELECT COUNT(DISTINCT chat_id), COUNT(*) FROM messages"
+            ).fetchone()
+            cached_bytes = sum(
+                len(content.encode('utf-8')) for entry in self._cache.values() for _, content in entry["messages"]
+            )
+            return {
+                "backend": "sqlite",
+                "chats": chats,
+                "messages": messages,
+                "pending_writes": len(self._pending),
+                "cached_chats": len(self._cache),
+                "cached_bytes": cached_bytes,
+                "cache_hits": self.cache_hits,
+                "cache_misses": self.cache_misses,
+                "db_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+            }
+
+    # ---- 批次寫入 ----
+
+    def flush(self):
+        """把佇列中的訊息一次寫入，並截斷每個聊天室只保留最近 max_messages 則"""
+        with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, []
+            try:
+                self._conn.executemany(
+                    "INSERT INTO messages (chat_id, role, content, created_at) VALUES (?, ?, ?, ?)", pending
+                )
+                for chat_id in {row[0] for row in pending}:
+                    self._conn.execute(
+                        "DELETE FROM messages WHERE chat_id = ? AND id <= "
+                        "(SELECT id FROM messages WHERE chat_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                        (chat_id, chat_id, self.max_messages),
+                    )
+                self._conn.commit()
+            except sqlite3.Error:
+                # 寫入失敗時放回佇列，下次再試
+                self._conn.rollback()
+                self._pending = pending + self._pending
+                raise
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                print(f"對話紀錄寫入失敗: {e}")
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        try:
+            self.flush()
+        except sqlite3.Error as e:
+            print(f"對話紀錄寫入失敗: {e}")
@@ -0,0 +1,211 @@
+import os
+import sys
+import time
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+
+# 每則訊息除內容外的估計額外記憶體（tuple、字串物件等）
+MESSAGE_OVERHEAD_BYTES = 120
+DEFAULT_ROLE = 'base'
+# SQLite 後端的預設資料庫路徑（相對於專案目錄，與其他快取相同放在 .cache 下）
+DB_PATH = os.getenv(
+    "CONVERSATION_DB_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.cache', 'conversations.db'),
+)
+
+
+class _Chat:
+    __slots__ = ("messages", "role", "last_active", "nbytes", "summary", "summary_marker")
+
+    def __init__(self, max_messages):
+        self.messages = deque(maxlen=max_messages)  # (role, content)
+        self.role = DEFAULT_ROLE
+        self.last_active = time.monotonic()
+        self.nbytes = 0
+        self.summary = ''
+        self.summary_marker = None
+
+
+def _message_bytes(content):
+    return len(content.encode('utf-8')) + MESSAGE_OVERHEAD_BYTES
+
+
+class ConversationBackend(ABC):
+    """對話紀錄與角色模式的儲存介面"""
+
+    @abstractmethod
+    def get_role(self, chat_id):
+        ...
+
+    @abstractmethod
+    def set_role(self, chat_id, role):
+        ...
+
+    @abstractmethod
+    def append(self, chat_id, role, content):
+        """加入一則訊息，回傳因緩衝區已滿而丟棄的舊訊息（Chat Completion 格式）"""
+
+    @abstractmethod
+    def messages(self, chat_id, limit=None, user_suffix=''):
+        """
+        取得 Chat Completion 格式的對話紀錄。
+
+        :param limit: 只取最近幾則。
+        :param user_suffix: 附加在最後一則使用者訊息的提示（例如要求以繁體中文回答），不會寫入紀錄。
+        """
+
+    @abstractmethod
+    def get_summary(self, chat_id):
+        """取得 (摘要, 最後折疊訊息的指紋)，沒有摘要時回傳 ('', None)"""
+
+    @abstractmethod
+    def set_summary(self, chat_id, summary, marker):
+        ...
+
+    @abstractmethod
+    def evict_idle(self):
+        """清除閒置過久的聊天室"""
+
+    @abstractmethod
+    def memory_usage(self):
+        """目前保存的聊天室數、訊息數與用量統計"""
+
+    @staticmethod
+    def _render(records, limit, user_suffix):
+        if limit is not None:
+            records = records[-limit:]
+        result = [{"role": role, "content": content} for role, content in records]
+        if user_suffix:
+            for message in reversed(result):
+                if message["role"] == "user":
+                    message["content"] += user_suffix
+                    break
+        return result
+
+
+class ConversationStore(ConversationBackend):
+    """
+    各聊天室的對話紀錄與角色模式（保存在行程記憶體）。
+
+    每個聊天室使用固定長度的環狀緩衝區；閒置過久或總記憶體超過上限時，
+    依最久未使用的順序淘汰整個聊天室。
+    """
+
+    def __init__(self, max_messages=20, max_chats=5000, idle_seconds=24 * 60 * 60, max_bytes=32 * 1024 * 1024):
+        self.max_messages = max_messages
+        self.max_chats = max_chats
+        self.idle_seconds = idle_seconds
+        self.max_bytes = max_bytes
+        self._chats = OrderedDict()
+        self._lock = threading.Lock()
+        self._nbytes = 0
+        self.evictions = 0
+
+    def _touch(self, chat_id):
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            chat = self._chats[chat_id] = _Chat(self.max_messages)
+        chat.last_active = time.monotonic()
+        self._chats.move_to_end(chat_id)
+        return chat
+
+    def _evict(self, keep=None):
+        now = time.monotonic()
+        while self._chats:
+            chat_id, chat = next(iter(self._chats.items()))
+            if chat_id == keep:
+                break
+            idle = now - chat.last_active > self.idle_seconds
+            if not (idle or len(self._chats) > self.max_chats or self._nbytes > self.max_bytes):
+                break
+            self._nbytes -= chat.nbytes
+            del self._chats[chat_id]
+            self.evictions += 1
+
+    def get_role(self, chat_id):
+        with self._lock:
+            chat = self._chats.get(chat_id)
+            return chat.role if chat is not None else DEFAULT_ROLE
+
+    def set_role(self, chat_id, role):
+        with self._lock:
+            self._touch(chat_id).role = sys.intern(role)
+
+    def append(self, chat_id, role, content):
+        """加入一則訊息，緩衝區滿時自動丟棄最舊的訊息並回傳"""
+        evicted = []
+        with self._lock:
+            chat = self._touch(chat_id)
+            if len(chat.messages) == chat.messages.maxlen:
+                evicted = self._render([chat.messages[0]], None, '')
+                dropped = _message_bytes(chat.messages[0][1])
+                chat.nbytes -= dropped
+                self._nbytes -= dropped
+            chat.messages.append((sys.intern(role), content))
+            added = _message_bytes(content)
+            chat.nbytes += added
+            self._nbytes += added
+            self._evict(keep=chat_id)
+        return evicted
+
+    def messages(self, chat_id, limit=None, user_suffix=''):
+        with self._lock:
+            chat = self._chats.get(chat_id)
+            records = list(chat.messages) if chat is not None else []
+        return self._render(records, limit, user_suffix)
+
+    def get_summary(self, chat_id):
+        with self._lock:
+            chat = self._chats.get(chat_id)
+            return (chat.summary, chat.summary_marker) if chat is not None else ('', None)
+
+    def set_summary(self, chat_id, summary, marker):
+        with self._lock:
+            chat = self._chats.get(chat_id)
+            if chat is None:
+                # 摘要產生期間聊天室已被淘汰
+                return
+            delta = len(summary.encode('utf-8')) - len(chat.summary.encode('utf-8'))
+            chat.summary = summary
+            chat.summary_marker = marker
+            chat.nbytes += delta
+            self._nbytes += delta
+
+    def evict_idle(self):
+        """清除閒置過久的聊天室"""
+        with self._lock:
+            self._evict()
+
+    def memory_usage(self):
+        """目前保存的聊天室數、訊息數與估計記憶體用量"""
+        with self._lock:
+            return {
+                "backend": "memory",
+                "chats": len(self._chats),
+                "messages": sum(len(chat.messages) for chat in self._chats.values()),
+                "bytes": self._nbytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+            }
+
+
+def create_conversation_store(max_messages=20):
+    """
+    依環境變數 CONVERSATION_BACKEND 建立對話儲存：
+    memory（預設，單一行程）或 sqlite（多個 worker 共用，路徑由 CONVERSATION_DB_PATH 指定）。
+    """
+    idle_seconds = int(os.getenv("CONVERSATION_IDLE_SECONDS", 24 * 60 * 60))
+    if os.getenv("CONVERSATION_BACKEND", "memory") == "sqlite":
+        from my_commands.conversation_sqlite import SQLiteConversationStore
+        return SQLiteConversationStore(
+            DB_PATH,
+            max_messages=max_messages,
+            idle_seconds=idle_seconds,
+        )
+    return ConversationStore(
+        max_messages=max_messages,
+        max_chats=int(os.getenv("CONVERSATION_MAX_CHATS", 5000)),
+        idle_seconds=idle_seconds,
+        max_bytes=int(os.getenv("CONVERSATION_MAX_BYTES", 32 * 1024 * 1024)),
+    )
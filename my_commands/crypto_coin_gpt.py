@@ -1,82 +1,56 @@
-import os
-import openai
-from groq import Groq
-import requests  # 確保引入 requests 模組
+import re
+import math
 import time
 import json
+import pandas as pd
+from my_commands.http_client import http
+from my_commands.llm_gateway import get_reply
+from my_commands.price_store import get_price_series
+from my_commands.single_flight import coalesce
+
+# 首次建立本地歷史時抓取的天數
+INITIAL_HISTORY_DAYS = 365
+# CoinGecko 代碼格式（來自使用者輸入，會用於網址、檔名與快取 key）
+COIN_ID_PATTERN = re.compile(r'[a-z0-9-]+')
+
+
+def fetch_daily_prices(coin_id, vs_currency, last_ts):
+    """向 CoinGecko 只抓本地最後一筆之後的日資料（不含尚未收盤的今天）"""
+    if last_ts is None:
+        days = INITIAL_HISTORY_DAYS
+    else:
+        days = min(INITIAL_HISTORY_DAYS, math.ceil((time.time() - last_ts) / 86400) + 1)
+    url = f'https://api.coingecko.com/api/v3/coins/{coin_id}/market_chart'
+    params = {'vs_currency': vs_currency, 'days': days, 'interval': 'daily'}
+    response = http.get(url, params=params)
+    response.raise_for_status()
+    prices = response.json()['prices']
+    index = pd.to_datetime([p[0] for p in prices], unit='ms').normalize()
+    series = pd.Series([p[1] for p in prices], index=index)
+    return series[series.index < pd.Timestamp.now('UTC').tz_localize(None).normalize()]
+
+
+def price_store(coin_id, vs_currency='twd'):
+    if not COIN_ID_PATTERN.fullmatch(coin_id) or not COIN_ID_PATTERN.fullmatch(vs_currency):
+        raise ValueError(f"不支援的加密貨幣代碼: {coin_id!r}")
+    return get_price_series(
+        f"crypto_{coin_id}_{vs_currency}",
+        lambda last_ts: fetch_daily_prices(coin_id, vs_currency, last_ts),
+    )
 
-# 設定 API 金鑰
-openai.api_key = os.getenv("OPENAI_API_KEY")
-groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-
-# 設定 groq API 的速率限制參數
-GROQ_RATE_LIMIT = 6000  # 每分鐘允許的 token 數量
-GROQ_REQUEST_INTERVAL = 60  # 速率限制的時間間隔，單位：秒
-
-# 初始化請求計數器和時間戳
-groq_tokens_used = 0
-groq_last_request_time = time.time()
-
-def get_reply(messages):
-    global groq_tokens_used, groq_last_request_time
-
-    try:
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo-1106",
-            messages=messages
-        )
-        reply = response["choices"][0]["message"]["content"]
-    except openai.OpenAIError as openai_err:
-        try:
-            request_tokens = sum(len(message['content']) for message in messages)
-
-            current_time = time.time()
-            if groq_tokens_used + request_tokens > GROQ_RATE_LIMIT:
-                wait_time = GROQ_REQUEST_INTERVAL - (current_time - groq_last_request_time)
-                if wait_time > 0:
-                    print(f"超過速率限制，等待 {wait_time} 秒...")
-                    time.sleep(wait_time)
-                groq_tokens_used = 0
-                groq_last_request_time = time.time()
-
-            response = groq_client.chat.completions.create(
-                model="mixtral-8x7b-32768",
-                messages=messages,
-                max_tokens=1500,
-                temperature=1.2
-            )
-            reply = response.choices[0].message.content
-            groq_tokens_used += request_tokens
-        except Groq.RateLimitError as rate_err:
-            print("遇到 RateLimitError，等待 15 秒...")
-            time.sleep(15)
-            response = groq_client.chat.completions.create(
-                model="mixtral-8x7b-32768",
-                messages=messages,
-                max_tokens=1500,
-                temperature=1.2
-            )
-            reply = response.choices[0].message.content
-        except Exception as groq_err:
-            reply = f"OpenAI API 發生錯誤: {openai_err.error.message}, GROQ API 發生錯誤: {groq_err.message}"
-    return reply
 
 class CryptoAnalyzer:
     def fetch_crypto_data(self, coin_id, vs_currency='twd', days='30'):
-        """抓取特定加密貨幣的市場數據"""
-        url = f'https://api.coingecko.com/api/v3/coins/{coin_id}/market_chart'
-        params = {
-            'vs_currency': vs_currency,
-            'days': days
-        }
-        response = requests.get(url, params=params)
-
-        if response.status_code == 200:
-            data = response.json()
-            return data
-        else:
-            print(f'無法取得加密貨幣數據，錯誤: {response.status_code}')
+        """取得特定加密貨幣的日資料（本地歷史，必要時增量更新），格式同 CoinGecko market_chart"""
+        try:
+            series = price_store(coin_id, vs_currency).series(days=int(days))
+        except Exception as e:
+            print(f'無法取得加密貨幣數據，錯誤: {e}')
+            return None
+        if series.empty:
             return None
+        timestamps = series.index.values.astype('datetime64[ms]').astype('i8')
+        return {'prices': [[int(ts), value] for ts, value in zip(timestamps, series.tolist())]}
 
     def fetch_current_price(self, coin_id):
         """抓取加密貨幣的現價（TWD 和 USD）"""
@@ -85,7 +59,7 @@ class CryptoAnalyzer:
             'ids': coin_id,
             'vs_currencies': 'twd,usd'
         }
-        response = requests.get(url, params=params)
+        response = http.get(url, params=params)
 
         if response.status_code == 200:
             data = response.json()
@@ -147,7 +121,9 @@ def generate_crypto_report(coin_id):
 
     return report_content
 
+@coalesce(key_func=lambda coin_id: coin_id.lower())
 def crypto_gpt(coin_id):
+    coin_id = coin_id.strip().lower()
     content_msg = generate_crypto_report(coin_id)
     print(content_msg)  # 調試輸出
 
@@ -159,7 +135,7 @@ def crypto_gpt(coin_id):
         "content": content_msg
     }]
 
-    reply_data = get_reply(msg)
+    reply_data = get_reply(msg, "crypto")
     return reply_data
 
 # # 範例呼叫
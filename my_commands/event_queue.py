@@ -0,0 +1,40 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class EventQueue:
+    """有上限的背景工作池，用來在 webhook 回應後處理 LINE 事件"""
+
+    def __init__(self, max_workers=4, max_pending=64):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="line-event")
+        # 限制「執行中 + 排隊中」的工作數量，避免突發流量把記憶體吃光
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def submit(self, func, *args, **kwargs):
+        """
+        將工作放入佇列。
+
+        :return: True 表示已排入背景處理；False 表示佇列已滿，呼叫端應自行同步處理。
+        """
+        if not self._slots.acquire(blocking=False):
+            return False
+        try:
+            self._executor.submit(self._run, func, *args, **kwargs)
+        except RuntimeError:
+            # 工作池已關閉（例如程式結束中）
+            self._slots.release()
+            return False
+        return True
+
+    def _run(self, func, *args, **kwargs):
+        try:
+            func(*args, **kwargs)
+        except Exception as e:
+            print(f"背景處理事件失敗: {e}")
+        finally:
+            self._slots.release()
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -1,26 +1,4 @@
-import os
-from groq import Groq
-
-# 設定 Groq API 金鑰
-groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-
-# 構建對話回應
-def get_reply(messages):
-    print ("* girlfriend: get_relpy")
-    try:
-        # 呼叫 Groq 的 Chat Completion 來生成對話
-        response = groq_client.chat.completions.create(
-            model="llama3-8b-8192",
-            messages=messages,
-            max_tokens=2048,
-            temperature=1.5,  # 溫度決定生成文本的創造性
-            top_p=1
-        )
-        reply = response.choices[0].message.content
-        return reply
-    except Exception as e:                                      #刪除 GroqError，直接處理例外情況即可，或根據正確的 API 錯誤處理方法來替代
-        reply = f"GROQ API 發生錯誤: {str(e)}"
-        return reply
+from my_commands.llm_gateway import get_reply
 
 # 女人人設
 def girlfriend_gpt(user_name):
@@ -47,7 +25,7 @@ def girlfriend_gpt(user_name):
             "content": "繁中"
         }
     ]
-    reply_data = get_reply(messages)
+    reply_data = get_reply(messages, "girlfriend")
     return reply_data
 
 # # 測試呼叫 `girlfriend_gpt`
@@ -1,63 +1,59 @@
-import os
-import openai
-from groq import Groq
+import time
+from io import StringIO
 from datetime import datetime
 import pandas as pd
+from my_commands.llm_gateway import get_reply
+from my_commands.price_features import format_features
+from my_commands.price_store import get_price_series
+from my_commands.http_client import http
+from my_commands.single_flight import coalesce
 
-# 設定 API 金鑰
-openai.api_key = os.getenv("OPENAI_API_KEY")
-groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+# 分析使用的天數（本地歷史可以超過來源網頁提供的一年）
+LOOKBACK_DAYS = 365
+# 本地最新資料在這個天數內時，只需抓近三個月的頁面補齊
+INCREMENTAL_DAYS = 80
 
-# 建立 GPT 模型
-def get_reply(messages):
-    try:
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo-1106",
-            messages=messages)
-        reply = response["choices"][0]["message"]["content"]
-    except openai.OpenAIError as openai_err:
+def fetch_gold_prices(last_ts):
+    # 本地已有近期資料時只抓近三個月的頁面，否則抓整年
+    periods = ["ltm", "year"] if last_ts and time.time() - last_ts < INCREMENTAL_DAYS * 86400 else ["year"]
+    for period in periods:
         try:
-            response = groq_client.chat.completions.create(
-                model="llama3-70b-8192",
-                messages=messages,
-                max_tokens=1000,
-                temperature=1.2
-            )
-            reply = response.choices[0].message.content
-        except Exception as groq_err:
-            reply = f"OpenAI API 發生錯誤: {openai_err.error.message}，GROQ API 發生錯誤: {groq_err.message}"
-    return reply
+            response = http.get(f"https://rate.bot.com.tw/gold/chart/{period}/TWD")
+            response.raise_for_status()
+            response.encoding = 'utf-8'
+            df = pd.read_html(StringIO(response.text))[0]
+            break
+        except Exception:
+            if period == periods[-1]:
+                raise
+    return pd.Series(df["本行賣出價格"].values, index=pd.to_datetime(df["日期"], format="%Y/%m/%d"))
 
-def fetch_and_process_data():
-    # 取得和處理數據
-    df_list = pd.read_html("https://rate.bot.com.tw/gold/chart/year/TWD")
-    df = df_list[0]
-
-    # 數據處理
-    df = df[["日期", "本行賣出價格"]].copy()  # 複製以避免 SettingWithCopyWarning
-    df.index = pd.to_datetime(df["日期"], format="%Y/%m/%d")
-    df.sort_index(inplace=True)
+# 本地累積的金價歷史，只附加新日期
+gold_store = get_price_series("gold_twd", fetch_gold_prices)
 
+def fetch_and_process_data(days=LOOKBACK_DAYS):
+    # 取得和處理數據（讀本地資料，必要時增量更新）
+    series = gold_store.series(days=days)
+    df = series.rename("本行賣出價格").to_frame()
+    df.index.name = "日期"
     return df
 
 def generate_content_msg():
     # 取得和處理數據
     gold_prices_df = fetch_and_process_data()
 
-    # 從數據中取得需要的最高價和最低價資訊
-    max_price = gold_prices_df['本行賣出價格'].max()
-    min_price = gold_prices_df['本行賣出價格'].min()
-    last_date = gold_prices_df.index[-1].strftime("%Y-%m-%d")  # 假設最後一行是最新日期數據
+    # 以統計摘要（均線、回撤、波動度、週K）取代整年的價格表
+    features = format_features(gold_prices_df['本行賣出價格'], unit="台幣/公克")
 
     # 構造專業分析報告的內容
     content_msg = f'你現在是一位專業的金價分析師, 使用以下數據來撰寫分析報告:\n'
-    content_msg += f'{gold_prices_df}\n'
-    content_msg += f'最新日期: {last_date}, 最高金價: {max_price} {{日期}}, 最低金價: {min_price}{{日期}}。\n'
-    content_msg += '請給出完整的趨勢分析報告，顯示每日金價{日期}{金價}(台幣)，'
-    content_msg += '，使用繁體中文。'
+    content_msg += f'{features}\n'
+    content_msg += '請依據上述統計給出完整的趨勢分析報告，包含最高、最低金價及其日期、均線位置與近期週K走勢，'
+    content_msg += '使用繁體中文。'
 
     return content_msg
 
+@coalesce()
 def gold_gpt():
     content_msg = generate_content_msg()
     print(content_msg)  # 調試輸出
@@ -70,5 +66,5 @@ def gold_gpt():
         "content": content_msg
     }]
 
-    reply_data = get_reply(msg)
+    reply_data = get_reply(msg, "gold")
     return reply_data
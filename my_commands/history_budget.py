@@ -0,0 +1,142 @@
+import os
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from my_commands.llm_gateway import get_reply, is_error_reply, estimate_tokens
+
+# 每則訊息的格式額外 token（role、分隔符號）
+MESSAGE_OVERHEAD_TOKENS = 4
+# 對話紀錄可使用的 token 預算（不含摘要）
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", 1500))
+# 摘要本身的長度上限（字元）
+SUMMARY_MAX_CHARS = 800
+# 已離開緩衝區、等待併入摘要的訊息上限（摘要持續失敗時只保留最近的部分）
+MAX_EVICTED_BACKLOG = 100
+
+
+def message_tokens(message):
+    return estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+
+def select_history(messages, budget=HISTORY_TOKEN_BUDGET):
+    """
+    從最新的訊息往回挑選，總 token 不超過預算。
+
+    :return: (selected, older)；selected 為放進提示的訊息，older 為超出預算的較舊訊息。
+             最新一則訊息一定保留，過長時截斷。
+    """
+    selected = []
+    used = 0
+    for i in range(len(messages) - 1, -1, -1):
+        cost = message_tokens(messages[i])
+        if used + cost > budget:
+            if not selected:
+                # 單則就超過預算：依比例截斷內容
+                ratio = budget / cost
+                content = messages[i]["content"]
+                selected.append({**messages[i], "content": content[-max(int(len(content) * ratio), 1):]})
+                i -= 1
+            return list(reversed(selected)), messages[:i + 1]
+        selected.append(messages[i])
+        used += cost
+    return list(reversed(selected)), []
+
+
+def _fingerprint(message):
+    return hashlib.sha1(f'{message["role"]}:{message["content"]}'.encode('utf-8')).hexdigest()[:16]
+
+
+class RollingSummarizer:
+    """
+    把超出預算的舊對話折疊成摘要，於背景逐步更新。
+
+    摘要與「最後折疊的訊息指紋」存放在對話儲存中，每次只把新超出預算的訊息交給 LLM 併入摘要。
+    對話儲存的環狀緩衝區丟棄的訊息若尚未折疊，會先保留在 backlog，下次更新摘要時一併處理。
+    """
+
+    def __init__(self, store, max_workers=2):
+        self.store = store
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="history-summary")
+        self._running = set()
+        self._backlog = {}  # chat_id -> 已離開緩衝區、尚未併入摘要的訊息
+        self._lock = threading.Lock()
+
+    def evicted(self, chat_id, messages):
+        """
+        記錄對話儲存丟棄的訊息（store.append 的回傳值），尚未併入摘要的部分留待下次更新。
+        """
+        if not messages:
+            return
+        _, marker = self.store.get_summary(chat_id)
+        fingerprints = [_fingerprint(m) for m in messages]
+        if marker in fingerprints:
+            messages = messages[fingerprints.index(marker) + 1:]
+        elif marker is not None and marker in {_fingerprint(m) for m in self.store.messages(chat_id)}:
+            # 最後折疊的訊息還在緩衝區內，表示丟棄的訊息都已在摘要中
+            messages = []
+        if not messages:
+            return
+        with self._lock:
+            backlog = self._backlog.setdefault(chat_id, [])
+            backlog.extend(messages)
+            del backlog[:-MAX_EVICTED_BACKLOG]
+
+    def build_messages(self, chat_id, messages, budget=HISTORY_TOKEN_BUDGET):
+        """
+        產生送給 LLM 的訊息：摘要（若有）＋預算內的最近對話，必要時排程背景更新摘要。
+        """
+        summary, marker = self.store.get_summary(chat_id)
+        budget -= estimate_tokens(summary) if summary else 0
+        selected, older = select_history(messages, max(budget, 0))
+        if older or chat_id in self._backlog:
+            self._schedule(chat_id, summary, marker, older)
+        if summary:
+            selected = [{"role": "system", "content": f"先前對話摘要：{summary}"}] + selected
+        return selected
+
+    def _schedule(self, chat_id, summary, marker, older):
+        # 找出上次折疊到哪一則，只處理之後的新訊息
+        fingerprints = [_fingerprint(m) for m in older]
+        start = fingerprints.index(marker) + 1 if marker in fingerprints else 0
+        with self._lock:
+            if chat_id in self._running:
+                return
+            backlog = list(self._backlog.get(chat_id, []))
+            pending = backlog + older[start:]
+            if not pending:
+                return
+            self._running.add(chat_id)
+        self._executor.submit(self._summarize, chat_id, summary, pending, _fingerprint(pending[-1]), len(backlog))
+
+    def _summarize(self, chat_id, summary, pending, marker, from_backlog=0):
+        try:
+            transcript = "\n".join(f'{m["role"]}: {m["content"]}' for m in pending)
+            msg = [{
+                "role": "system",
+                "content": f"請將對話整理成精簡的繁體中文摘要（{SUMMARY_MAX_CHARS} 字以內），保留使用者的需求、偏好與重要事實。"
+            }, {
+                "role": "user",
+                "content": f"既有摘要：{summary or '（無）'}\n新增對話：\n{transcript}\n請輸出更新後的完整摘要。"
+            }]
+            new_summary = get_reply(msg, "summary")
+            if not is_error_reply(new_summary):
+                self.store.set_summary(chat_id, new_summary[:SUMMARY_MAX_CHARS], marker)
+                self._consume_backlog(chat_id, pending[:from_backlog])
+        except Exception as e:
+            print(f"對話摘要更新失敗: {e}")
+        finally:
+            with self._lock:
+                self._running.discard(chat_id)
+
+    def _consume_backlog(self, chat_id, folded):
+        """移除已併入摘要的 backlog 訊息（摘要產生期間可能又有新訊息加入）"""
+        with self._lock:
+            backlog = self._backlog.get(chat_id, [])
+            if backlog[:len(folded)] == folded:
+                del backlog[:len(folded)]
+            else:
+                # backlog 在產生期間超過上限被截斷，只保留之後新加入的部分
+                keep = [m for m in backlog if m not in folded]
+                backlog[:] = keep
+            if not backlog:
+                self._backlog.pop(chat_id, None)
@@ -0,0 +1,127 @@
+import os
+import time
+import threading
+from collections import defaultdict, deque
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# 預設逾時（連線, 讀取）秒數，呼叫端可以用 timeout= 覆寫
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 3.05))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", 15))
+# 冪等請求（GET/HEAD/OPTIONS）遇到連線錯誤或以下狀態碼時的重試次數與退避係數
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", 2))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", 0.5))
+RETRY_STATUS = (429, 500, 502, 503, 504)
+# Retry-After 最多等待的秒數（例如 429 要求等 60 秒時只等這麼久），避免卡住處理使用者請求的 worker
+HTTP_MAX_RETRY_AFTER = float(os.getenv("HTTP_MAX_RETRY_AFTER", 2))
+# 每個網站保留的 keep-alive 連線數
+POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", 10))
+# 延遲統計保留的最近筆數
+LATENCY_SAMPLES = 200
+
+
+class _HostStats:
+    __slots__ = ("requests", "errors", "statuses", "latencies")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.statuses = defaultdict(int)
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+
+class CappedRetry(Retry):
+    """遵守 Retry-After，但等待時間不超過 max_retry_after 秒（退避時間也不超過）"""
+
+    max_retry_after = HTTP_MAX_RETRY_AFTER
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, self.max_retry_after)
+
+
+class HttpClient:
+    """
+    所有資料模組共用的 HTTP client。
+
+    - 同一網站重複使用 keep-alive 連線（每個網站一個連線池）。
+    - 每個請求都有預設的連線/讀取逾時，不會因為上游沒回應而卡住 worker。
+    - 只有冪等的 GET/HEAD/OPTIONS 會自動重試（指數退避，遵守 Retry-After，最多等 HTTP_MAX_RETRY_AFTER 秒）。
+    - 依網站統計請求數、錯誤數、狀態碼與延遲。
+    """
+
+    def __init__(self, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT), retries=HTTP_RETRIES,
+                 backoff=HTTP_BACKOFF, pool_maxsize=POOL_MAXSIZE):
+        self.timeout = timeout
+        self.session = requests.Session()
+        retry = CappedRetry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff,
+            backoff_max=HTTP_MAX_RETRY_AFTER,
+            status_forcelist=RETRY_STATUS,
+            allowed_methods=frozenset(["GET", "HEAD", "OPTIONS"]),
+            raise_on_status=False,
+            respect_retry_after_header=True,
+        )
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=pool_maxsize, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._stats = defaultdict(_HostStats)
+        self._lock = threading.Lock()
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        host = urlsplit(url).hostname or ""
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except requests.exceptions.RequestException:
+            with self._lock:
+                stats = self._stats[host]
+                stats.requests += 1
+                stats.errors += 1
+            raise
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            stats = self._stats[host]
+            stats.requests += 1
+            stats.statuses[response.status_code] += 1
+            stats.latencies.append(elapsed)
+            if response.status_code >= 500:
+                stats.errors += 1
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+    def stats(self):
+        """各網站的請求數、錯誤數、狀態碼與延遲（毫秒）"""
+        with self._lock:
+            result = {}
+            for host, stats in self._stats.items():
+                latencies = sorted(stats.latencies)
+                result[host] = {
+                    "requests": stats.requests,
+                    "errors": stats.errors,
+                    "statuses": dict(stats.statuses),
+                    "avg_ms": round(sum(latencies) / len(latencies) * 1000, 1) if latencies else None,
+                    "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1 if len(latencies) > 1 else 0] * 1000, 1)
+                    if latencies else None,
+                }
+            return result
+
+
+http = HttpClient()
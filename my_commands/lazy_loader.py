@@ -0,0 +1,114 @@
+import os
+import sys
+import time
+import importlib
+import threading
+
+# 模組名稱 -> 載入耗時（秒），只記錄經由本模組延遲載入的部分
+import_times = {}
+_import_lock = threading.Lock()
+
+
+def timed_import(module_name):
+    """載入模組並記錄耗時（已載入的模組直接回傳）"""
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+    with _import_lock:
+        module = sys.modules.get(module_name)
+        if module is not None:
+            return module
+        start = time.perf_counter()
+        module = importlib.import_module(module_name)
+        import_times[module_name] = time.perf_counter() - start
+        print(f"* lazy_loader 載入 {module_name} {import_times[module_name] * 1000:.0f} ms")
+        return module
+
+
+class LazyCommand:
+    """
+    以 "模組:函數" 指定的指令處理函數，第一次呼叫時才載入模組。
+
+    讓 pandas、yfinance、爬蟲等重量級相依套件不在啟動時載入。
+    """
+
+    def __init__(self, target):
+        self.target = target
+        self.module_name, self.attr = target.split(":")
+        self._func = None
+
+    def load(self):
+        if self._func is None:
+            self._func = getattr(timed_import(self.module_name), self.attr)
+        return self._func
+
+    @property
+    def loaded(self):
+        return self._func is not None
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
+
+    def __repr__(self):
+        return f"LazyCommand({self.target!r}, loaded={self.loaded})"
+
+
+def lazy_commands(targets):
+    """把 {指令: "模組:函數"} 轉成 {指令: LazyCommand}"""
+    return {name: LazyCommand(target) for name, target in targets.items()}
+
+
+def warm_up(commands, delay=0.0, then=None):
+    """
+    在背景依序載入所有指令模組（伺服器開始接受請求後執行，不影響冷啟動時間）。
+
+    :param delay: 開始前等待的秒數。
+    :param then: 全部載入後要執行的函數（例如啟動預先計算排程）。
+    """
+    def run():
+        time.sleep(delay)
+        for command in commands.values():
+            try:
+                command.load()
+            except Exception as e:
+                print(f"* lazy_loader 預先載入失敗 {command.target}: {e}")
+        print(f"* lazy_loader 預先載入完成 {import_report()['lazy_total_ms']} ms")
+        if then is not None:
+            then()
+
+    thread = threading.Thread(target=run, name="command-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def process_uptime():
+    """
+    目前行程已執行的秒數，由 /proc/self/stat 的啟動時間計算，不需要在程式最前面記錄時間。
+
+    :return: 秒數；沒有 /proc 的系統回傳 None。
+    """
+    try:
+        with open('/proc/self/stat', encoding='utf-8') as f:
+            stat = f.read()
+        with open('/proc/uptime', encoding='utf-8') as f:
+            uptime = float(f.read().split()[0])
+        # 行程名稱可能含空白，從最後一個 ")" 之後算起；starttime 是第 22 欄（開機後的 clock ticks）
+        start_ticks = int(stat.rsplit(')', 1)[1].split()[19])
+        return max(uptime - start_ticks / os.sysconf('SC_CLK_TCK'), 0.0)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def import_report(startup_seconds=None):
+    """啟動與延遲載入的耗時報告（毫秒）"""
+    report = {
+        "lazy_modules_ms": {
+            name: round(seconds * 1000, 1)
+            for name, seconds in sorted(import_times.items(), key=lambda item: -item[1])
+        },
+        "lazy_total_ms": round(sum(import_times.values()) * 1000, 1),
+        "modules_loaded": len(sys.modules),
+    }
+    if startup_seconds is not None:
+        report["startup_ms"] = round(startup_seconds * 1000, 1)
+    return report
@@ -0,0 +1,211 @@
+import os
+import time
+import threading
+import importlib.util
+from contextlib import contextmanager
+from my_commands.rate_limiter import groq_limiter
+
+# groq/httpx/openai 載入約需 0.3 秒，第一次呼叫 LLM 時才載入（openai 為選用套件，有設定 OPENAI_API_KEY 時才會優先使用）
+HAS_OPENAI = importlib.util.find_spec("openai") is not None
+
+# 各指令的模型設定（模型、溫度、最大 token 數）
+PROFILES = {
+    "chat": {"model": "llama3-8b-8192", "max_tokens": 2000, "temperature": 1.2},
+    "summary": {"model": "llama3-8b-8192", "max_tokens": 600, "temperature": 0.3},
+    "girlfriend": {"model": "llama3-8b-8192", "max_tokens": 2048, "temperature": 1.5, "top_p": 1},
+    "stock": {"model": "llama3-70b-8192", "max_tokens": 2000, "temperature": 1.2},
+    "lottery": {"model": "llama3-70b-8192", "max_tokens": 2000, "temperature": 1.2},
+    "gold": {"model": "llama3-70b-8192", "max_tokens": 1000, "temperature": 1.2, "openai_first": True},
+    "money": {"model": "llama3-70b-8192", "max_tokens": 1000, "temperature": 1.2, "openai_first": True},
+    "partjob": {"model": "llama3-70b-8192", "max_tokens": 5000, "temperature": 1.2, "openai_first": True},
+    "platinum": {"model": "mixtral-8x7b-32768", "max_tokens": 1500, "temperature": 1.2, "openai_first": True},
+    "crypto": {"model": "mixtral-8x7b-32768", "max_tokens": 1500, "temperature": 1.2, "openai_first": True},
+    "one04": {"model": "mixtral-8x7b-32768", "max_tokens": 1500, "temperature": 1.2, "openai_first": True},
+}
+DEFAULT_PROFILE = "chat"
+
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo-1106")
+# 主要模型失敗後依序嘗試的 Groq 模型
+FALLBACK_MODELS = [m for m in os.getenv("LLM_FALLBACK_MODELS", "llama3-70b-8192,llama3-8b-8192").split(",") if m]
+# 連線與讀取逾時（秒）
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", 5))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", 60))
+# 可重試錯誤（連線、5xx）的重試次數與退避秒數；限流錯誤不重試，直接改用備援模型
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))
+LLM_RETRY_BACKOFF = float(os.getenv("LLM_RETRY_BACKOFF", 1.0))
+BUSY_MESSAGE = "目前使用人數較多，請稍後再試一次。"
+ERROR_PREFIX = "GROQ API 發生錯誤"
+
+_groq_errors = None
+
+
+def groq_errors():
+    """(限流錯誤, 可重試的錯誤（連線、5xx）)"""
+    global _groq_errors
+    if _groq_errors is None:
+        import groq
+        _groq_errors = (groq.RateLimitError, (groq.APIConnectionError, groq.InternalServerError))
+    return _groq_errors
+
+
+class QuotaExceeded(Exception):
+    """Groq 額度目前不足（需要等待才能送出）"""
+
+
+_client = None
+_client_lock = threading.Lock()
+# 目前執行緒是否為背景工作（預先計算），背景工作只使用 groq_limiter 的背景額度
+_context = threading.local()
+
+
+@contextmanager
+def background_calls():
+    """在此區塊內的 LLM 呼叫視為背景工作：額度不足時不改用備援模型，直接回傳 BUSY_MESSAGE"""
+    previous = getattr(_context, "background", False)
+    _context.background = True
+    try:
+        yield
+    finally:
+        _context.background = previous
+
+
+def in_background():
+    return getattr(_context, "background", False)
+
+
+def get_client():
+    """取得共用的 Groq client（keep-alive 連線池，整個行程只建立一次）"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import httpx
+                from groq import Groq
+                http_client = httpx.Client(
+                    limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60),
+                    timeout=httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+                )
+                # 重試由本模組統一處理，關閉 SDK 內建重試
+                _client = Groq(api_key=os.getenv("GROQ_API_KEY"), http_client=http_client, max_retries=0)
+    return _client
+
+
+def _is_cjk(ch):
+    code = ord(ch)
+    return (0x4E00 <= code <= 0x9FFF or 0x3400 <= code <= 0x4DBF or 0x3000 <= code <= 0x303F
+            or 0xFF00 <= code <= 0xFFEF or 0x3040 <= code <= 0x30FF or 0xAC00 <= code <= 0xD7AF)
+
+
+def estimate_tokens(text):
+    """
+    以字元類型估計 token 數：中日韓文字約 1 字 1 token，其餘約 4 字元 1 token。
+
+    不需要下載 tokenizer，誤差在 ±20% 內，足以用來控制提示長度。
+    """
+    cjk = sum(1 for ch in text if _is_cjk(ch))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _prompt_tokens(messages):
+    return sum(estimate_tokens(m["content"]) + 4 for m in messages)
+
+
+def _providers(profile):
+    """依設定產生呼叫順序：(供應商, 模型)"""
+    order = []
+    if profile.get("openai_first") and HAS_OPENAI and os.getenv("OPENAI_API_KEY"):
+        order.append(("openai", OPENAI_MODEL))
+    order.append(("groq", profile["model"]))
+    for model in FALLBACK_MODELS:
+        if ("groq", model) not in order:
+            order.append(("groq", model))
+    return order
+
+
+def _call_openai(model, messages):
+    import openai
+    openai.api_key = os.getenv("OPENAI_API_KEY")
+    response = openai.ChatCompletion.create(
+        model=model,
+        messages=messages,
+        request_timeout=LLM_READ_TIMEOUT,
+    )
+    return response["choices"][0]["message"]["content"]
+
+
+def _call_groq(model, messages, profile):
+    params = {
+        "model": model,
+        "messages": messages,
+        "max_tokens": profile["max_tokens"],
+        "temperature": profile["temperature"],
+    }
+    if "top_p" in profile:
+        params["top_p"] = profile["top_p"]
+    # 額度同時計入提示與回覆上限，回應後再以實際用量修正
+    tokens = _prompt_tokens(messages) + profile["max_tokens"]
+    background = in_background()
+    if background:
+        if not groq_limiter.reserve_background(model, tokens):
+            raise QuotaExceeded("背景額度已用完")
+    else:
+        delay = groq_limiter.reserve(model, tokens)
+        if delay > 0:
+            # 不在處理請求的執行緒中等待額度（未扣除額度），改用下一個模型或回覆忙碌訊息
+            raise QuotaExceeded(f"額度需等待 {delay:.1f} 秒")
+    try:
+        response = get_client().chat.completions.create(**params)
+    except Exception:
+        # 請求失敗（限流、連線、5xx）時歸還預約，重試會重新預約
+        groq_limiter.cancel(model, tokens, background)
+        raise
+    usage = getattr(response, "usage", None)
+    groq_limiter.settle(model, tokens, getattr(usage, "total_tokens", None), background)
+    return response.choices[0].message.content
+
+
+def get_reply(messages, profile_name=DEFAULT_PROFILE):
+    """
+    依指令設定呼叫 LLM，失敗時依序重試與切換備援模型。
+
+    :param messages: Chat Completion 格式的訊息列表。
+    :param profile_name: PROFILES 中的設定名稱。
+    :return: 模型回覆文字，全部失敗時回傳錯誤說明。
+    """
+    profile = PROFILES.get(profile_name, PROFILES[DEFAULT_PROFILE])
+    print(f"* llm_gateway get_reply ({profile_name})")
+    errors = []
+    throttled = 0
+    rate_limited, retryable = groq_errors()
+    for provider, model in _providers(profile):
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            try:
+                if provider == "openai":
+                    return _call_openai(model, messages)
+                return _call_groq(model, messages, profile)
+            except retryable as e:
+                if attempt < LLM_MAX_RETRIES:
+                    time.sleep(LLM_RETRY_BACKOFF * (2 ** attempt))
+                    continue
+                errors.append(f"{provider}/{model}: {e}")
+            except (QuotaExceeded, rate_limited) as e:
+                # 額度不足或被 Groq 限流：不在處理請求的執行緒中等待，直接改用下一個模型或回覆忙碌訊息
+                if in_background():
+                    # 背景工作不改用較小的備援模型，稍後再以原模型重新計算
+                    print(f"* llm_gateway 背景呼叫略過 {model}: {e}")
+                    return BUSY_MESSAGE
+                throttled += 1
+                errors.append(f"{provider}/{model}: {e}")
+                break
+            except Exception as e:
+                errors.append(f"{provider}/{model}: {e}")
+                break
+    print(f"LLM 呼叫全部失敗: {errors}")
+    if throttled and throttled == len(errors):
+        return BUSY_MESSAGE
+    return f"{ERROR_PREFIX}: {errors[-1] if errors else '未知錯誤'}"
+
+
+def is_error_reply(reply):
+    """get_reply 的回傳值是否為錯誤或忙碌訊息（不應快取或當成摘要保存）"""
+    return not reply or reply == BUSY_MESSAGE or reply.startswith(ERROR_PREFIX)
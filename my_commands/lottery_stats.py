@@ -0,0 +1,309 @@
+import os
+import json
+import threading
+import datetime as dt
+from concurrent.futures import ThreadPoolExecutor
+from zoneinfo import ZoneInfo
+import numpy as np
+from TaiwanLottery import TaiwanLotteryCrawler
+from my_commands.ttl_cache import TTLCache
+from my_commands.http_client import http
+
+TZ = ZoneInfo("Asia/Taipei")
+# 開獎時間約 20:30，官方資料通常在之後半小時內更新
+DRAW_TIME = dt.time(20, 30)
+PUBLISH_DELAY = dt.timedelta(minutes=30)
+# 統計使用的月數；0（預設）表示官方 API 查得到的全部歷史（每個月一次 API 呼叫）
+LOTTERY_HISTORY_MONTHS = int(os.getenv("LOTTERY_HISTORY_MONTHS", 0))
+# 往回查到連續幾個月沒有開獎紀錄時，視為已到該彩種最早的資料
+EMPTY_MONTHS_TO_STOP = 3
+# 最早只查到這個年月
+HISTORY_START = (2004, 1)
+# 過去月份的開獎紀錄不會再變，保存在磁碟上，重啟後不必重新下載
+HISTORY_DIR = os.getenv(
+    "LOTTERY_HISTORY_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.cache', 'lottery'),
+)
+# 補抓歷史月份時的並行數
+HISTORY_FETCH_WORKERS = 6
+RECENT_DRAWS_IN_PROMPT = 10
+TOP_N = 6
+
+MON_TO_SAT = (0, 1, 2, 3, 4, 5)
+# 彩種：爬蟲方法、號碼欄位、號碼範圍、開獎星期（0 = 星期一）
+GAMES = {
+    "威力彩": {"method": "super_lotto", "field": "第一區", "low": 1, "high": 38, "weekdays": (0, 3),
+            "extra": ("第二區", 1, 8)},
+    "大樂透": {"method": "lotto649", "field": "獎號", "low": 1, "high": 49, "weekdays": (1, 4),
+            "extra": ("特別號", 1, 49)},
+    "539": {"method": "daily_cash", "field": "獎號", "low": 1, "high": 39, "weekdays": MON_TO_SAT},
+    "雙贏彩": {"method": "lotto1224", "field": "獎號", "low": 1, "high": 24, "weekdays": MON_TO_SAT},
+    "3星彩": {"method": "lotto3d", "field": "獎號", "low": 0, "high": 9, "weekdays": MON_TO_SAT, "digits": True},
+    "4星彩": {"method": "lotto4d", "field": "獎號", "low": 0, "high": 9, "weekdays": MON_TO_SAT, "digits": True},
+    "38樂合彩": {"method": "lotto38m6", "field": "獎號", "low": 1, "high": 38, "weekdays": (0, 3)},
+    "39樂合彩": {"method": "lotto39m5", "field": "獎號", "low": 1, "high": 39, "weekdays": MON_TO_SAT},
+    "49樂合彩": {"method": "lotto49m6", "field": "獎號", "low": 1, "high": 49, "weekdays": (1, 4)},
+}
+# 使用者輸入中的彩種關鍵字（依序比對，較長的名稱放前面）
+GAME_KEYWORDS = [
+    ("威力", "威力彩"), ("大樂", "大樂透"), ("38樂合彩", "38樂合彩"), ("39樂合彩", "39樂合彩"),
+    ("49樂合彩", "49樂合彩"), ("539", "539"), ("雙贏彩", "雙贏彩"), ("3星彩", "3星彩"), ("三星彩", "3星彩"),
+    ("4星彩", "4星彩"), ("四星彩", "4星彩"),
+]
+
+
+class PooledLotteryCrawler(TaiwanLotteryCrawler):
+    """改用共用的 HTTP client（keep-alive、逾時、重試）"""
+
+    def get_lottery_result(self, url):
+        response = http.get(url)
+        response.raise_for_status()
+        return response.json()
+
+
+class MonthArchive:
+    """過去月份的開獎紀錄（每個彩種一個 JSON 檔，{"YYYY-MM": 紀錄}，沒有開獎的月份存空列表）"""
+
+    def __init__(self, directory=HISTORY_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._games = {}
+
+    def _path(self, game):
+        return os.path.join(self.directory, f"{GAMES[game]['method']}.json")
+
+    def _load(self, game):
+        months = self._games.get(game)
+        if months is None:
+            try:
+                with open(self._path(game), encoding='utf-8') as f:
+                    months = json.load(f)
+            except (OSError, ValueError):
+                months = {}
+            self._games[game] = months
+        return months
+
+    def get(self, game, year, month):
+        with self._lock:
+            return self._load(game).get(f"{year}-{month:02d}")
+
+    def update(self, game, fetched):
+        """:param fetched: {(year, month): 紀錄}"""
+        if not fetched:
+            return
+        with self._lock:
+            months = self._load(game)
+            months.update({f"{year}-{month:02d}": records for (year, month), records in fetched.items()})
+            snapshot = dict(months)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{self._path(game)}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(game))
+        except OSError as e:
+            print(f"無法寫入開獎紀錄快取: {e}")
+
+
+crawler = PooledLotteryCrawler()
+# 本月的開獎紀錄快取到下一次開獎
+draw_cache = TTLCache(maxsize=len(GAMES))
+archive = MonthArchive()
+
+
+def game_of(lottery_type):
+    for keyword, game in GAME_KEYWORDS:
+        if keyword in lottery_type:
+            return game
+    return None
+
+
+def next_draw(game, now=None):
+    """下一次開獎結果公布的時間"""
+    now = (now or dt.datetime.now(TZ)).astimezone(TZ)
+    weekdays = GAMES[game]["weekdays"]
+    for days in range(8):
+        day = now.date() + dt.timedelta(days=days)
+        publish_at = dt.datetime.combine(day, DRAW_TIME, tzinfo=TZ) + PUBLISH_DELAY
+        if day.weekday() in weekdays and publish_at > now:
+            return publish_at
+    raise ValueError(f"{game} 沒有開獎日")
+
+
+def _months(count, now):
+    year, month = now.year, now.month
+    for _ in range(count):
+        yield year, month
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+
+
+def _crawl(game, year, month):
+    # 預設參數在爬蟲模組載入時就固定了，必須明確傳入年月
+    return getattr(crawler, GAMES[game]["method"])([str(year), f"{month:02d}"])
+
+
+def fetch_month(game, year, month, now=None):
+    """取得本月的開獎紀錄，快取到下一次開獎"""
+    now = (now or dt.datetime.now(TZ)).astimezone(TZ)
+    key = (game, year, month)
+    records = draw_cache.get(key)
+    if records is not None:
+        return records
+    records = _crawl(game, year, month)
+    ttl = (next_draw(game, now) - now).total_seconds()
+    draw_cache.set(key, records, max(int(ttl), 60))
+    return records
+
+
+def fetch_past_months(game, months):
+    """
+    取得過去月份的開獎紀錄：已保存的直接讀取，其餘並行下載後寫入磁碟。
+
+    :return: {(year, month): 紀錄}；下載失敗的月份不在結果中（下次再試）。
+    """
+    result = {}
+    missing = []
+    for year, month in months:
+        records = archive.get(game, year, month)
+        if records is None:
+            missing.append((year, month))
+        else:
+            result[(year, month)] = records
+    if missing:
+        with ThreadPoolExecutor(max_workers=HISTORY_FETCH_WORKERS) as executor:
+            futures = {ym: executor.submit(_crawl, game, *ym) for ym in missing}
+        fetched = {}
+        for ym, future in futures.items():
+            try:
+                fetched[ym] = future.result()
+            except Exception as e:
+                print(f"{game} {ym[0]}-{ym[1]:02d} 開獎紀錄下載失敗: {e}")
+        archive.update(game, fetched)
+        result.update(fetched)
+    return result
+
+
+def draw_history(game, months=LOTTERY_HISTORY_MONTHS, now=None):
+    """
+    開獎紀錄，依期別由舊到新排列。
+
+    :param months: 包含本月在內的月數；0 表示往回查到連續 EMPTY_MONTHS_TO_STOP 個月沒有資料（全部歷史）。
+    """
+    now = (now or dt.datetime.now(TZ)).astimezone(TZ)
+    records = list(fetch_month(game, now.year, now.month, now))
+    past = [ym for ym in _months(months or (now.year - HISTORY_START[0] + 1) * 12, now) if ym >= HISTORY_START][1:]
+    empty_run = 0
+    # 以一年為一批往回查，查到連續沒有資料的月份就停止
+    for start in range(0, len(past), 12):
+        batch = past[start:start + 12]
+        fetched = fetch_past_months(game, batch)
+        for ym in batch:
+            if ym not in fetched:
+                empty_run = 0
+                continue
+            records.extend(fetched[ym])
+            empty_run = 0 if fetched[ym] else empty_run + 1
+        if not months and empty_run >= EMPTY_MONTHS_TO_STOP:
+            break
+    return sorted(records, key=lambda r: str(r["期別"]))
+
+
+def _matrix(records, field):
+    return np.array([[int(n) for n in r[field]] for r in records if r.get(field)], dtype=np.int16)
+
+
+def number_stats(draws, low, high):
+    """
+    以 NumPy 計算各號碼的出現次數、遺漏期數與兩兩同開次數。
+
+    :param draws: (期數, 每期號碼數) 的整數陣列，由舊到新。
+    """
+    numbers = np.arange(low, high + 1)
+    hits = np.zeros((len(draws), len(numbers)), dtype=np.int32)
+    if len(draws):
+        rows = np.repeat(np.arange(len(draws)), draws.shape[1])
+        hits[rows, draws.ravel() - low] = 1
+    frequency = hits.sum(axis=0)
+    # 遺漏期數：最近一次開出後經過的期數，從未開出則為總期數
+    gap = np.where(hits.any(axis=0), np.argmax(hits[::-1], axis=0), len(draws))
+    pairs = hits.T @ hits
+    i, j = np.triu_indices(len(numbers), k=1)
+    pair_counts = pairs[i, j]
+    top_pairs = np.argsort(-pair_counts, kind='stable')[:5]
+
+    # 熱門：次數多、遺漏少；冷門：次數少、遺漏多
+    hot = np.lexsort((gap, -frequency))[:TOP_N]
+    cold = np.lexsort((-gap, frequency))[:TOP_N]
+    return {
+        "draws": len(draws),
+        "expected": draws.size / len(numbers) if len(draws) else 0,
+        "hot": [(int(numbers[k]), int(frequency[k])) for k in hot],
+        "cold": [(int(numbers[k]), int(frequency[k])) for k in cold],
+        "longest_gap": [(int(numbers[k]), int(gap[k])) for k in np.argsort(-gap, kind='stable')[:TOP_N]],
+        "pairs": [(int(numbers[i[k]]), int(numbers[j[k]]), int(pair_counts[k])) for k in top_pairs if pair_counts[k]],
+    }
+
+
+def digit_stats(draws):
+    """星彩類：各位數 0-9 的出現次數"""
+    counts = np.stack([np.bincount(draws[:, pos], minlength=10) for pos in range(draws.shape[1])]) \
+        if len(draws) else np.zeros((0, 10), dtype=int)
+    return counts
+
+
+def _format_pairs(items, unit):
+    return "、".join(f"{n:02d}({v}{unit})" for n, v in items)
+
+
+def format_stats(game, records):
+    """把開獎紀錄整理成給 LLM 的統計事實"""
+    info = GAMES[game]
+    draws = _matrix(records, info["field"])
+    lines = [f"{game} 統計期間: {records[0]['開獎日期'][:10]} ~ {records[-1]['開獎日期'][:10]}，共 {len(draws)} 期"]
+
+    if info.get("digits"):
+        for pos, counts in enumerate(digit_stats(draws), start=1):
+            order = np.argsort(-counts, kind='stable')
+            lines.append(f"第{pos}位 最熱: {', '.join(str(d) for d in order[:3])}，最冷: {', '.join(str(d) for d in order[-3:])}")
+    else:
+        stats = number_stats(draws, info["low"], info["high"])
+        lines.append(f"每個號碼平均出現 {stats['expected']:.1f} 次")
+        lines.append(f"最熱號碼(次數): {_format_pairs(stats['hot'], '次')}")
+        lines.append(f"最冷號碼(次數): {_format_pairs(stats['cold'], '次')}")
+        lines.append(f"遺漏最久(期數): {_format_pairs(stats['longest_gap'], '期')}")
+        lines.append("最常同時開出: " + "、".join(f"{a:02d}+{b:02d}({c}次)" for a, b, c in stats["pairs"]))
+        if "extra" in info:
+            field, low, high = info["extra"]
+            extra = np.array([[int(r[field])] for r in records if r.get(field) is not None], dtype=np.int16)
+            extra_stats = number_stats(extra, low, high)
+            lines.append(f"{field} 最熱: {_format_pairs(extra_stats['hot'][:3], '次')}，"
+                         f"最冷: {_format_pairs(extra_stats['cold'][:3], '次')}")
+
+    lines.append(f"最近 {min(RECENT_DRAWS_IN_PROMPT, len(records))} 期:")
+    for r in records[-RECENT_DRAWS_IN_PROMPT:]:
+        width = 1 if info.get("digits") else 2
+        numbers = " ".join(f"{int(n):0{width}d}" for n in r[info["field"]])
+        extra = f" + {int(r[info['extra'][0]]):02d}" if "extra" in info and r.get(info["extra"][0]) is not None else ""
+        lines.append(f"{r['期別']} {r['開獎日期'][:10]}: {numbers}{extra}")
+    return "\n".join(lines)
+
+
+def lottery_facts(lottery_type):
+    """依使用者輸入的彩種回傳預先計算的統計文字；不支援的彩種回傳 None"""
+    game = game_of(lottery_type)
+    if game is None:
+        return None
+    records = draw_history(game)
+    if not records:
+        raise ValueError(f"查無 {game} 開獎資料")
+    return format_stats(game, records)
+
+
+if __name__ == "__main__":
+    # 以隨機模擬的開獎資料檢查統計結果
+    rng = np.random.default_rng(0)
+    fake = [{"期別": f"{113000000 + i}", "開獎日期": f"2026-01-{i % 28 + 1:02d}T00:00:00",
+             "獎號": sorted(rng.choice(np.arange(1, 50), 6, replace=False).tolist()), "特別號": int(rng.integers(1, 50))}
+            for i in range(150)]
+    print(format_stats("大樂透", fake))
+    print(next_draw("威力彩"), next_draw("539"))
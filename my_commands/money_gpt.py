@@ -1,41 +1,46 @@
-import os
-import openai
-from groq import Groq
 from datetime import datetime
 import pandas as pd
-import requests
 from bs4 import BeautifulSoup
-
-# 設定 API 金鑰
-openai.api_key = os.getenv("OPENAI_API_KEY")
-groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-
-# 建立 GPT 模型
-def get_reply(messages):
+from my_commands.http_client import http
+from my_commands.llm_gateway import get_reply
+from my_commands.price_features import format_features
+from my_commands.price_store import get_price_series
+from my_commands.single_flight import coalesce
+
+# 日線歷史的分析天數
+HISTORY_DAYS = 180
+
+def fetch_daily_rates(kind):
+    """台銀近三個月的每日即期賣出匯率（本地歷史增量更新用）"""
+    response = http.get(f"https://rate.bot.com.tw/xrt/quote/ltm/{kind}")
+    response.raise_for_status()
+    soup = BeautifulSoup(response.text, 'html.parser')
+    dates = []
+    rates = []
+    for row in soup.select("table tbody tr"):
+        columns = [td.get_text(strip=True) for td in row.find_all('td')]
+        # 掛牌日期、幣別、現金買入、現金賣出、即期買入、即期賣出
+        if len(columns) >= 6:
+            dates.append(columns[0])
+            rates.append(columns[5])
+    return pd.Series(rates, index=pd.to_datetime(dates, format="%Y/%m/%d"))
+
+def daily_history(kind):
+    """取得本地累積的日線匯率，來源失敗且沒有本地資料時回傳 None"""
+    store = get_price_series(f"fx_{kind}", lambda last_ts: fetch_daily_rates(kind))
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo-1106",
-            messages=messages)
-        reply = response["choices"][0]["message"]["content"]
-    except openai.OpenAIError as openai_err:
-        try:
-            response = groq_client.chat.completions.create(
-                model="llama3-70b-8192",
-                messages=messages,
-                max_tokens=1000,
-                temperature=1.2
-            )
-            reply = response.choices[0].message.content
-        except Exception as groq_err:
-            reply = f"OpenAI API 發生錯誤: {openai_err.error.message}，GROQ API 發生錯誤: {groq_err.message}"
-    return reply
+        series = store.series(days=HISTORY_DAYS)
+    except Exception as e:
+        print(f"無法取得 {kind} 日線匯率: {e}")
+        return None
+    return series if not series.empty else None
 
 def fetch_jpy_rates(kind):
     # 目標網址
     url = f"https://rate.bot.com.tw/xrt/quote/day/{kind}"
 
     # 發送HTTP請求
-    response = requests.get(url)
+    response = http.get(url)
 
     # 確定HTTP請求成功
     if response.status_code == 200:
@@ -83,12 +88,16 @@ def generate_content_msg(kind):
     # 构造专业分析报告的内容
     content_msg = f'你現在是一位專業的{kind}幣種分析師, 使用以下数据来撰写分析报告:\n'
     content_msg += f'{money_prices_df} 顯示最近的30筆,\n'
+    history = daily_history(kind)
+    if history is not None:
+        content_msg += f'近{HISTORY_DAYS}天日線統計:\n{format_features(history, unit=f"台幣/{kind}")}\n'
     content_msg += f'最新日期: {last_date}, 最高價: {max_price} {{日期}}-{{時間}}, 最低價: {min_price}{{日期}}-{{時間}}。\n'
     content_msg += '請給出完整的趨勢分析報告，顯示每日匯率{日期-時間}{匯率}(幣種/台幣)，'
     content_msg += '使用繁體中文。'
 
     return content_msg
 
+@coalesce(key_func=lambda kind: kind.upper())
 def money_gpt(kind):
     content_msg = generate_content_msg(kind)
     print(content_msg)  # 调试输出
@@ -101,5 +110,5 @@ def money_gpt(kind):
         "content": content_msg
     }]
 
-    reply_data = get_reply(msg)
+    reply_data = get_reply(msg, "money")
     return reply_data
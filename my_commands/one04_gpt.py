@@ -1,89 +1,48 @@
 import os
-import openai
-from groq import Groq
 import requests
-import time
-import random
 from bs4 import BeautifulSoup
 import json
+from my_commands.http_client import http
+from my_commands.llm_gateway import get_reply
+from my_commands.polite_fetcher import scheduler
+from my_commands.ttl_cache import TTLCache
 
-# 設定 API 金鑰
-openai.api_key = os.getenv("OPENAI_API_KEY")
-groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-
-# 建立 GPT 模型
-# 設定 groq API 的速率限制參數
-GROQ_RATE_LIMIT = 6000  # 每分鐘允許的 token 數量
-GROQ_REQUEST_INTERVAL = 60  # 速率限制的時間間隔，單位：秒
-
-# 初始化請求計數器和時間戳
-groq_tokens_used = 0
-groq_last_request_time = time.time()
-
-def get_reply(messages):
-    global groq_tokens_used, groq_last_request_time
-
-    try:
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo-1106",
-            messages=messages
-        )
-        reply = response["choices"][0]["message"]["content"]
-    except openai.OpenAIError as openai_err:
-        try:
-            # 計算請求所需的 token 數量
-            request_tokens = sum(len(message['content']) for message in messages)
-
-            # 檢查是否需要等待
-            current_time = time.time()
-            if groq_tokens_used + request_tokens > GROQ_RATE_LIMIT:
-                wait_time = GROQ_REQUEST_INTERVAL - (current_time - groq_last_request_time)
-                if wait_time > 0:
-                    print(f"超過速率限制，等待 {wait_time} 秒...")
-                    time.sleep(wait_time)
-                # 重置計數器
-                groq_tokens_used = 0
-                groq_last_request_time = time.time()
-
-            response = groq_client.chat.completions.create(
-                model="mixtral-8x7b-32768",
-                messages=messages,
-                max_tokens=1500,
-                temperature=1.2
-            )
-            reply = response.choices[0].message.content
-            groq_tokens_used += request_tokens  # 更新使用的 token 數量
-        except Groq.RateLimitError as rate_err:
-            print("遇到 RateLimitError，等待 15 秒...")
-            time.sleep(15)  # 等待一段時間再重試
-            response = groq_client.chat.completions.create(
-                model="mixtral-8x7b-32768",
-                messages=messages,
-                max_tokens=1500,
-                temperature=1.2
-            )
-            reply = response.choices[0].message.content
-        except Exception as groq_err:
-            reply = f"OpenAI API 發生錯誤: {openai_err.error.message}，GROQ API 發生錯誤: {groq_err.message}"
-    return reply
+
+# 搜尋結果快取秒數
+JOB_SEARCH_CACHE_TTL = int(os.getenv("JOB_SEARCH_CACHE_TTL", 600))
+JOB_REQUEST_TIMEOUT = 10
+
+search_cache = TTLCache(maxsize=128, ttl=JOB_SEARCH_CACHE_TTL)
+job_cache = TTLCache(maxsize=512, ttl=JOB_SEARCH_CACHE_TTL)
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/81.0.4044.92 Safari/537.36',
+}
+SEARCH_URL = 'https://www.104.com.tw/jobs/search/list'
 
 class Job104Spider:
+    def _fetch_page(self, query, page):
+        headers = {**HEADERS, 'Referer': 'https://www.104.com.tw/jobs/search/'}
+        r = http.get(SEARCH_URL, params=f'{query}&page={page}', headers=headers, timeout=JOB_REQUEST_TIMEOUT)
+        if r.status_code != requests.codes.ok:
+            print('請求失敗', r.status_code)
+            data = r.json()
+            print(data['status'], data['statusMsg'], data['errorMsg'])
+            raise ConnectionError(f"104 搜尋失敗，狀態碼：{r.status_code}")
+        return r.json()['data']
+
     def search(self, keyword, max_num=10, filter_params=None, sort_type='符合度', is_sort_asc=False):
-        """搜尋職缺"""
-        jobs = []
-        total_count = 0
+        """搜尋職缺（第一頁取得總頁數後，其餘頁面交給排程器並行抓取）"""
+        cache_key = (keyword, tuple(sorted((filter_params or {}).items())), sort_type, is_sort_asc)
+        cached = search_cache.get(cache_key)
+        if cached is not None and (len(cached[1]) >= max_num or len(cached[1]) >= cached[0]):
+            return cached[0], cached[1][:max_num]
 
-        url = 'https://www.104.com.tw/jobs/search/list'
         query = f'ro=0&kwop=7&keyword={keyword}&expansionType=area,spec,com,job,wf,wktm&mode=s&jobsource=2018indexpoc'
         if filter_params:
             # 加上篩選參數，要先轉換為 URL 參數字串格式
             query += ''.join([f'&{key}={value}' for key, value in filter_params.items()])
 
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/81.0.4044.92 Safari/537.36',
-            'Referer': 'https://www.104.com.tw/jobs/search/',
-        }
-
         # 加上排序條件
         sort_dict = {
             '符合度': '1',
@@ -97,43 +56,55 @@ class Job104Spider:
         sort_params += '&asc=1' if is_sort_asc else '&asc=0'
         query += sort_params
 
-        page = 1
-        while len(jobs) < max_num:
-            params = f'{query}&page={page}'
-            r = requests.get(url, params=params, headers=headers)
-            if r.status_code != requests.codes.ok:
-                print('請求失敗', r.status_code)
-                data = r.json()
-                print(data['status'], data['statusMsg'], data['errorMsg'])
-                break
-
-            data = r.json()
-            total_count = data['data']['totalCount']
-            jobs.extend(data['data']['list'])
-
-            if (page == data['data']['totalPage']) or (data['data']['totalPage'] == 0):
-                break
-            page += 1
-            time.sleep(random.uniform(3, 5))
-
+        first = scheduler.submit(SEARCH_URL, self._fetch_page, query, 1).result()
+        total_count = first['totalCount']
+        jobs = list(first['list'])
+        page_size = len(jobs)
+        if page_size and len(jobs) < max_num:
+            last_page = min(first['totalPage'], -(-max_num // page_size))
+            futures = [scheduler.submit(SEARCH_URL, self._fetch_page, query, page) for page in range(2, last_page + 1)]
+            for future in futures:
+                try:
+                    jobs.extend(future.result()['list'])
+                except Exception as e:
+                    print(f"104 搜尋分頁失敗: {e}")
+                    break
+
+        search_cache.set(cache_key, (total_count, jobs))
         return total_count, jobs[:max_num]
 
-    def get_job(self, job_id):
-        """取得職缺詳細資料"""
+    def _fetch_job(self, job_id):
         url = f'https://www.104.com.tw/job/ajax/content/{job_id}'
-
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/81.0.4044.92 Safari/537.36',
-            'Referer': f'https://www.104.com.tw/job/{job_id}'
-        }
-
-        r = requests.get(url, headers=headers)
+        headers = {**HEADERS, 'Referer': f'https://www.104.com.tw/job/{job_id}'}
+        r = http.get(url, headers=headers, timeout=JOB_REQUEST_TIMEOUT)
         if r.status_code != requests.codes.ok:
             print('請求失敗', r.status_code)
-            return
+            return None
+        return r.json()['data']
 
-        data = r.json()
-        return data['data']
+    def get_job(self, job_id):
+        """取得職缺詳細資料"""
+        return self.get_jobs([job_id]).get(job_id)
+
+    def get_jobs(self, job_ids):
+        """並行取得多筆職缺詳細資料，回傳 {job_id: data}（失敗的職缺為 None）"""
+        results = {}
+        futures = {}
+        for job_id in job_ids:
+            cached = job_cache.get(job_id)
+            if cached is not None:
+                results[job_id] = cached
+            elif job_id not in futures:
+                futures[job_id] = scheduler.submit('https://www.104.com.tw/job/', self._fetch_job, job_id)
+        for job_id, future in futures.items():
+            try:
+                results[job_id] = future.result()
+            except Exception as e:
+                print(f"取得職缺 {job_id} 失敗: {e}")
+                results[job_id] = None
+            if results[job_id] is not None:
+                job_cache.set(job_id, results[job_id])
+        return results
 
     def search_job_transform(self, job_data):
         """將職缺資料轉換格式、補齊資料"""
@@ -214,5 +185,5 @@ def one04_gpt(job_name):
         "content": content_msg
     }]
 
-    reply_data = get_reply(msg)
+    reply_data = get_reply(msg, "one04")
     return reply_data
\ No newline at end of file
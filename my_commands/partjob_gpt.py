@@ -1,11 +1,14 @@
 import os
-import openai
-from groq import Groq
-import requests
 import time
 import random
-from bs4 import BeautifulSoup
+import threading
 import json
+from collections import Counter
+from html.parser import HTMLParser
+from my_commands.http_client import http
+from my_commands.llm_gateway import get_reply
+from my_commands.polite_fetcher import scheduler
+from my_commands.ttl_cache import TTLCache
 """
 ```
 {
@@ -54,98 +57,200 @@ import json
 }
 ```
 """
-# 設定 API 金鑰
-openai.api_key = os.getenv("OPENAI_API_KEY")
-groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-
-# 建立 GPT 模型
-def get_reply(messages):
-    try:
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo-1106",
-            messages=messages
-        )
-        reply = response["choices"][0]["message"]["content"]
-    except openai.OpenAIError as openai_err:
-        try:
-            response = groq_client.chat.completions.create(
-                model="llama3-70b-8192",
-                messages=messages,
-                max_tokens=5000,
-                temperature=1.2
-            )
-            reply = response.choices[0].message.content
-        except Groq.RateLimitError as rate_err:
-            time.sleep(15)  # 等待一段時間再重試
-            response = groq_client.chat.completions.create(
-                model="llama3-70b-8192",
-                messages=messages,
-                max_tokens=3000,
-                temperature=1.2
-            )
-            reply = response.choices[0].message.content
-        except Exception as groq_err:
-            reply = f"OpenAI API 發生錯誤: {openai_err.error.message}，GROQ API 發生錯誤: {groq_err.message}"
-    return reply
+# 關鍵字搜尋結果的快取秒數；熱門關鍵字在背景定期更新
+PARTJOB_CACHE_TTL = int(os.getenv("PARTJOB_CACHE_TTL", 15 * 60))
+PARTJOB_REFRESH_INTERVAL = int(os.getenv("PARTJOB_REFRESH_INTERVAL", 10 * 60))
+PARTJOB_REQUEST_TIMEOUT = 10
+# 預設的熱門關鍵字，以及一小時內被查詢幾次就加入背景更新
+POPULAR_KEYWORDS = ["桃園"]
+POPULAR_HITS = 3
+MAX_POPULAR_KEYWORDS = 10
+
+search_cache = TTLCache(maxsize=64, ttl=PARTJOB_CACHE_TTL)
+
+
+class JobItemParser(HTMLParser):
+    """
+    串流解析職缺列表：只取出每個 li.job-item 中的 ld+json、兼職類型與發布時間，不建立整棵 DOM。
+    """
+
+    CAPTURE = {"script": "ld_json", "span": "category", "time": "posted"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.items = []
+        self._item = None
+        self._li_depth = 0
+        self._capture = None
+        self._buffer = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        classes = (attrs.get('class') or '').split()
+        if self._item is None:
+            if tag == 'li' and 'job-item' in classes:
+                self._item = {"ld_json": None, "category": '', "posted": ''}
+                self._li_depth = 1
+            return
+        if tag == 'li':
+            self._li_depth += 1
+        elif self._capture is None and (
+            (tag == 'script' and attrs.get('type') == 'application/ld+json')
+            or (tag == 'span' and 'label-part-time-type' in classes)
+            or tag == 'time'
+        ):
+            field = self.CAPTURE[tag]
+            # 和原本的 find() 一樣只取第一個
+            if not self._item[field]:
+                self._capture = tag
+                self._buffer = []
+
+    def handle_data(self, data):
+        if self._capture is not None:
+            self._buffer.append(data)
+
+    def handle_endtag(self, tag):
+        if self._capture == tag:
+            self._item[self.CAPTURE[tag]] = ''.join(self._buffer).strip()
+            self._capture = None
+        if self._item is not None and tag == 'li':
+            self._li_depth -= 1
+            if self._li_depth == 0:
+                self.items.append(self._item)
+                self._item = None
+
+
+def _to_job(item):
+    job_data = json.loads(item["ld_json"])
+    salary = job_data.get('baseSalary', {}).get('value', {})
+    address = job_data.get('jobLocation', {}).get('address', {})
+    return {
+        '職缺標題': job_data.get('title', ''),
+        '公司名稱': job_data.get('hiringOrganization', {}).get('name', ''),
+        '分類': item["category"],
+        '薪資': salary.get('value', ''),
+        '薪水單位': salary.get('unitText', ''),
+        '地點': address.get('addressRegion', ''),
+        '街道地址': address.get('streetAddress', ''),
+        '發布時間': item["posted"],
+        '連結': job_data.get('url', ''),
+        '說明欄': job_data.get('description', ''),
+    }
+
 
 class PartJobSpider:
-    def search(self, keyword, max_num=10):
+    def fetch_page(self, keyword, page):
+        """抓取一頁搜尋結果，邊下載邊解析"""
+        url = f"https://worknowapp.com/regions/%E6%A1%83%E5%9C%92?q={keyword}&page={page}"
+        parser = JobItemParser()
+        with http.get(url, stream=True, timeout=PARTJOB_REQUEST_TIMEOUT) as response:
+            # 錯誤頁面沒有職缺，不能當成「已沒有更多結果」
+            response.raise_for_status()
+            response.encoding = 'utf-8'
+            for chunk in response.iter_content(chunk_size=64 * 1024, decode_unicode=True):
+                parser.feed(chunk)
+        parser.close()
         jobs = []
-        total_count = 0
+        for item in parser.items:
+            if item["ld_json"]:
+                try:
+                    jobs.append(_to_job(item))
+                except ValueError as e:
+                    print(f"職缺資料解析失敗: {e}")
+        return jobs
 
-        start_page = 1
-        page = start_page
-        while len(jobs) < max_num:
-            url = f"https://worknowapp.com/regions/%E6%A1%83%E5%9C%92?q={keyword}&page={page}"
-            response = requests.get(url)
-            response.encoding = 'utf-8'
-            soup = BeautifulSoup(response.content, 'html.parser')
-            job_listings = soup.find_all('li', class_='job-item')
-
-            if not job_listings:
-                break
-
-            for job in job_listings:
-                script = job.find('script', type='application/ld+json')
-                if script:
-                    job_data = json.loads(script.string)
-                    title = job_data.get('title', '')
-                    company = job_data.get('hiringOrganization', {}).get('name', '')
-                    category = job.find('span', class_='label-part-time-type').text.strip() if job.find('span', class_='label-part-time-type') else ''
-                    salary = job_data.get('baseSalary', {}).get('value', {}).get('value', '')
-                    unitText = job_data.get('baseSalary', {}).get('value', {}).get('unitText', '')
-                    description = job_data.get('description', '')
-                    location = job_data.get('jobLocation', {}).get('address', {}).get('addressRegion', '')
-                    street_address = job_data.get('jobLocation', {}).get('address', {}).get('streetAddress', '')
-                    posted = job.find('time').text.strip() if job.find('time') else ''
-                    link = job_data.get('url', '')
-
-                    jobs.append({
-                        '職缺標題': title,
-                        '公司名稱': company,
-                        '分類': category,
-                        '薪資': salary,
-                        '薪水單位': unitText,
-                        '地點': location,
-                        '街道地址': street_address,
-                        '發布時間': posted,
-                        '連結': link,
-                        '說明欄': description
-                    })
-
-            page += 1
-            time.sleep(random.uniform(3, 5))
+    def search(self, keyword, max_num=10, refresh=False):
+        """
+        搜尋打工職缺。第一頁取得每頁筆數後，其餘需要的頁面交給排程器並行抓取；
+        結果依關鍵字快取，refresh=True 時略過快取重新抓取。
+        """
+        # 快取內容為 (職缺, 是否已取得全部結果)，結果不足 max_num 筆的關鍵字也能命中快取
+        cached = None if refresh else search_cache.get(keyword)
+        if cached is not None:
+            cached_jobs, exhausted = cached
+            if exhausted or len(cached_jobs) >= max_num:
+                return len(cached_jobs), cached_jobs[:max_num]
 
+        page_url = "https://worknowapp.com/regions/"
+        jobs = scheduler.submit(page_url, self.fetch_page, keyword, 1).result()
+        exhausted = not jobs
+        failed = False
+        if jobs and len(jobs) < max_num:
+            page_size = len(jobs)
+            last_page = -(-max_num // page_size)
+            futures = [scheduler.submit(page_url, self.fetch_page, keyword, page) for page in range(2, last_page + 1)]
+            for future in futures:
+                try:
+                    page_jobs = future.result()
+                except Exception as e:
+                    print(f"打工職缺分頁失敗: {e}")
+                    failed = True
+                    break
+                jobs.extend(page_jobs)
+                # 空白或不滿一頁表示已經沒有更多結果
+                if len(page_jobs) < page_size:
+                    exhausted = True
+                    break
+
+        if not failed:
+            # 有分頁失敗時結果不完整，不快取，下次查詢重新抓取
+            search_cache.set(keyword, (jobs, exhausted))
         total_count = len(jobs)
         return total_count, jobs[:max_num]
 
-def generate_content_msg(keyword):
-    partjob_spider = PartJobSpider()
 
+class PopularKeywordRefresher:
+    """定期在背景更新熱門關鍵字的搜尋結果，使用者查詢時直接命中快取"""
+
+    def __init__(self, spider, keywords=POPULAR_KEYWORDS, max_num=10):
+        self.spider = spider
+        self.max_num = max_num
+        self._keywords = list(keywords)
+        self._hits = Counter()
+        self._window_start = time.monotonic()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def observe(self, keyword):
+        with self._lock:
+            if keyword in self._keywords:
+                return
+            if time.monotonic() - self._window_start > 60 * 60:
+                self._hits.clear()
+                self._window_start = time.monotonic()
+            self._hits[keyword] += 1
+            if self._hits[keyword] >= POPULAR_HITS and len(self._keywords) < MAX_POPULAR_KEYWORDS:
+                self._keywords.append(keyword)
+                print(f"* partjob 加入熱門關鍵字 {keyword}")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="partjob-refresh", daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while True:
+            with self._lock:
+                keywords = list(self._keywords)
+            for keyword in keywords:
+                try:
+                    self.spider.search(keyword, max_num=self.max_num, refresh=True)
+                except Exception as e:
+                    print(f"* partjob 背景更新失敗 {keyword}: {e}")
+            time.sleep(PARTJOB_REFRESH_INTERVAL + random.uniform(0, 30))
+
+
+partjob_spider = PartJobSpider()
+refresher = PopularKeywordRefresher(partjob_spider)
+if os.getenv("PARTJOB_REFRESH", "1") == "1":
+    refresher.start()
+
+def generate_content_msg(keyword):
     if keyword == "":
         keyword = "桃園"
-        
+
     find_max_num = 10
+    refresher.observe(keyword)
     total_count, jobs = partjob_spider.search(keyword, max_num=find_max_num)
 
     print('搜尋結果職缺總數：', total_count)
@@ -182,6 +287,6 @@ def partjob_gpt(keyword):
         "content": content_msg
     }]
 
-    reply_data = get_reply(msg)
+    reply_data = get_reply(msg, "partjob")
     return reply_data
 
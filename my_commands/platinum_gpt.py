@@ -1,68 +1,18 @@
-import os
-import time
 import pandas as pd
-import requests
 from bs4 import BeautifulSoup
-import openai
-from groq import Groq
-
-# 初始化 GROQ API 客戶端
-groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-groq_tokens_used = 0
-groq_last_request_time = 0
-GROQ_RATE_LIMIT = 10000  # 假設的速率限制，請根據實際情況調整
-GROQ_REQUEST_INTERVAL = 60  # 請根據實際需求調整
-
-# 定義 get_reply 函數
-def get_reply(messages):
-    global groq_tokens_used, groq_last_request_time
-
-    try:
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo-1106",
-            messages=messages
-        )
-        reply = response["choices"][0]["message"]["content"]
-    except openai.OpenAIError as openai_err:
-        try:
-            request_tokens = sum(len(message['content']) for message in messages)
-
-            current_time = time.time()
-            if groq_tokens_used + request_tokens > GROQ_RATE_LIMIT:
-                wait_time = GROQ_REQUEST_INTERVAL - (current_time - groq_last_request_time)
-                if wait_time > 0:
-                    print(f"超過速率限制，等待 {wait_time} 秒...")
-                    time.sleep(wait_time)
-                groq_tokens_used = 0
-                groq_last_request_time = time.time()
-
-            response = groq_client.chat.completions.create(
-                model="mixtral-8x7b-32768",
-                messages=messages,
-                max_tokens=1500,
-                temperature=1.2
-            )
-            reply = response.choices[0].message.content
-            groq_tokens_used += request_tokens
-        except Groq.RateLimitError as rate_err:
-            print("遇到 RateLimitError，等待 15 秒...")
-            time.sleep(15)
-            response = groq_client.chat.completions.create(
-                model="mixtral-8x7b-32768",
-                messages=messages,
-                max_tokens=1500,
-                temperature=1.2
-            )
-            reply = response.choices[0].message.content
-        except Exception as groq_err:
-            reply = f"OpenAI API 發生錯誤: {openai_err.error.message}, GROQ API 發生錯誤: {groq_err.message}"
-    return reply
+from my_commands.http_client import http
+from my_commands.llm_gateway import get_reply
+from my_commands.price_features import format_features
+from my_commands.price_store import get_price_series
+
+# 分析使用的天數（本地歷史會持續累積，不受來源網頁筆數限制）
+LOOKBACK_DAYS = 365
 
 # 獲取並處理鉑金數據
 def fetch_and_process_platinum_data():
     # 發送HTTP請求以獲取網頁內容
     url = "https://tw.bullion-rates.com/platinum/TWD-history.htm"
-    response = requests.get(url)
+    response = http.get(url)
     response.encoding = 'utf-8'
 
     # 使用BeautifulSoup解析HTML
@@ -99,21 +49,23 @@ def fetch_and_process_platinum_data():
 
     return df
 
+# 來源網頁只提供固定區間，寫入本地時只附加新日期
+platinum_store = get_price_series(
+    "platinum_twd", lambda last_ts: fetch_and_process_platinum_data()['鉑金價格/公克']
+)
+
 # 生成鉑金價格分析報告的消息
 def generate_platinum_content_msg():
-    # 获取和处理数据
-    platinum_prices_df = fetch_and_process_platinum_data()
+    # 获取和处理数据（讀本地資料，必要時增量更新）
+    platinum_prices = platinum_store.series(days=LOOKBACK_DAYS)
 
-    # 从数据中获取需要的最高价和最低价信息
-    max_price = platinum_prices_df['鉑金價格/公克'].max()
-    min_price = platinum_prices_df['鉑金價格/公克'].min()
-    last_date = platinum_prices_df.index[-1].strftime("%Y-%m-%d")
+    # 以統計摘要（均線、回撤、波動度、週K）取代完整的價格表
+    features = format_features(platinum_prices, unit="台幣/公克")
 
     # 构造专业分析报告的内容
     content_msg = f'你現在是一位專業的鉑金價格分析師, 使用以下数据来撰写分析报告:\n'
-    content_msg += f'{platinum_prices_df}\n'
-    content_msg += f'最新日期: {last_date}, 最高鉑金價格: {max_price} (日期), 最低鉑金價格: {min_price} (日期)。\n'
-    content_msg += '請給出完整的趨勢分析報告，顯示每日鉑金價格（日期：價格）,台幣/每克，使用繁體中文。'
+    content_msg += f'{features}\n'
+    content_msg += '請依據上述統計給出完整的趨勢分析報告，包含最高、最低鉑金價格及其日期、均線位置與近期週K走勢，台幣/每克，使用繁體中文。'
 
     return content_msg
 
@@ -130,7 +82,7 @@ def platinum_gpt():
         "content": content_msg
     }]
 
-    reply_data = get_reply(msg)
+    reply_data = get_reply(msg, "platinum")
     return reply_data
 
 # # 測試時，您可以調用 fetch_and_process_platinum_data() 來查看抓取的數據結構
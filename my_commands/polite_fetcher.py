@@ -0,0 +1,82 @@
+import os
+import time
+import heapq
+import threading
+from urllib.parse import urlsplit
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# 同一網站兩次請求之間的最短間隔（秒），未列出的網站使用預設值
+HOST_INTERVALS = {
+    "www.104.com.tw": float(os.getenv("HOST_INTERVAL_104", 0.5)),
+    "worknowapp.com": float(os.getenv("HOST_INTERVAL_WORKNOW", 0.5)),
+}
+DEFAULT_HOST_INTERVAL = 0.3
+
+
+class PoliteScheduler:
+    """
+    依網站控制請求速率的共用排程器。
+
+    每次 submit 會在該網站的時間表上預約下一個空檔，時間到才交給工作池執行；
+    呼叫端可以一次送出多個請求再等待結果，不需要在請求之間自己 sleep。
+    """
+
+    def __init__(self, max_workers=8, host_intervals=HOST_INTERVALS, default_interval=DEFAULT_HOST_INTERVAL):
+        self.host_intervals = host_intervals
+        self.default_interval = default_interval
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="polite-fetch")
+        self._cond = threading.Condition()
+        self._heap = []  # (開始時間, 序號, future, func, args, kwargs)
+        self._seq = 0
+        self._next_slot = {}  # host -> 下一個可用的開始時間
+        self._thread = None
+        self.submitted = 0
+        self.delayed = 0
+
+    def submit(self, url, func, *args, **kwargs):
+        """
+        預約對 url 所屬網站的一次請求。
+
+        :param func: 實際執行請求的函數，以 func(*args, **kwargs) 呼叫。
+        :return: concurrent.futures.Future
+        """
+        host = urlsplit(url).hostname or ""
+        interval = self.host_intervals.get(host, self.default_interval)
+        future = Future()
+        with self._cond:
+            now = time.monotonic()
+            start = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = start + interval
+            self._seq += 1
+            heapq.heappush(self._heap, (start, self._seq, future, func, args, kwargs))
+            self.submitted += 1
+            if start > now:
+                self.delayed += 1
+            self._cond.notify()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="polite-scheduler", daemon=True)
+                self._thread.start()
+        return future
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._heap or self._heap[0][0] > time.monotonic():
+                    self._cond.wait(self._heap[0][0] - time.monotonic() if self._heap else None)
+                _, _, future, func, args, kwargs = heapq.heappop(self._heap)
+            if future.set_running_or_notify_cancel():
+                self._executor.submit(self._run, future, func, args, kwargs)
+
+    @staticmethod
+    def _run(future, func, args, kwargs):
+        try:
+            future.set_result(func(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+
+    def stats(self):
+        with self._cond:
+            return {"submitted": self.submitted, "delayed": self.delayed, "queued": len(self._heap)}
+
+
+scheduler = PoliteScheduler()
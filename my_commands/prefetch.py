@@ -0,0 +1,210 @@
+import os
+import time
+import heapq
+import random
+import datetime as dt
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from my_commands.ttl_cache import TTLCache
+from my_commands.llm_gateway import background_calls, is_error_reply
+from my_commands.stock.market_calendar import MARKETS, is_trading_day, next_open, normalize_symbol, trading_session
+
+# 同時進行的預先計算數量上限
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", 2))
+# 排程時間加上的隨機延遲比例（最多 PREFETCH_MAX_JITTER 秒），避免所有熱門指令同時更新
+PREFETCH_JITTER = float(os.getenv("PREFETCH_JITTER", 0.1))
+PREFETCH_MAX_JITTER = 60
+# 結果在下一次更新時間後再保留的秒數，涵蓋重新計算所需的時間
+PREFETCH_GRACE = 180
+# 失敗後重試的間隔（秒）
+PREFETCH_RETRY = 120
+# 熱門指令數量上限，以及統計期間內被查詢幾次就加入預先計算
+PREFETCH_MAX_KEYS = int(os.getenv("PREFETCH_MAX_KEYS", 20))
+PREFETCH_PROMOTE_HITS = int(os.getenv("PREFETCH_PROMOTE_HITS", 5))
+PREFETCH_WINDOW = 60 * 60
+# 自動加入的熱門指令超過此秒數沒有人查詢就移除（手動註冊的不會移除）
+PREFETCH_KEY_IDLE = int(os.getenv("PREFETCH_KEY_IDLE", 2 * 60 * 60))
+
+# 台銀牌告匯率與黃金牌價的更新時段與頻率
+BANK_HOURS = (dt.time(9, 0), dt.time(16, 0))
+BANK_REFRESH_INTERVAL = 10 * 60
+CRYPTO_REFRESH_INTERVAL = 10 * 60
+
+# 指令本身的錯誤訊息（例如「無法下載股票資料」），LLM 的錯誤由 is_error_reply 判斷
+COMMAND_ERROR_PREFIXES = ("無法",)
+
+
+def stock_interval(route, now=None):
+    # 盤中每 INTRADAY_TTL 更新，收盤後到下一次開盤前不需更新
+    return trading_session(normalize_symbol(route.args[0]), now)[1]
+
+
+def bank_interval(route, now=None):
+    tz = MARKETS["TW"]["tz"]
+    now = (now or dt.datetime.now(tz)).astimezone(tz)
+    if is_trading_day("TW", now.date()) and BANK_HOURS[0] <= now.time() < BANK_HOURS[1]:
+        return BANK_REFRESH_INTERVAL
+    return max(int((next_open("TW", now) - now).total_seconds()), 60)
+
+
+def crypto_interval(route, now=None):
+    return CRYPTO_REFRESH_INTERVAL
+
+
+# 可以預先計算的指令與其更新頻率
+CADENCES = {
+    "stock": stock_interval,
+    "gold": bank_interval,
+    "money": bank_interval,
+    "crypto": crypto_interval,
+}
+
+
+def _key(route):
+    # 「大盤」與「台股」是同一份報告
+    if route.command == "stock":
+        return ("stock", normalize_symbol(route.args[0]))
+    # 參數可能含 list（例如多檔比較），轉成 tuple 才能當 dict key
+    return (route.command, tuple(tuple(arg) if isinstance(arg, list) else arg for arg in route.args))
+
+
+def _is_error(result):
+    return is_error_reply(result) or result.startswith(COMMAND_ERROR_PREFIXES)
+
+
+class Prefetcher:
+    """
+    在背景依市場時段定期重新計算熱門指令，使用者查詢時直接取用已算好的結果。
+
+    每個熱門指令在排程堆積中最多只有一筆；完成後才依更新頻率（加上隨機延遲）排入下一次。
+    依查詢次數自動加入的指令在 key_idle 秒內沒有人查詢就會移除；
+    重新計算時的 LLM 呼叫只使用 groq_limiter 的背景額度，不會用掉使用者的額度。
+    """
+
+    def __init__(self, commands, max_workers=PREFETCH_WORKERS, max_keys=PREFETCH_MAX_KEYS,
+                 promote_hits=PREFETCH_PROMOTE_HITS, jitter=PREFETCH_JITTER, key_idle=PREFETCH_KEY_IDLE):
+        self.commands = commands
+        self.max_keys = max_keys
+        self.key_idle = key_idle
+        self.promote_hits = promote_hits
+        self.jitter = jitter
+        self.results = TTLCache(maxsize=max_keys * 2)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._cond = threading.Condition()
+        self._heap = []  # (執行時間, 序號, route)
+        self._seq = 0
+        self._keys = {}  # key -> 第一次註冊的 route
+        self._pinned = set()  # 手動註冊、不會因閒置移除的 key
+        self._last_seen = {}  # key -> 最後一次被查詢的時間
+        self._hits = Counter()
+        self._window_start = time.monotonic()
+        self._thread = None
+        self.refreshed = 0
+        self.failed = 0
+        self.expired = 0
+
+    def register(self, route, pinned=True):
+        """
+        加入熱門指令並立即排程第一次計算；不支援的指令或超過上限時回傳 False。
+
+        :param pinned: False 表示由查詢次數自動加入，閒置過久會移除。
+        """
+        if route.command not in CADENCES or route.command not in self.commands:
+            return False
+        key = _key(route)
+        with self._cond:
+            if pinned:
+                self._pinned.add(key)
+            if key in self._keys:
+                return True
+            if len(self._keys) >= self.max_keys:
+                return False
+            self._keys[key] = route
+            self._last_seen[key] = time.monotonic()
+            self._push(route, 0)
+        print(f"* prefetch 加入熱門指令 {route}")
+        return True
+
+    def observe(self, route):
+        """記錄一次使用者查詢；同一指令在統計期間內達到門檻時自動加入"""
+        if route.command not in CADENCES:
+            return
+        key = _key(route)
+        with self._cond:
+            if key in self._keys:
+                self._last_seen[key] = time.monotonic()
+                return
+            if time.monotonic() - self._window_start > PREFETCH_WINDOW:
+                self._hits.clear()
+                self._window_start = time.monotonic()
+            self._hits[key] += 1
+            promote = self._hits[key] >= self.promote_hits
+        if promote:
+            self.register(route, pinned=False)
+
+    def lookup(self, route):
+        """取得預先算好的結果，沒有時回傳 None"""
+        if route.command not in CADENCES:
+            return None
+        key = _key(route)
+        if key not in self._keys:
+            return None
+        return self.results.get(key)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="prefetch-scheduler", daemon=True)
+            self._thread.start()
+
+    def _push(self, route, delay):
+        # 呼叫端需持有 self._cond
+        self._seq += 1
+        heapq.heappush(self._heap, (time.monotonic() + delay, self._seq, route))
+        self._cond.notify()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._heap or self._heap[0][0] > time.monotonic():
+                    self._cond.wait(self._heap[0][0] - time.monotonic() if self._heap else None)
+                _, _, route = heapq.heappop(self._heap)
+                if self._expire(_key(route)):
+                    continue
+            self._executor.submit(self._refresh, route)
+
+    def _expire(self, key):
+        """移除閒置過久的自動加入指令，回傳是否已移除（呼叫端需持有 self._cond）"""
+        if key in self._pinned or time.monotonic() - self._last_seen.get(key, 0) < self.key_idle:
+            return False
+        route = self._keys.pop(key, None)
+        self._last_seen.pop(key, None)
+        self.results.pop(key)
+        self.expired += 1
+        print(f"* prefetch 移除閒置指令 {route}")
+        return True
+
+    def _refresh(self, route):
+        start = time.perf_counter()
+        try:
+            with background_calls():
+                result = self.commands[route.command](*route.args)
+            interval = CADENCES[route.command](route)
+            if _is_error(result):
+                raise RuntimeError(result)
+            self.results.set(_key(route), result, interval + PREFETCH_GRACE)
+            self.refreshed += 1
+            print(f"* prefetch 更新 {route} {time.perf_counter() - start:.1f}s，{interval} 秒後再更新")
+        except Exception as e:
+            interval = PREFETCH_RETRY
+            self.failed += 1
+            print(f"* prefetch 更新失敗 {route}: {e}")
+        delay = interval + random.uniform(0, min(interval * self.jitter, PREFETCH_MAX_JITTER))
+        with self._cond:
+            self._push(route, delay)
+
+    def stats(self):
+        with self._cond:
+            keys = [f"{route.command}{route.args}" for route in self._keys.values()]
+        return {"keys": keys, "refreshed": self.refreshed, "failed": self.failed, "expired": self.expired,
+                "results": self.results.stats()}
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+# 提示中列出的最近週數
+WEEKS_IN_PROMPT = 8
+MOVING_AVERAGES = (5, 20, 60)
+# 區間報酬（交易日數）
+RETURN_WINDOWS = {"1週": 5, "1個月": 21, "3個月": 63}
+
+
+def _date(ts):
+    return ts.strftime("%Y-%m-%d")
+
+
+def price_features(series):
+    """
+    把每日價格序列整理成少量統計特徵（全部以向量化計算）。
+
+    :param series: 以日期為索引的價格 Series。
+    :return: dict，包含最新價、均線、區間報酬、波動度、回撤、最高最低價與週K。
+    """
+    series = pd.to_numeric(series, errors='coerce').dropna().sort_index()
+    if series.empty:
+        raise ValueError("沒有可用的價格資料")
+    last = series.iloc[-1]
+    returns = series.pct_change().dropna()
+    running_max = series.cummax()
+    drawdown = series / running_max - 1
+    trough = drawdown.idxmin()
+    peak = series.loc[:trough].idxmax()
+
+    return {
+        "last_date": series.index[-1],
+        "last": last,
+        "start_date": series.index[0],
+        "days": len(series),
+        "max": (series.max(), series.idxmax()),
+        "min": (series.min(), series.idxmin()),
+        "moving_averages": {n: series.rolling(n).mean().iloc[-1] for n in MOVING_AVERAGES if len(series) >= n},
+        "returns": {label: last / series.iloc[-n - 1] - 1 for label, n in RETURN_WINDOWS.items() if len(series) > n},
+        "total_return": last / series.iloc[0] - 1,
+        "volatility": returns.std() * np.sqrt(252),
+        "volatility_20d": returns.tail(20).std() * np.sqrt(252),
+        "drawdown": drawdown.iloc[-1],
+        "max_drawdown": (drawdown.min(), peak, trough),
+        "weekly": series.resample('W').ohlc().dropna().tail(WEEKS_IN_PROMPT),
+    }
+
+
+def format_features(series, unit="台幣"):
+    """產生給 LLM 的精簡統計摘要（約數百 token，取代整張價格表）"""
+    f = price_features(series)
+    max_price, max_date = f["max"]
+    min_price, min_date = f["min"]
+    mdd, mdd_peak, mdd_trough = f["max_drawdown"]
+
+    lines = [
+        f'資料期間: {_date(f["start_date"])} ~ {_date(f["last_date"])}（{f["days"]} 個交易日），單位: {unit}',
+        f'最新價: {f["last"]:.2f}（{_date(f["last_date"])}）',
+        f'最高價: {max_price:.2f}（{_date(max_date)}），最低價: {min_price:.2f}（{_date(min_date)}）',
+        '均線: ' + '，'.join(
+            f'MA{n} {value:.2f}（現價{"高於" if f["last"] >= value else "低於"}）'
+            for n, value in f["moving_averages"].items()
+        ),
+        '區間報酬: ' + '，'.join(
+            [f'{label} {value * 100:+.2f}%' for label, value in f["returns"].items()]
+            + [f'全期 {f["total_return"] * 100:+.2f}%']
+        ),
+        f'年化波動度: 全期 {f["volatility"] * 100:.1f}%，近20日 {f["volatility_20d"] * 100:.1f}%',
+        f'目前距高點回撤: {f["drawdown"] * 100:.2f}%，'
+        f'最大回撤: {mdd * 100:.2f}%（{_date(mdd_peak)} → {_date(mdd_trough)}）',
+        f'最近 {len(f["weekly"])} 週週K（週結束日 開/高/低/收）:',
+    ]
+    for week_end, row in f["weekly"].iterrows():
+        lines.append(f'{_date(week_end)} {row["open"]:.2f}/{row["high"]:.2f}/{row["low"]:.2f}/{row["close"]:.2f}')
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # 以模擬的一年日資料比較提示長度
+    index = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=250)
+    prices = pd.Series(2500 * np.exp(np.cumsum(np.random.normal(0, 0.01, len(index)))), index=index)
+    compact = format_features(prices)
+    print(compact)
+    print(f"\n完整價格表: {len(prices.to_frame().to_string())} 字元，精簡摘要: {len(compact)} 字元")
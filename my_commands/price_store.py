@@ -0,0 +1,186 @@
+import os
+import re
+import time
+import threading
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl  # 選用：跨行程寫入鎖
+except ImportError:
+    fcntl = None
+
+# 每筆資料：時間（epoch 秒，日資料為該日 00:00 UTC）與價格
+RECORD_DTYPE = np.dtype([('ts', '<i8'), ('value', '<f8')])
+STORE_DIR = os.getenv(
+    "PRICE_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.cache', 'prices'),
+)
+# 商品名稱會成為檔名，只允許英數字、底線與連字號
+NAME_PATTERN = re.compile(r'[A-Za-z0-9_-]+')
+# 距離上次向來源更新多久內直接使用本地資料（秒）
+DEFAULT_REFRESH_INTERVAL = 30 * 60
+
+
+def to_records(series):
+    """把以日期為索引的 Series 轉成依時間排序、時間不重複的結構化陣列"""
+    series = pd.to_numeric(series, errors='coerce').dropna()
+    index = pd.DatetimeIndex(series.index)
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    records = np.empty(len(series), dtype=RECORD_DTYPE)
+    records['ts'] = index.values.astype('datetime64[s]').astype('i8')
+    records['value'] = series.to_numpy(dtype='f8')
+    records = np.sort(records, order='ts')
+    # 同一時間只保留最後一筆
+    keep = np.append(records['ts'][1:] != records['ts'][:-1], True) if len(records) else []
+    return records[keep]
+
+
+class PriceSeries:
+    """
+    單一商品的本地時間序列：附加寫入的二進位檔，讀取時以 np.memmap 對應。
+
+    update() 只把比最後一筆更新的資料附加到檔案，因此可以累積比來源網頁更長的歷史；
+    與最後一筆同一天的資料（例如銀行盤中更新的今日牌價）會覆寫最後一筆。
+    """
+
+    def __init__(self, name, fetcher, directory=STORE_DIR, refresh_interval=DEFAULT_REFRESH_INTERVAL):
+        """
+        :param fetcher: fetcher(last_ts) -> 以日期為索引的價格 Series；last_ts 為本地最後一筆時間（沒有資料時為 None）。
+        """
+        if not NAME_PATTERN.fullmatch(name):
+            raise ValueError(f"不合法的商品名稱: {name!r}")
+        self.name = name
+        self.fetcher = fetcher
+        self.path = os.path.join(directory, f"{name}.bin")
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._mm = None
+        self._mm_size = -1
+        self._checked_at = 0.0
+
+    def records(self):
+        """目前檔案中的全部資料（唯讀 memmap，檔案變大時重新對應）"""
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            size = 0
+        size -= size % RECORD_DTYPE.itemsize
+        if size != self._mm_size:
+            self._mm = np.memmap(self.path, dtype=RECORD_DTYPE, mode='r', shape=(size // RECORD_DTYPE.itemsize,)) \
+                if size else np.empty(0, dtype=RECORD_DTYPE)
+            self._mm_size = size
+        return self._mm
+
+    def last_ts(self):
+        records = self.records()
+        return int(records['ts'][-1]) if len(records) else None
+
+    def append(self, series):
+        """寫入比最後一筆更新的資料，並以同一時間的新值覆寫最後一筆；回傳新增與修改的筆數"""
+        new = to_records(series)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        with os.fdopen(fd, 'r+b') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                # 先截掉中斷寫入留下的不完整資料
+                size = os.fstat(f.fileno()).st_size
+                if size % RECORD_DTYPE.itemsize:
+                    size -= size % RECORD_DTYPE.itemsize
+                    f.truncate(size)
+                changed = 0
+                last = self.last_ts()  # 取得鎖後再讀一次，其他行程可能剛寫入
+                if last is not None:
+                    same_day = new[new['ts'] == last]
+                    if len(same_day) and same_day['value'][-1] != self.records()['value'][-1]:
+                        f.seek(size - RECORD_DTYPE.itemsize)
+                        f.write(same_day[-1:].tobytes())
+                        changed += 1
+                    new = new[new['ts'] > last]
+                if len(new):
+                    f.seek(size)
+                    f.write(new.tobytes())
+                    changed += len(new)
+                f.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+        return changed
+
+    def update(self, force=False):
+        """距離上次更新超過 refresh_interval 時，向來源取得新資料；失敗時沿用本地資料"""
+        if not force and time.time() - self._checked_at < self.refresh_interval:
+            return 0
+        with self._lock:
+            if not force and time.time() - self._checked_at < self.refresh_interval:
+                return 0
+            try:
+                added = self.append(self.fetcher(self.last_ts()))
+                print(f"* price_store {self.name}: 新增/更新 {added} 筆")
+            except Exception as e:
+                if not len(self.records()):
+                    raise
+                added = 0
+                print(f"* price_store {self.name} 更新失敗，使用本地資料: {e}")
+            self._checked_at = time.time()
+            return added
+
+    def series(self, days=None, refresh=True):
+        """
+        取得價格 Series（以日期為索引）。
+
+        :param days: 只取最近幾天；None 為全部歷史。
+        """
+        if refresh:
+            self.update()
+        records = self.records()
+        if days is not None and len(records):
+            start = records['ts'][-1] - days * 86400
+            records = records[np.searchsorted(records['ts'], start):]
+        return pd.Series(
+            np.array(records['value']),
+            index=pd.to_datetime(np.array(records['ts']), unit='s'),
+            name=self.name,
+        )
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def get_price_series(name, fetcher, refresh_interval=DEFAULT_REFRESH_INTERVAL):
+    """取得（或建立）共用的 PriceSeries"""
+    with _registry_lock:
+        store = _registry.get(name)
+        if store is None:
+            store = _registry[name] = PriceSeries(name, fetcher, refresh_interval=refresh_interval)
+        return store
+
+
+def benchmark(rows=5000, reads=1000):
+    """量測寫入與讀取時間"""
+    import tempfile
+    index = pd.date_range(end=pd.Timestamp.today().normalize(), periods=rows, freq='D')
+    data = pd.Series(np.random.random(rows) * 1000, index=index)
+    store = PriceSeries("bench", lambda last_ts: data, directory=tempfile.mkdtemp())
+
+    start = time.perf_counter()
+    store.update(force=True)
+    print(f"首次寫入 {rows} 筆: {(time.perf_counter() - start) * 1000:.2f} ms")
+    start = time.perf_counter()
+    print(f"重複更新新增筆數: {store.update(force=True)}，耗時 {(time.perf_counter() - start) * 1000:.2f} ms")
+    start = time.perf_counter()
+    for _ in range(reads):
+        store.records()
+    print(f"讀取 records(): {(time.perf_counter() - start) / reads * 1e6:.1f} µs/次")
+    start = time.perf_counter()
+    for _ in range(reads):
+        store.series(days=365, refresh=False)
+    print(f"讀取最近一年 Series: {(time.perf_counter() - start) / reads * 1e6:.1f} µs/次")
+
+
+if __name__ == "__main__":
+    benchmark()
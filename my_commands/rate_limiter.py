@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import threading
+
+try:
+    import fcntl  # 選用：跨行程鎖（Windows 沒有時只做行程內同步）
+except ImportError:
+    fcntl = None
+
+# Groq 各模型的每分鐘請求數（RPM）與每分鐘 token 數（TPM）額度
+GROQ_LIMITS = {
+    "llama3-8b-8192": {"rpm": 30, "tpm": 30000},
+    "llama3-70b-8192": {"rpm": 30, "tpm": 6000},
+    "mixtral-8x7b-32768": {"rpm": 30, "tpm": 5000},
+}
+DEFAULT_LIMIT = {"rpm": 30, "tpm": 5000}
+# 額度使用比例，保留一點餘裕給時鐘誤差與估算誤差
+LIMIT_SAFETY = float(os.getenv("GROQ_LIMIT_SAFETY", 0.9))
+# 共用狀態檔，gunicorn 的多個 worker 透過檔案鎖共用同一份額度；設為空字串則只在行程內計算
+STATE_PATH = os.getenv(
+    "GROQ_RATE_STATE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.cache', 'groq_rate.json'),
+)
+WINDOW_SECONDS = 60.0
+# 背景工作（預先計算等）平均最多可使用的額度比例，其餘保留給使用者即時的請求
+BACKGROUND_SHARE = float(os.getenv("GROQ_BACKGROUND_SHARE", 0.3))
+
+
+class TokenBucketLimiter:
+    """
+    依模型分別計算 RPM 與 TPM 的 token bucket，執行緒與行程間皆安全。
+
+    reserve() 不會等待：額度足夠時立即扣除並回傳 0，不足時不扣除任何額度，只回傳需要等待的秒數，
+    由呼叫者決定改用其他模型或回覆忙碌訊息。
+    """
+
+    def __init__(self, limits=GROQ_LIMITS, path=STATE_PATH, safety=LIMIT_SAFETY, background_share=BACKGROUND_SHARE):
+        self.limits = limits
+        self.path = path
+        self.safety = safety
+        self.background_share = background_share
+        self._lock = threading.Lock()
+        self._state = {}  # 未使用狀態檔時的行程內狀態
+        # 以下計數只在 _update 的鎖內修改
+        self.reserved = 0
+        self.delayed = 0
+        self.cancelled = 0
+        self.background_denied = 0
+
+    def _capacity(self, model):
+        limit = self.limits.get(model, DEFAULT_LIMIT)
+        return limit["rpm"] * self.safety, limit["tpm"] * self.safety
+
+    def _charge(self, model, tokens):
+        """實際扣除的 token 數：單次請求超過整個額度時只扣到額度上限，否則永遠無法放行（預約與歸還都以此計算）"""
+        return min(tokens, self._capacity(model)[1])
+
+    def _update(self, func):
+        """在鎖內讀出狀態、交給 func 修改後寫回"""
+        with self._lock:
+            if not self.path or fcntl is None:
+                return func(self._state)
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'a+', encoding='utf-8') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    f.seek(0)
+                    try:
+                        state = json.loads(f.read() or '{}')
+                    except ValueError:
+                        state = {}
+                    result = func(state)
+                    f.seek(0)
+                    f.truncate()
+                    json.dump(state, f)
+                    f.flush()
+                    return result
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _refill(bucket, capacity, now):
+        level, updated = bucket
+        return min(capacity, level + (now - updated) * capacity / WINDOW_SECONDS)
+
+    def _buckets(self, model, state, now, background=False):
+        """取得模型的桶子與容量：{key: capacity}，背景工作另外包含背景額度的桶子"""
+        rpm, tpm = self._capacity(model)
+        capacities = {"req": rpm, "tok": tpm}
+        if background:
+            capacities.update(bg_req=rpm * self.background_share, bg_tok=tpm * self.background_share)
+        entry = state.setdefault(model, {})
+        for key, capacity in capacities.items():
+            entry.setdefault(key, [capacity, now])
+        return entry, capacities
+
+    def _add(self, entry, capacities, now, amounts):
+        """把 amounts 加回各桶子（負值表示追加扣除），不超過容量"""
+        for key, amount in amounts.items():
+            if key in capacities:
+                capacity = capacities[key]
+                entry[key] = [min(capacity, self._refill(entry[key], capacity, now) + amount), now]
+
+    def reserve(self, model, tokens):
+        """
+        預約一次請求與 tokens 個 token 的額度。
+
+        :return: 0 表示已扣除、可立即送出（決定不送出時必須呼叫 cancel() 歸還）；
+                 大於 0 表示額度不足、沒有扣除任何額度，為需要等待的秒數。
+        """
+        charge = self._charge(model, tokens)
+
+        def apply(state):
+            now = time.time()
+            entry, capacities = self._buckets(model, state, now)
+            levels = {key: self._refill(entry[key], capacity, now) for key, capacity in capacities.items()}
+            delay = 0.0
+            for key, amount in (("req", 1), ("tok", charge)):
+                if levels[key] < amount:
+                    delay = max(delay, (amount - levels[key]) * WINDOW_SECONDS / capacities[key])
+            if delay > 0:
+                self.delayed += 1
+                return delay
+            self._add(entry, capacities, now, {"req": -1, "tok": -charge})
+            self.reserved += 1
+            return 0.0
+
+        return self._update(apply)
+
+    def reserve_background(self, model, tokens):
+        """
+        背景工作的預約：只有主額度可立即使用、且背景額度沒有透支時才扣除。
+
+        背景額度是另一組以 background_share 比例回補的桶子，允許單次透支（一次請求可能比它的容量大），
+        透支期間拒絕新的背景請求，因此長期平均不超過總額度的 background_share。
+
+        :return: True 表示已預約（失敗時需呼叫 cancel(..., background=True) 歸還）；False 表示沒有扣除任何額度。
+        """
+        if self.background_share <= 0:
+            with self._lock:
+                self.background_denied += 1
+            return False
+        charge = self._charge(model, tokens)
+
+        def apply(state):
+            now = time.time()
+            entry, capacities = self._buckets(model, state, now, background=True)
+            levels = {key: self._refill(entry[key], capacity, now) for key, capacity in capacities.items()}
+            if levels["req"] < 1 or levels["tok"] < charge or levels["bg_req"] < 0 or levels["bg_tok"] < 0:
+                self.background_denied += 1
+                return False
+            self._add(entry, capacities, now, {"req": -1, "tok": -charge, "bg_req": -1, "bg_tok": -tokens})
+            self.reserved += 1
+            return True
+
+        return self._update(apply)
+
+    def cancel(self, model, tokens, background=False):
+        """歸還尚未使用的預約（tokens 與 background 需與預約時相同，歸還量與扣除量一致）"""
+        charge = self._charge(model, tokens)
+
+        def apply(state):
+            now = time.time()
+            entry, capacities = self._buckets(model, state, now, background)
+            self._add(entry, capacities, now, {"req": 1, "tok": charge, "bg_req": 1, "bg_tok": tokens})
+            self.cancelled += 1
+
+        self._update(apply)
+
+    def settle(self, model, reserved_tokens, used_tokens, background=False):
+        """以實際用量修正預約時的估計值"""
+        if used_tokens is None or used_tokens == reserved_tokens:
+            return
+        # 主額度以預約與實際用量各自扣除的量計算差額，與 reserve 的上限一致
+        main_diff = self._charge(model, reserved_tokens) - self._charge(model, used_tokens)
+
+        def apply(state):
+            now = time.time()
+            entry, capacities = self._buckets(model, state, now, background)
+            self._add(entry, capacities, now, {"tok": main_diff, "bg_tok": reserved_tokens - used_tokens})
+
+        self._update(apply)
+
+    def stats(self):
+        with self._lock:
+            return {"reserved": self.reserved, "delayed": self.delayed, "cancelled": self.cancelled,
+                    "background_denied": self.background_denied}
+
+
+groq_limiter = TokenBucketLimiter()
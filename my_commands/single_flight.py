@@ -0,0 +1,82 @@
+import threading
+import functools
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    相同 key 的並行呼叫只執行一次：第一個呼叫者負責計算，
+    期間進來的呼叫者等待並取得同一份結果（或同一個例外）。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key, func, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.shared += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            # 先移除再通知，之後進來的呼叫會重新計算（或命中各模組自己的快取）
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+            if call.waiters:
+                print(f"* single_flight {key} 共用結果 {call.waiters} 次")
+        return call.result
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self):
+        return {"executed": self.executed, "shared": self.shared, "in_flight": self.in_flight()}
+
+
+flights = SingleFlight()
+
+
+def coalesce(key_func=None):
+    """
+    指令處理函數的裝飾器：相同參數的並行呼叫合併成一次。
+
+    :param key_func: 把參數轉成 key 的函數（例如把「大盤」與「^TWII」視為相同）；預設直接使用參數。
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = key_func(*args, **kwargs) if key_func else (args, tuple(sorted(kwargs.items())))
+            return flights.do((func.__module__, func.__name__, key), func, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,89 @@
+import os
+import re
+import json
+import threading
+from my_commands.stock.symbol_index import get_symbol_index
+
+# 已知的股號 -> 交易所後綴（.TW 上市 / .TWO 上櫃），保存在磁碟上跨重啟沿用
+CACHE_PATH = os.getenv(
+    "EXCHANGE_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), '.cache', 'exchange_suffix.json'),
+)
+SUFFIXES = (".TW", ".TWO")
+TW_CODE = re.compile(r'^\d{4,6}[A-Za-z]?$')
+
+
+class ExchangeResolver:
+    """記住每個台股代碼屬於上市或上櫃，下次直接用正確的後綴"""
+
+    def __init__(self, path=CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._suffixes = {}  # 成功取得資料後記錄的後綴（寫入磁碟）
+        self._hints = {}  # 未驗證的預設後綴（只在記憶體）
+        try:
+            with open(path, encoding='utf-8') as f:
+                self._suffixes = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def seed_from_symbol_index(self):
+        """name_df.csv 收錄的多為上市股票，在記憶體中預設先試 .TW（未驗證，不寫入磁碟）"""
+        hints = dict.fromkeys(get_symbol_index().codes(), ".TW")
+        with self._lock:
+            self._hints = hints
+
+    def candidates(self, stock_id):
+        """
+        依嘗試順序回傳 yfinance 代碼；非台股代碼原樣回傳。
+
+        已記錄或預設的後綴排在前面，另一個交易所一律排在後面作為備援（上櫃股票、轉上市/下櫃等）。
+        """
+        if not TW_CODE.match(stock_id):
+            return [stock_id]
+        preferred = self._suffixes.get(stock_id) or self._hints.get(stock_id) or SUFFIXES[0]
+        return [stock_id + preferred] + [stock_id + suffix for suffix in SUFFIXES if suffix != preferred]
+
+    def learn(self, stock_id, symbol):
+        """記錄成功取得資料的後綴"""
+        suffix = symbol[len(stock_id):]
+        if suffix not in SUFFIXES or self._suffixes.get(stock_id) == suffix:
+            return
+        with self._lock:
+            self._suffixes[stock_id] = suffix
+        self._save()
+
+    def _save(self):
+        with self._lock:
+            snapshot = dict(self._suffixes)
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"無法寫入交易所後綴快取: {e}")
+
+    def fetch(self, stock_id, func):
+        """
+        依序以各後綴呼叫 func(symbol)，成功後記住該後綴。
+
+        :param func: 取得資料的函數，失敗或沒有資料時需丟出例外。
+        :return: func 的回傳值；全部失敗時丟出最後一個例外。
+        """
+        error = None
+        for symbol in self.candidates(stock_id):
+            try:
+                result = func(symbol)
+            except Exception as e:
+                error = e
+                continue
+            if symbol != stock_id:
+                self.learn(stock_id, symbol)
+            return result
+        raise error
+
+
+resolver = ExchangeResolver()
+resolver.seed_from_symbol_index()
@@ -0,0 +1,129 @@
+import re
+import datetime as dt
+import threading
+from zoneinfo import ZoneInfo
+
+# 休市日（除週末外），每年公告後請更新
+TW_HOLIDAYS = {
+    # 2026 臺灣證券交易所
+    "2026-01-01", "2026-02-16", "2026-02-17", "2026-02-18", "2026-02-19", "2026-02-20",
+    "2026-02-27", "2026-04-03", "2026-04-06", "2026-05-01", "2026-06-19", "2026-09-25",
+    "2026-09-28", "2026-10-09", "2026-10-26", "2026-12-25",
+    # 2027（尚未公告完整休市日，見 HOLIDAY_YEARS）
+    "2027-01-01",
+}
+US_HOLIDAYS = {
+    # 2026 NYSE
+    "2026-01-01", "2026-01-19", "2026-02-16", "2026-04-03", "2026-05-25", "2026-06-19",
+    "2026-07-03", "2026-09-07", "2026-11-26", "2026-12-25",
+    # 2027 NYSE
+    "2027-01-01", "2027-01-18", "2027-02-15", "2027-03-26", "2027-05-31", "2027-06-18",
+    "2027-07-05", "2027-09-06", "2027-11-25", "2027-12-24",
+}
+
+# 已收錄完整休市日的年份；其他年份只能以週末判斷，快取改用 UNKNOWN_CALENDAR_TTL
+HOLIDAY_YEARS = {
+    "TW": {2026},
+    "US": {2026, 2027},
+}
+# 休市日不完整的年份，收盤後快取最多保留的秒數
+UNKNOWN_CALENDAR_TTL = 60 * 60
+
+MARKETS = {
+    "TW": {"tz": ZoneInfo("Asia/Taipei"), "open": dt.time(9, 0), "close": dt.time(13, 30), "holidays": TW_HOLIDAYS},
+    "US": {"tz": ZoneInfo("America/New_York"), "open": dt.time(9, 30), "close": dt.time(16, 0), "holidays": US_HOLIDAYS},
+}
+
+# 盤中資料會變動，快取只保留短時間（秒）
+INTRADAY_TTL = 300
+
+
+def normalize_symbol(stock_id):
+    """統一指令中的股票代碼寫法，例如「大盤」->「^TWII」、「aapl」->「AAPL」"""
+    stock_id = stock_id.strip()
+    if stock_id in ("大盤", "台股"):
+        return "^TWII"
+    if stock_id in ("美盤", "美股"):
+        return "^GSPC"
+    return stock_id.upper()
+
+
+def market_of(symbol):
+    """依代碼判斷所屬市場：台股代碼或 ^TWII 為 TW，其餘視為 US"""
+    if symbol == "^TWII" or re.match(r'^\d{4,6}[A-Za-z]?$', symbol):
+        return "TW"
+    return "US"
+
+
+_warned_years = set()
+_warned_lock = threading.Lock()
+
+
+def has_full_calendar(market, day):
+    """該年度的休市日是否已完整收錄；沒有時只印一次警告"""
+    if day.year in HOLIDAY_YEARS[market]:
+        return True
+    with _warned_lock:
+        if (market, day.year) not in _warned_years:
+            _warned_years.add((market, day.year))
+            print(f"* market_calendar 警告: {market} {day.year} 年休市日未收錄，收盤後快取最多 {UNKNOWN_CALENDAR_TTL} 秒")
+    return False
+
+
+def is_trading_day(market, day):
+    return day.weekday() < 5 and day.isoformat() not in MARKETS[market]["holidays"]
+
+
+def _previous_trading_day(market, day):
+    day -= dt.timedelta(days=1)
+    while not is_trading_day(market, day):
+        day -= dt.timedelta(days=1)
+    return day
+
+
+def _next_trading_day(market, day):
+    day += dt.timedelta(days=1)
+    while not is_trading_day(market, day):
+        day += dt.timedelta(days=1)
+    return day
+
+
+def next_open(market, now=None):
+    """下一次開盤時間（市場當地時區）"""
+    info = MARKETS[market]
+    now = (now or dt.datetime.now(info["tz"])).astimezone(info["tz"])
+    today = now.date()
+    if is_trading_day(market, today) and now.time() < info["open"]:
+        day = today
+    else:
+        day = _next_trading_day(market, today)
+    return dt.datetime.combine(day, info["open"], tzinfo=info["tz"])
+
+
+def trading_session(symbol, now=None):
+    """
+    取得目前對應的交易時段與快取秒數。
+
+    :return: (session_key, ttl)；盤中為當日時段、短 TTL，收盤後為最近一次收盤的時段，
+             TTL 延續到下一次開盤。
+    """
+    market = market_of(symbol)
+    info = MARKETS[market]
+    now = (now or dt.datetime.now(info["tz"])).astimezone(info["tz"])
+    today = now.date()
+
+    if is_trading_day(market, today) and info["open"] <= now.time() < info["close"]:
+        close_at = dt.datetime.combine(today, info["close"], tzinfo=info["tz"])
+        ttl = min(INTRADAY_TTL, (close_at - now).total_seconds())
+        return f"{market}:{today.isoformat()}:open", max(int(ttl), 1)
+
+    if is_trading_day(market, today) and now.time() >= info["close"]:
+        last_session = today
+    else:
+        last_session = _previous_trading_day(market, today)
+    opens_at = next_open(market, now)
+    ttl = (opens_at - now).total_seconds()
+    # 休市日不完整時，「下一次開盤」可能其實是休市日，改用較短的快取時間
+    if not (has_full_calendar(market, today) and has_full_calendar(market, opens_at.date())):
+        ttl = min(ttl, UNKNOWN_CALENDAR_TTL)
+    return f"{market}:{last_session.isoformat()}:close", max(int(ttl), 1)
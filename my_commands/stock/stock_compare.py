@@ -0,0 +1,136 @@
+import os
+import datetime as dt
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from my_commands.stock.symbol_index import get_stock_name
+from my_commands.stock.exchange_resolver import resolver
+from my_commands.stock.market_calendar import trading_session
+from my_commands.llm_gateway import get_reply, is_error_reply
+from my_commands.ttl_cache import TTLCache
+
+# 比較期間（日曆天）
+COMPARE_DAYS = 90
+
+compare_cache = TTLCache(maxsize=64)
+# 有代碼下載失敗的報告只短暫快取（與個股報告相同設定）
+PARTIAL_REPORT_TTL = int(os.getenv("STOCK_PARTIAL_REPORT_TTL", 120))
+
+
+def _download(symbols, days):
+    """一次 yf.download 取得多個 yfinance 代碼的日K，回傳以原始代碼為欄位的 (收盤價, 最高價, 最低價)"""
+    end = dt.date.today() + dt.timedelta(days=1)
+    start = end - dt.timedelta(days=days)
+    df = yf.download(list(symbols), start=start, end=end, auto_adjust=True,
+                     group_by='column', progress=False, threads=True)
+    if df.empty:
+        return tuple(pd.DataFrame() for _ in range(3))
+
+    frames = []
+    for field in ('Close', 'High', 'Low'):
+        frame = df[field]
+        if isinstance(frame, pd.Series):  # 只有一檔時不是多層欄位
+            frame = frame.to_frame(next(iter(symbols)))
+        frames.append(frame.rename(columns=symbols).dropna(axis=1, how='all'))
+    return tuple(frames)
+
+
+def fetch_prices(stock_ids, days=COMPARE_DAYS):
+    """
+    取得所有代碼的日K，回傳 (收盤價, 最高價, 最低價) DataFrame，欄位為原始代碼。
+
+    台股先以已知（或預設）的交易所後綴批次下載，沒有資料的代碼再以另一個後綴（上櫃 .TWO）補抓一次，
+    成功的後綴交給 resolver 記住。
+    """
+    candidates = {stock_id: resolver.candidates(stock_id) for stock_id in stock_ids}
+    symbols = {options[0]: stock_id for stock_id, options in candidates.items()}
+    frames = _download(symbols, days)
+
+    retry = {options[1]: stock_id for stock_id, options in candidates.items()
+             if stock_id not in frames[0].columns and len(options) > 1}
+    if retry:
+        extra = _download(retry, days)
+        if not extra[0].empty:
+            frames = tuple(pd.concat([frame, more], axis=1) for frame, more in zip(frames, extra))
+        symbols = {symbol: stock_id for symbol, stock_id in symbols.items() if stock_id not in retry.values()}
+        symbols.update(retry)
+
+    if frames[0].empty:
+        raise Exception("No data found")
+    for symbol, stock_id in symbols.items():
+        if stock_id in frames[0].columns:
+            resolver.learn(stock_id, symbol)
+    return frames
+
+
+def compare_table(close, high, low):
+    """向量化計算各檔的報酬、波動度與區間位置"""
+    close = close.ffill()
+    daily_returns = close.pct_change()
+    last = close.iloc[-1]
+    first = close.bfill().iloc[0]
+    period_high = high.max()
+    period_low = low.min()
+
+    table = pd.DataFrame({
+        '收盤價': last,
+        '5日報酬%': close.pct_change(5, fill_method=None).iloc[-1] * 100,
+        '20日報酬%': close.pct_change(20, fill_method=None).iloc[-1] * 100,
+        f'{COMPARE_DAYS}天報酬%': (last / first - 1) * 100,
+        '年化波動%': daily_returns.std() * np.sqrt(252) * 100,
+        '最大回撤%': (close / close.cummax() - 1).min() * 100,
+        '區間高': period_high,
+        '區間低': period_low,
+        '區間位置%': (last - period_low) / (period_high - period_low).replace(0, np.nan) * 100,
+    })
+    return table.round(2), daily_returns.corr().round(2)
+
+
+def generate_content_msg(stock_ids):
+    """回傳 (訊息, 下載失敗的代碼)"""
+    close, high, low = fetch_prices(stock_ids)
+    table, corr = compare_table(close, high, low)
+    names = {stock_id: get_stock_name(stock_id) or stock_id for stock_id in table.index}
+    table.index = [f"{stock_id} {names[stock_id]}" if names[stock_id] != stock_id else stock_id for stock_id in table.index]
+
+    missing = [stock_id for stock_id in stock_ids if stock_id not in close.columns]
+
+    content_msg = f'你現在是一位專業的證券分析師, 請比較以下股票近{COMPARE_DAYS}天的表現:\n'
+    content_msg += f'{table.to_string()}\n'
+    content_msg += f'日報酬相關係數:\n{corr.to_string()}\n'
+    if missing:
+        content_msg += f'以下代碼資料無法取得: {", ".join(missing)}\n'
+    content_msg += '請比較各檔的報酬、風險與目前價位，指出相對強弱並給出配置建議，請使用台灣地區的繁體中文回答。'
+    return content_msg, missing
+
+
+def stock_compare(stock_ids):
+    """多檔股票比較報告（單次批次下載、單次 LLM 呼叫）"""
+    # 台美股混合時，任一市場的時段改變都要重新產生，TTL 取最短者
+    sessions = [trading_session(stock_id) for stock_id in stock_ids]
+    session_key = tuple(sorted({key for key, _ in sessions}))
+    ttl = min(ttl for _, ttl in sessions)
+    cache_key = (tuple(sorted(stock_ids)), session_key)
+    reply_data = compare_cache.get(cache_key)
+    if reply_data is not None:
+        return reply_data
+
+    try:
+        content_msg, missing = generate_content_msg(stock_ids)
+    except Exception as e:
+        return f"無法下載股票資料: {e}"
+
+    msg = [{
+        "role": "system",
+        "content": "你現在是一位專業的證券分析師。請依據提供的比較表，以 Markdown 表格與條列整理多檔股票的比較分析，回應請使用繁體中文。"
+    }, {
+        "role": "user",
+        "content": content_msg
+    }]
+    reply_data = get_reply(msg, "stock")
+    if missing:
+        print(f"* stock_compare 資料不完整 {missing}，快取 {PARTIAL_REPORT_TTL} 秒")
+        ttl = min(ttl, PARTIAL_REPORT_TTL)
+    if not is_error_reply(reply_data):
+        compare_cache.set(cache_key, reply_data, ttl)
+    return reply_data
@@ -1,38 +1,88 @@
 import os
 import re
-import pandas as pd
-import yfinance as yf
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from flask import Flask, request, abort
 from linebot import LineBotApi, WebhookHandler
 from linebot.models import PostbackEvent, TextSendMessage, MessageEvent, TextMessage
 from linebot.models import *
-from groq import Groq, GroqError
 import requests
 from my_commands.stock.stock_price import stock_price
 from my_commands.stock.stock_news import stock_news
 from my_commands.stock.stock_value import stock_fundamental
 from my_commands.stock.stock_rate import stock_dividend
-
-# 設定 API 金鑰
-groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-
-# 初始化全局變數以存儲股票資料
-stock_data_df = None
-
-# 讀取 CSV 檔案並將其轉換為 DataFrame，只在首次調用時讀取
-def load_stock_data():
-    global stock_data_df
-    if stock_data_df is None:
-        stock_data_df = pd.read_csv('name_df.csv')
-    return stock_data_df
-
-# 根據股號查找對應的股名
-def get_stock_name(stock_id):
-    stock_data_df = load_stock_data()  # 加載股票資料
-    result = stock_data_df[stock_data_df['股號'] == stock_id]
-    if not result.empty:
-        return result.iloc[0]['股名']
-    return None
+from my_commands.stock.symbol_index import get_stock_name
+from my_commands.stock.market_calendar import normalize_symbol, trading_session
+from my_commands.llm_gateway import get_reply, is_error_reply
+from my_commands.ttl_cache import TTLCache
+from my_commands.single_flight import coalesce
+
+# 分析報告快取：以 (股票代碼, 交易時段) 為 key，收盤後到下次開盤前直接回傳
+report_cache = TTLCache(maxsize=int(os.getenv("STOCK_REPORT_CACHE_SIZE", 256)))
+
+# 各資料來源並行抓取，單一來源逾時或失敗不影響整份報告
+fetch_executor = ThreadPoolExecutor(max_workers=int(os.getenv("STOCK_FETCH_WORKERS", 8)), thread_name_prefix="stock-fetch")
+# 各資料來源的逾時秒數
+SOURCE_TIMEOUTS = {
+    "price": float(os.getenv("STOCK_PRICE_TIMEOUT", 8)),
+    "news": float(os.getenv("STOCK_NEWS_TIMEOUT", 10)),
+    "fundamental": float(os.getenv("STOCK_FUNDAMENTAL_TIMEOUT", 10)),
+    "dividend": float(os.getenv("STOCK_DIVIDEND_TIMEOUT", 8)),
+}
+UNAVAILABLE = "資料無法取得"
+# 資料來源自行攔截錯誤時回傳的訊息開頭（例如「無法下載股票資料: ...」），視同失敗
+SOURCE_ERROR_PREFIXES = ("無法",)
+# 有資料來源逾時或失敗的報告只短暫快取，來源恢復後盡快重新產生
+PARTIAL_REPORT_TTL = int(os.getenv("STOCK_PARTIAL_REPORT_TTL", 120))
+
+# 各資料來源耗時統計：{來源: {"count", "total", "max", "last", "timeouts", "errors"}}
+source_timings = {}
+_timings_lock = threading.Lock()
+
+def _record_timing(name, elapsed, status="ok"):
+    with _timings_lock:
+        stats = source_timings.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0, "last": 0.0, "timeouts": 0, "errors": 0})
+        if status == "timeout":
+            # 逾時的工作仍在背景執行，完成時會再記錄實際耗時
+            stats["timeouts"] += 1
+            return
+        stats["count"] += 1
+        stats["total"] += elapsed
+        stats["max"] = max(stats["max"], elapsed)
+        stats["last"] = elapsed
+        if status == "error":
+            stats["errors"] += 1
+
+def _timed_call(name, func, *args):
+    start = time.perf_counter()
+    try:
+        result = func(*args)
+    except Exception:
+        _record_timing(name, time.perf_counter() - start, "error")
+        raise
+    _record_timing(name, time.perf_counter() - start)
+    return result
+
+# 並行抓取多個資料來源，逾時或失敗的來源回傳 None
+def gather_sources(sources):
+    start = time.perf_counter()
+    futures = {name: fetch_executor.submit(_timed_call, name, func, *args) for name, (func, args) in sources.items()}
+    results = {}
+    for name, future in futures.items():
+        remaining = SOURCE_TIMEOUTS.get(name, 10) - (time.perf_counter() - start)
+        try:
+            results[name] = future.result(timeout=max(remaining, 0))
+        except FutureTimeoutError:
+            print(f"{name} 資料逾時")
+            _record_timing(name, time.perf_counter() - start, "timeout")
+            results[name] = None
+        except Exception as e:
+            print(f"{name} 資料取得失敗: {e}")
+            results[name] = None
+    timing_text = ", ".join(f"{n}: {source_timings[n]['last']:.2f}s" for n in futures if n in source_timings)
+    print(f"* stock_gpt 資料來源耗時 {timing_text}")
+    return results
 
 # 移除全形空格的函數
 def remove_full_width_spaces(data):
@@ -50,24 +100,7 @@ def truncate_text(data, max_length=1024):
         return data[:max_length]
     return data
 
-# 建立 GPT 模型
-def get_reply(messages):
-    print ("* stock_gpt ")
-    try:
-        response = groq_client.chat.completions.create(
-            model="llama3-70b-8192",
-            # model="llava-v1.5-7b-4096-preview",
-            messages=messages,
-            max_tokens=2000,
-            temperature=1.2
-        )
-        reply = response.choices[0].message.content
-        return reply
-    except GroqError as groq_err:
-        reply = f"GROQ API 發生錯誤: {groq_err.message}"
-        return reply
-
-# 建立訊息指令(Prompt)
+# 建立訊息指令(Prompt)，回傳 (訊息, 逾時或失敗的資料來源)
 def generate_content_msg(stock_id):
     # 檢查是否為美盤或台灣大盤
     if stock_id == "美盤" or stock_id == "美股":
@@ -85,39 +118,51 @@ def generate_content_msg(stock_id):
         else:
             stock_name = stock_id  # 將美股代碼或無法匹配的代碼當作股名
 
-    # 取得價格資訊
-    price_data = stock_price(stock_id)
-    # 取得新聞資料並移除全形空格字符及截取
-    news_data = remove_full_width_spaces(stock_news(stock_name))
-    news_data = truncate_text(remove_full_width_spaces(news_data), 1024)
+    # 並行取得價格、新聞、基本面與配息資料
+    sources = {
+        "price": (stock_price, (stock_id,)),
+        "news": (stock_news, (stock_name,)),
+    }
+    if stock_id not in ["^TWII", "^GSPC"]:
+        sources["fundamental"] = (stock_fundamental, (stock_id,))
+        sources["dividend"] = (stock_dividend, (stock_id,))
+    results = gather_sources(sources)
+    missing = [name for name, result in results.items()
+               if result is None or (isinstance(result, str) and result.startswith(SOURCE_ERROR_PREFIXES))]
+
+    price_data = results["price"]
+    # 新聞資料移除全形空格字符及截取
+    news_data = results["news"]
+    if news_data is not None:
+        news_data = truncate_text(remove_full_width_spaces(news_data), 1024)
 
     # 組合訊息，加入股名和股號
     content_msg = f'你現在是一位專業的證券分析師, 你會依據以下資料來進行分析並給出一份完整的分析報告:\n'
     content_msg += f'**股票代碼:** {stock_id}, **股票名稱:** {stock_name}\n'
-    content_msg += f'近期價格資訊:\n {price_data}\n'
+    content_msg += f'近期價格資訊:\n {price_data if price_data is not None else UNAVAILABLE}\n'
 
     if stock_id not in ["^TWII", "^GSPC"]:
-        stock_value_data = stock_fundamental(stock_id)
-        stock_vividend_data = stock_dividend(stock_id)      #配息資料
-        if stock_value_data:
+        stock_value_data = results["fundamental"]
+        stock_vividend_data = results["dividend"]      #配息資料
+        if stock_value_data is not None and len(stock_value_data):
             content_msg += f'每季營收資訊：\n {stock_value_data}\n'
         else:
-            content_msg += '每季營收資訊無法取得。\n'
+            content_msg += f'每季營收資訊：{UNAVAILABLE}\n'
 
         if stock_vividend_data:
             content_msg += f'配息資料：\n {stock_vividend_data}\n'
         else:
-            content_msg += '配息資料資訊無法取得。\n'
+            content_msg += f'配息資料：{UNAVAILABLE}\n'
 
-    content_msg += f'近期新聞資訊: \n {news_data}\n'
+    content_msg += f'近期新聞資訊: \n {news_data if news_data is not None else UNAVAILABLE}\n'
     content_msg += f'請給我{stock_name}近期的趨勢報告。請以詳細、嚴謹及專業的角度撰寫此報告，並提及重要的數字，請使用台灣地區的繁體中文回答。'
 
-    return content_msg
+    return content_msg, missing
 
-# StockGPT 主程式
-def stock_gpt(stock_id):
+# 產生分析報告（不經快取），回傳 (報告, 逾時或失敗的資料來源)
+def generate_stock_report(stock_id):
     # 生成內容訊息
-    content_msg = generate_content_msg(stock_id)
+    content_msg, missing = generate_content_msg(stock_id)
 
     # 根據股票代號判斷是否為台灣大盤或美股，並生成相應的連結
     if stock_id == "大盤":
@@ -150,35 +195,28 @@ def stock_gpt(stock_id):
     }]
 
     # 調用 GPT 模型進行回應生成
-    reply_data = get_reply(msg)
-
-    return reply_data
+    reply_data = get_reply(msg, "stock")
 
-# stock_value.py 內的 stock_fundamental 函數增加錯誤處理
-def stock_fundamental(stock_id):
-    if stock_id == "^GSPC":
-        print("美國大盤無需營收資料分析")
-        return None  # 大盤無需營收資料
+    return reply_data, missing
 
-    stock = yf.Ticker(stock_id)
-    try:
-        earnings_dates = stock.get_earnings_dates()
-    except Exception as e:
-        print(f"Error fetching earnings dates: {e}")
-        return None
-
-    if earnings_dates is None:
-        print("No earnings dates found for the symbol.")
-        return None
-
-    # 確認 'Earnings Date' 列是否存在，避免 KeyError
-    if "Earnings Date" not in earnings_dates.columns:
-        print("Column 'Earnings Date' not found in the data")
-        return None
-
-    if "Reported EPS" in earnings_dates.columns:
-        reported_eps = earnings_dates["Reported EPS"]
-        return reported_eps
-    else:
-        print("Column 'Reported EPS' not found in the data")
-        return None
+# StockGPT 主程式
+# 「大盤」與「^TWII」視為同一個查詢
+@coalesce(key_func=normalize_symbol)
+def stock_gpt(stock_id):
+    symbol = normalize_symbol(stock_id)
+    session_key, ttl = trading_session(symbol)
+    cache_key = (symbol, session_key)
+
+    reply_data = report_cache.get(cache_key)
+    if reply_data is not None:
+        print(f"* stock_gpt 快取命中 {cache_key} {report_cache.stats()}")
+        return reply_data
+
+    reply_data, missing = generate_stock_report(stock_id)
+    # 錯誤訊息不快取，下次重新產生；缺少部分資料的報告只短暫快取
+    if missing:
+        print(f"* stock_gpt 資料不完整 {missing}，快取 {PARTIAL_REPORT_TTL} 秒")
+        ttl = min(ttl, PARTIAL_REPORT_TTL)
+    if not is_error_reply(reply_data):
+        report_cache.set(cache_key, reply_data, ttl)
+    return reply_data
@@ -1,6 +1,46 @@
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+from concurrent.futures import ThreadPoolExecutor
 import datetime as dt
+from my_commands.ttl_cache import TTLCache
+from my_commands.http_client import http
+
+# lxml 比內建 html.parser 快很多，未安裝時退回 html.parser
+try:
+  import lxml  # noqa: F401
+  HTML_PARSER = 'lxml'
+except ImportError:
+  HTML_PARSER = 'html.parser'
+
+# 只解析 <p> 標籤，不建立整份 DOM
+ONLY_PARAGRAPHS = SoupStrainer('p')
+# 逾時秒數（連線, 讀取）
+NEWS_TIMEOUT = (3, 8)
+
+# 文章內文快取：newsId -> 內文，同一篇文章只下載一次
+article_cache = TTLCache(maxsize=512, ttl=24 * 60 * 60)
+article_executor = ThreadPoolExecutor(max_workers=5, thread_name_prefix="cnyes-article")
+
+# 取得單篇新聞內文
+def fetch_article(news_id):
+  cached = article_cache.get(news_id)
+  if cached is not None:
+    return cached
+
+  try:
+    response = http.get(f'https://news.cnyes.com/news/id/{news_id}', timeout=NEWS_TIMEOUT)
+    response.raise_for_status()
+  except requests.exceptions.RequestException as e:
+    print(f"新聞內文下載失敗 {news_id}: {e}")
+    return ''
+  soup = BeautifulSoup(response.content, HTML_PARSER, parse_only=ONLY_PARAGRAPHS)
+  p_elements = soup.find_all('p')
+  # 提取段落内容（前 4 個段落為頁面雜訊）
+  p = ''.join(paragraph.get_text() for paragraph in p_elements[4:])
+  # 沒有內文（例如改版或擋爬蟲頁面）不快取，下次重新下載
+  if p:
+    article_cache.set(news_id, p)
+  return p
 
 # 新聞資料
 def stock_news(stock_name ="大盤"):
@@ -9,26 +49,19 @@ def stock_news(stock_name ="大盤"):
 
   data=[]
   # 取得 Json 格式資料
-  json_data = requests.get(f'https://ess.api.cnyes.com/ess/api/v1/news/keyword?q={stock_name}&limit=5&page=1').json()
+  json_data = http.get(f'https://ess.api.cnyes.com/ess/api/v1/news/keyword?q={stock_name}&limit=5&page=1',
+                       timeout=NEWS_TIMEOUT).json()
 
   # 依照格式擷取資料
   items=json_data['data']['items']
-  for item in items:
-      # 網址、標題和日期
-      news_id = item["newsId"]
+  # 並行下載各篇內文
+  contents = article_executor.map(fetch_article, [item["newsId"] for item in items])
+  for item, p in zip(items, contents):
+      # 標題和日期
       title = item["title"]
       publish_at = item["publishAt"]
       # 使用 UTC 時間格式
       utc_time = dt.datetime.utcfromtimestamp(publish_at)
       formatted_date = utc_time.strftime('%Y-%m-%d')
-      # 前往網址擷取內容
-      url = requests.get(f'https://news.cnyes.com/'
-                        f'news/id/{news_id}').content
-      soup = BeautifulSoup(url, 'html.parser')
-      p_elements=soup .find_all('p')
-      # 提取段落内容
-      p=''
-      for paragraph in p_elements[4:]:
-          p+=paragraph.get_text()
       data.append([stock_name, formatted_date ,title,p])
-  return data
\ No newline at end of file
+  return data
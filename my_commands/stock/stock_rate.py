@@ -1,35 +1,24 @@
 import numpy as np
-import yfinance as yf
-import re
+from my_commands.stock.ticker_data import get_ticker_data
+from my_commands.stock.exchange_resolver import resolver
+
+# 取得配息資料，沒有資料時丟出例外
+def _dividends(symbol):
+    dividends = get_ticker_data(symbol).dividends
+    if dividends.empty:
+        raise Exception(f"No dividends found for {symbol}")
+    return dividends
 
 # 配息資料
 def stock_dividend(stock_id="大盤"):
-    if stock_id == "大盤":
+    if stock_id in ("大盤", "^TWII", "^GSPC"):
         return "大盤沒有具體配息資料"
 
-    # 判斷是否為台股（4-6位數字，可帶字母）
-    if re.match(r'^\d{4,6}[A-Za-z]?$', stock_id):  # 台股代碼格式
-        stock_id_tw = stock_id + ".TW"
-        stock_id_two = stock_id + ".TWO"
-
-        # 嘗試抓取 .TW 資料
-        try:
-            stock = yf.Ticker(stock_id_tw)
-            dividends = stock.dividends
-        except:
-            # 若抓取 .TW 資料失敗，嘗試抓取 .TWO 資料
-            try:
-                stock = yf.Ticker(stock_id_two)
-                dividends = stock.dividends
-            except Exception as e:
-                return f"無法取得配息資料: {e}"
-    else:
-        # 美股或其他市場的股票代碼
-        try:
-            stock = yf.Ticker(stock_id)
-            dividends = stock.dividends
-        except Exception as e:
-            return f"無法取得配息資料: {e}"
+    # 台股依已知的上市/上櫃後綴抓取，美股或其他市場直接抓取
+    try:
+        dividends = resolver.fetch(stock_id, _dividends)
+    except Exception as e:
+        return f"無法取得配息資料: {e}"
 
     # 檢查是否有配息資料
     if dividends.empty:
@@ -45,4 +34,4 @@ def stock_dividend(stock_id="大盤"):
         '配息': dividend_values
     }
 
-    return data
\ No newline at end of file
+    return data
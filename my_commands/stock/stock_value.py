@@ -1,55 +1,52 @@
 import numpy as np
-import yfinance as yf
-import re
+from my_commands.stock.ticker_data import get_ticker_data
+from my_commands.stock.exchange_resolver import resolver
+
+# 每季營收成長率
+def _revenue_growth(data):
+    return np.round(data.quarterly_financials.loc["Total Revenue"].pct_change(-1).dropna().tolist(), 2)
+
+# 取得有季度財報的 TickerData，沒有資料時丟出例外
+def _ticker_with_financials(symbol):
+    data = get_ticker_data(symbol)
+    if data.quarterly_financials.empty:
+        raise Exception(f"No financials found for {symbol}")
+    return data
 
 # 基本面資料
 def stock_fundamental(stock_id="大盤"):
-    if stock_id == "大盤":
+    if stock_id in ("大盤", "^TWII", "^GSPC"):
         return "大盤沒有具體基本面資料"
 
-    # 判斷是否為台股（4-6位數字，可帶字母）
-    if re.match(r'^\d{4,6}[A-Za-z]?$', stock_id):  # 台股代碼格式
-        stock_id_tw = stock_id + ".TW"
-        stock_id_two = stock_id + ".TWO"
-
-        # 嘗試抓取 .TW 資料
-        try:
-            stock = yf.Ticker(stock_id_tw)
-            quarterly_revenue_growth = np.round(
-                stock.quarterly_financials.loc["Total Revenue"].pct_change(-1).dropna().tolist(), 2)
-        except:
-            # 若抓取 .TW 資料失敗，嘗試抓取 .TWO 資料
-            try:
-                stock = yf.Ticker(stock_id_two)
-                quarterly_revenue_growth = np.round(
-                    stock.quarterly_financials.loc["Total Revenue"].pct_change(-1).dropna().tolist(), 2)
-            except Exception as e:
-                return f"無法取得基本面資料: {e}"
-    else:
-        # 美股或其他市場的股票代碼
-        try:
-            stock = yf.Ticker(stock_id)
-            quarterly_revenue_growth = np.round(
-                stock.quarterly_financials.loc["Total Revenue"].pct_change(-1).dropna().tolist(), 2)
-        except Exception as e:
-            return f"無法取得基本面資料: {e}"
+    # 台股依已知的上市/上櫃後綴抓取，美股或其他市場直接抓取
+    try:
+        data = resolver.fetch(stock_id, _ticker_with_financials)
+        quarterly_revenue_growth = _revenue_growth(data)
+    except Exception as e:
+        return f"無法取得基本面資料: {e}"
+
+    # 財報日資料只取一次
+    try:
+        earnings_dates = data.earnings_dates
+    except Exception as e:
+        print(f"Error fetching earnings dates: {e}")
+        earnings_dates = None
 
     # 檢查是否存在 "Reported EPS" 欄位
-    if "Reported EPS" in stock.get_earnings_dates().columns:
+    if earnings_dates is not None and "Reported EPS" in earnings_dates.columns:
+        reported_eps = earnings_dates["Reported EPS"]
         # 每季EPS
-        quarterly_eps = np.round(
-            stock.get_earnings_dates()["Reported EPS"].dropna().tolist(), 2)
+        quarterly_eps = np.round(reported_eps.dropna().tolist(), 2)
 
         # EPS季增率
-        quarterly_eps_growth = np.round(
-            stock.get_earnings_dates()["Reported EPS"].ffill().pct_change(-1).dropna().tolist(), 2)
+        quarterly_eps_growth = np.round(reported_eps.ffill().pct_change(-1).dropna().tolist(), 2)
     else:
         quarterly_eps = [None] * 3
         quarterly_eps_growth = [None] * 3
 
     # 轉換日期
     dates = [
-        date.strftime('%Y-%m-%d') for date in stock.quarterly_financials.columns
+        date.strftime('%Y-%m-%d') for date in data.quarterly_financials.columns
     ]
 
     data = {
@@ -60,4 +57,3 @@ def stock_fundamental(stock_id="大盤"):
     }
 
     return data
-
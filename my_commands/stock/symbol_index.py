@@ -0,0 +1,148 @@
+import os
+import csv
+import bisect
+import threading
+from types import MappingProxyType
+
+# name_df.csv 位於專案根目錄
+NAME_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'name_df.csv')
+
+# 常用簡稱 -> 股號
+ALIASES = {
+    "台積": "2330",
+    "積電": "2330",
+    "鴻海精密": "2317",
+    "發哥": "2454",
+    "聯電": "2303",
+    "中鋼": "2002",
+    "長榮海運": "2603",
+}
+
+# 股名後綴（例如「-KY」）去除後也可以查詢
+NAME_SUFFIXES = ("-KY", "-DR", "*")
+
+
+class SymbolIndex:
+    """股號/股名/產業別的唯讀索引，建立後不可修改"""
+
+    __slots__ = ("_names", "_codes", "_industries", "_sorted_keys")
+
+    def __init__(self, rows):
+        names, codes, industries = {}, {}, {}
+        for code, name, industry in rows:
+            names[code] = name
+            industries[code] = industry
+            codes.setdefault(name, code)
+            for suffix in NAME_SUFFIXES:
+                if name.endswith(suffix):
+                    codes.setdefault(name[:-len(suffix)], code)
+        for alias, code in ALIASES.items():
+            if code in names:
+                codes.setdefault(alias, code)
+
+        self._names = MappingProxyType(names)
+        self._codes = MappingProxyType(codes)
+        self._industries = MappingProxyType(industries)
+        # 前綴搜尋用：股名、別名與股號排序後以二分搜尋
+        self._sorted_keys = tuple(sorted(set(codes) | set(names)))
+
+    @classmethod
+    def from_csv(cls, path=NAME_CSV):
+        with open(path, encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            rows = [(row['股號'].strip(), row['股名'].strip(), row['產業別'].strip()) for row in reader]
+        return cls(rows)
+
+    def __len__(self):
+        return len(self._names)
+
+    def codes(self):
+        """所有股號"""
+        return tuple(self._names)
+
+    def get_name(self, code):
+        """股號 -> 股名，找不到回傳 None"""
+        return self._names.get(str(code).strip().upper())
+
+    def get_code(self, name):
+        """股名或別名 -> 股號；輸入本身是股號時直接回傳"""
+        name = str(name).strip()
+        if name in self._names:
+            return name
+        return self._codes.get(name)
+
+    def get_industry(self, code):
+        """股號 -> 產業別"""
+        return self._industries.get(str(code).strip().upper())
+
+    def search(self, prefix, limit=10):
+        """
+        以前綴搜尋股號、股名或別名。
+
+        :return: [(股號, 股名), ...]，依排序最多 limit 筆且不重複。
+        """
+        prefix = str(prefix).strip()
+        if not prefix:
+            return []
+        results = []
+        seen = set()
+        i = bisect.bisect_left(self._sorted_keys, prefix)
+        while i < len(self._sorted_keys) and len(results) < limit:
+            key = self._sorted_keys[i]
+            if not key.startswith(prefix):
+                break
+            code = key if key in self._names else self._codes[key]
+            if code not in seen:
+                seen.add(code)
+                results.append((code, self._names[code]))
+            i += 1
+        return results
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_symbol_index():
+    """取得全域共用的索引（只在第一次呼叫時讀取 CSV）"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = SymbolIndex.from_csv()
+    return _index
+
+
+def get_stock_name(stock_id):
+    """根據股號查找對應的股名"""
+    return get_symbol_index().get_name(stock_id)
+
+
+def benchmark(rounds=20000):
+    """比較 DataFrame 逐列比對與索引查詢的速度"""
+    import timeit
+    import pandas as pd
+
+    df = pd.read_csv(NAME_CSV)
+    index = get_symbol_index()
+    codes = ["2330", "1101", "0050", "9999"]
+
+    def dataframe_scan():
+        for code in codes:
+            result = df[df['股號'] == int(code)]
+            if not result.empty:
+                result.iloc[0]['股名']
+
+    def index_lookup():
+        for code in codes:
+            index.get_name(code)
+
+    n = max(rounds // 100, 1)
+    scan = timeit.timeit(dataframe_scan, number=n) / (n * len(codes))
+    lookup = timeit.timeit(index_lookup, number=rounds) / (rounds * len(codes))
+    print(f"DataFrame 掃描: {scan * 1e6:.1f} µs/次")
+    print(f"SymbolIndex 查詢: {lookup * 1e6:.3f} µs/次 (約快 {scan / lookup:.0f} 倍)")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,106 @@
+import time
+import threading
+import pandas as pd
+import yfinance as yf
+from my_commands.ttl_cache import TTLCache
+
+# 財報與配息資料最短/最長保留時間（秒）
+MIN_TTL = 60 * 60
+MAX_TTL = 95 * 24 * 60 * 60
+# 無法推算下次財報日時，假設一季約 91 天
+QUARTER_DAYS = 91
+
+
+class TickerData:
+    """
+    同一檔股票的 yfinance 資料，每種資料只向 Yahoo 抓取一次。
+
+    財報、季度財務與配息資料會保留到下一次預期的財報日或除息日；
+    有任何資料為空（Yahoo 暫時沒有回傳）時只保留 MIN_TTL。
+    """
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.ticker = yf.Ticker(symbol)
+        self.created_at = time.time()
+        self._values = {}
+        self._empty = set()  # 取得結果為空的資料名稱
+        # 每種資料各自一把鎖，不同資料可同時下載
+        self._locks = {name: threading.Lock() for name in ("earnings_dates", "quarterly_financials", "dividends")}
+
+    def _load(self, name, loader):
+        if name not in self._values:
+            with self._locks[name]:
+                if name not in self._values:
+                    value = loader()
+                    if value is None or not len(value):
+                        self._empty.add(name)
+                    self._values[name] = value
+        return self._values[name]
+
+    @property
+    def earnings_dates(self):
+        """財報日與 EPS（含未來預估日期）"""
+        return self._load("earnings_dates", self.ticker.get_earnings_dates)
+
+    @property
+    def quarterly_financials(self):
+        return self._load("quarterly_financials", lambda: self.ticker.quarterly_financials)
+
+    @property
+    def dividends(self):
+        return self._load("dividends", lambda: self.ticker.dividends)
+
+    def history(self, start, end):
+        """歷史股價（價格會變動，不快取，但共用同一個 Ticker）"""
+        return self.ticker.history(start=start, end=end, auto_adjust=False)
+
+    def next_refresh_time(self):
+        """推算下一次財報公布或除息的時間（epoch 秒）"""
+        now = pd.Timestamp.now(tz="UTC")
+        candidates = []
+
+        earnings = self._values.get("earnings_dates")
+        if earnings is not None and len(earnings.index):
+            index = pd.DatetimeIndex(earnings.index)
+            index = index.tz_convert("UTC") if index.tz is not None else index.tz_localize("UTC")
+            upcoming = index[index > now]
+            if len(upcoming):
+                candidates.append(upcoming.min())
+            else:
+                candidates.append(index.max() + pd.Timedelta(days=QUARTER_DAYS))
+
+        dividends = self._values.get("dividends")
+        if dividends is not None and len(dividends.index) >= 2:
+            index = pd.DatetimeIndex(dividends.index)
+            index = index.tz_convert("UTC") if index.tz is not None else index.tz_localize("UTC")
+            # 以近幾次的配息間隔中位數估計下次除息日
+            interval = pd.Series(index[-5:]).diff().dropna().median()
+            candidates.append(index.max() + interval)
+
+        candidates = [c for c in candidates if c > now]
+        if not candidates:
+            return self.created_at + QUARTER_DAYS * 24 * 60 * 60
+        return min(candidates).timestamp()
+
+    def is_expired(self):
+        age = time.time() - self.created_at
+        if age < MIN_TTL:
+            return False
+        if age > MAX_TTL or self._empty:
+            return True
+        return time.time() >= self.next_refresh_time()
+
+
+_cache = TTLCache(maxsize=256, ttl=MAX_TTL)
+_cache_lock = threading.Lock()
+
+
+def get_ticker_data(symbol):
+    """取得共用的 TickerData，過了下一次財報/除息日後重新建立"""
+    with _cache_lock:
+        data = _cache.get(symbol)
+        if data is None or data.is_expired():
+            data = TickerData(symbol)
+            _cache.set(symbol, data)
+        return data
@@ -0,0 +1,12 @@
+import os
+import sys
+
+# 讓測試可以直接 import app 與 my_commands（從任何目錄執行 pytest 皆可）
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# 測試時不啟動背景更新執行緒，也不連線
+os.environ.setdefault("PARTJOB_REFRESH", "0")
+os.environ.setdefault("PREFETCH", "0")
+os.environ.setdefault("WARMUP", "0")
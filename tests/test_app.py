@@ -0,0 +1,83 @@
+import os
+
+os.environ.setdefault("CHANNEL_ACCESS_TOKEN", "test-token")
+os.environ.setdefault("CHANNEL_SECRET", "test-secret")
+os.environ.setdefault("PREFETCH", "0")
+os.environ.setdefault("WARMUP", "0")
+os.environ.setdefault("PARTJOB_REFRESH", "0")
+
+import pytest  # noqa: E402
+import app  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    return app.app.test_client()
+
+
+def test_stats_is_local_only_without_token(client, monkeypatch):
+    monkeypatch.setattr(app, "STATS_TOKEN", None)
+    assert client.get("/stats").status_code == 200
+    assert client.get("/stats", environ_base={"REMOTE_ADDR": "203.0.113.9"}).status_code == 403
+
+
+def test_stats_requires_token_when_configured(client, monkeypatch):
+    monkeypatch.setattr(app, "STATS_TOKEN", "s3cret")
+    assert client.get("/stats").status_code == 403
+    assert client.get("/stats", headers={"Authorization": "Bearer wrong"}).status_code == 403
+    assert client.get("/stats", headers={"Authorization": "Bearer s3cret"}).status_code == 200
+
+
+def test_stats_reports_startup_time(client, monkeypatch):
+    monkeypatch.setattr(app, "STATS_TOKEN", None)
+    imports = client.get("/stats").get_json()["imports"]
+    if os.path.exists("/proc/self/stat"):
+        # 由行程啟動時間計算，至少包含載入 flask 與 app 模組的時間
+        assert imports["startup_ms"] > 0
+    else:
+        assert "startup_ms" not in imports
+
+
+def test_stats_does_not_evict(client, monkeypatch):
+    monkeypatch.setattr(app, "STATS_TOKEN", None)
+    calls = []
+    monkeypatch.setattr(app.conversations, "evict_idle", lambda: calls.append(1))
+    client.get("/stats")
+    assert calls == []
+
+
+def _text_event(text, user_id="U-test"):
+    from linebot.models import MessageEvent, SourceUser, TextMessage
+    import time
+    return MessageEvent(timestamp=int(time.time() * 1000), source=SourceUser(user_id=user_id),
+                        reply_token="reply-token", message=TextMessage(id="1", text=text))
+
+
+@pytest.fixture
+def replies(monkeypatch):
+    sent = []
+    monkeypatch.setattr(app, "send_reply", lambda event, chat_id, text: sent.append(text))
+    monkeypatch.setattr(app, "start_loading_animation_async", lambda *args, **kwargs: None)
+    return sent
+
+
+@pytest.mark.parametrize("prefetch_keys", [False, True])
+def test_handle_message_compare(monkeypatch, replies, prefetch_keys):
+    calls = []
+    monkeypatch.setitem(app.COMMANDS, "compare", lambda stock_ids: calls.append(stock_ids) or "比較報告")
+    if prefetch_keys:
+        monkeypatch.setattr(app.prefetcher, "_keys", {("stock", "2330"): None})
+    app.handle_message(_text_event("2330 2317 2454"))
+    assert calls == [["2330", "2317", "2454"]]
+    assert replies == ["比較報告"]
+
+
+def test_handle_message_serves_prefetched_result(monkeypatch, replies):
+    from my_commands.command_router import Route
+    from my_commands.prefetch import _key
+    route = Route("gold", ())
+    monkeypatch.setitem(app.COMMANDS, "gold", lambda: pytest.fail("should use the prefetched result"))
+    monkeypatch.setattr(app.prefetcher, "_keys", {_key(route): route})
+    app.prefetcher.results.set(_key(route), "預先算好的金價", 60)
+    app.handle_message(_text_event("金價"))
+    assert replies == ["預先算好的金價"]
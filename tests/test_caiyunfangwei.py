@@ -0,0 +1,60 @@
+import pytest
+
+from my_commands import CaiyunfangweiCrawler as caiyunfangwei
+from my_commands.CaiyunfangweiCrawler import UNAVAILABLE, DailyCaiyunfangwei
+
+
+def _info(date):
+    return {"今天日期": f"{date}（星期六） 農曆九月初七", "今日歲次": "丙午年", "財神方位": "正東"}
+
+
+class _FakeCrawler:
+    def __init__(self, clock, page_date):
+        self.clock = clock
+        self.page_date = page_date
+        self.on_fetch = None
+
+    def get_caiyunfangwei(self):
+        if self.on_fetch:
+            self.on_fetch()
+        return _info(self.page_date)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = {"today": "2026-10-17"}
+    monkeypatch.setattr(DailyCaiyunfangwei, "today", staticmethod(lambda: clock["today"]))
+    return clock
+
+
+@pytest.fixture
+def daily(tmp_path, clock, monkeypatch):
+    daily = DailyCaiyunfangwei(crawler=_FakeCrawler(clock, "2026/10/17"), path=str(tmp_path / "caiyunfangwei.json"))
+    monkeypatch.setattr(daily, "_refresh_async", lambda: None)
+    return daily
+
+
+def test_yesterdays_info_is_not_served_after_midnight(daily, clock):
+    assert daily.refresh()
+    assert daily.get() == _info("2026/10/17")
+    clock["today"] = "2026-10-18"
+    assert daily.get() == UNAVAILABLE
+    # 網站跨日後尚未更新，仍是昨天的頁面
+    assert not daily.refresh()
+    assert daily.get() == UNAVAILABLE
+    daily.crawler.page_date = "2026/10/18"
+    assert daily.refresh()
+    assert daily.get() == _info("2026/10/18")
+
+
+def test_fetch_spanning_midnight_is_not_stored_as_today(daily, clock):
+    daily.crawler.on_fetch = lambda: clock.update(today="2026-10-18")
+    assert not daily.refresh()
+    assert daily.get() == UNAVAILABLE
+
+
+def test_unparseable_page_date_is_accepted(daily, clock):
+    daily.crawler.page_date = "丙午年九月初七"
+    assert daily.refresh()
+    assert daily.get()["財神方位"] == "正東"
+    assert caiyunfangwei._page_date({"今天日期": "2026/13/40"}) is None
@@ -0,0 +1,65 @@
+import pytest
+from my_commands.command_router import DEFAULT_ROUTE, Route, build_router, find_us_symbols
+
+# 範例訊息 -> 預期路由，修改指令表時請一併更新
+SAMPLE_ROUTES = [
+    ("威力彩", Route("lottery", ("威力彩",))),
+    ("今天539開什麼", Route("lottery", ("今天539開什麼",))),
+    ("大盤", Route("stock", ("大盤",))),
+    ("台股今天如何", Route("stock", ("大盤",))),
+    ("美股", Route("stock", ("美盤",))),
+    ("金價", Route("gold", ())),
+    ("Gold", Route("gold", ())),
+    ("白金", Route("platinum", ())),
+    ("日幣", Route("money", ("JPY",))),
+    ("JPY", Route("money", ("JPY",))),
+    ("美金", Route("money", ("USD",))),
+    ("104:iOS", Route("one04", ("iOS",))),
+    ("pt:桃園", Route("partjob", ("桃園",))),
+    ("cb: bitcoin", Route("crypto", ("bitcoin",))),
+    ("$:ethereum", Route("crypto", ("ethereum",))),
+    ("2330 2317 2454", Route("compare", (["2330", "2317", "2454"],))),
+    ("AAPL MSFT NVDA", Route("compare", (["AAPL", "MSFT", "NVDA"],))),
+    ("2330 vs AAPL", Route("compare", (["2330", "AAPL"],))),
+    ("2330 EPS 多少", Route("stock", ("2330",))),
+    ("I think NVDA is good", Route("stock", ("NVDA",))),
+    ("2330", Route("stock", ("2330",))),
+    ("00878B", Route("stock", ("00878B",))),
+    ("台積電", Route("stock", ("2330",))),
+    ("AAPL", Route("stock", ("AAPL",))),
+    ("$TSLA", Route("stock", ("TSLA",))),
+    ("$F", Route("stock", ("F",))),
+    ("比特幣", Route("crypto", ("bitcoin",))),
+    ("狗狗幣", Route("crypto", ("dogecoin",))),
+    ("老婆", Route("gf_on", ())),
+    ("離婚", Route("gf_off", ())),
+    ("2330的ROE", DEFAULT_ROUTE),
+    ("I love you", DEFAULT_ROUTE),
+    ("HELLO", DEFAULT_ROUTE),
+    ("我想問 ETF 推薦", DEFAULT_ROUTE),
+    ("hi", DEFAULT_ROUTE),
+    ("ok", DEFAULT_ROUTE),
+    ("OK 謝謝", DEFAULT_ROUTE),
+    ("今天天氣如何", DEFAULT_ROUTE),
+]
+
+
+@pytest.fixture(scope="module")
+def router():
+    return build_router({"台積電": "2330"}.get)
+
+
+@pytest.mark.parametrize("message, expected", SAMPLE_ROUTES)
+def test_sample_routes(router, message, expected):
+    assert router.route(message) == expected
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("I think NVDA is good", ["NVDA"]),
+    ("A B C", []),
+    ("ETF EPS ROE CEO", []),
+    ("$ETF", ["ETF"]),
+    ("看看 TSLA 和 $F", ["TSLA", "F"]),
+])
+def test_find_us_symbols(message, expected):
+    assert find_us_symbols(message) == expected
@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+from my_commands import conversation_store
+from my_commands.conversation_sqlite import SQLiteConversationStore
+from my_commands.conversation_store import ConversationBackend, ConversationStore
+
+
+def test_backend_is_abstract():
+    with pytest.raises(TypeError):
+        ConversationBackend()
+
+
+@pytest.mark.parametrize("make_store", [
+    lambda tmp_path: ConversationStore(max_messages=4),
+    lambda tmp_path: SQLiteConversationStore(str(tmp_path / "conversations.db"), max_messages=4),
+])
+def test_store_keeps_latest_messages(tmp_path, make_store):
+    store = make_store(tmp_path)
+    evicted = [m for i in range(6) for m in store.append("chat", "user", f"m{i}")]
+    assert [m["content"] for m in store.messages("chat")] == ["m2", "m3", "m4", "m5"]
+    assert evicted == [{"role": "user", "content": "m0"}, {"role": "user", "content": "m1"}]
+    assert store.messages("chat", user_suffix="!")[-1]["content"] == "m5!"
+
+
+def test_default_db_path_is_relative_to_project():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(conversation_store.__file__)))
+    if "CONVERSATION_DB_PATH" not in os.environ:
+        assert conversation_store.DB_PATH == os.path.join(root, ".cache", "conversations.db")
@@ -0,0 +1,37 @@
+import pytest
+
+from my_commands.stock import exchange_resolver
+from my_commands.stock.exchange_resolver import ExchangeResolver
+
+
+class _Index:
+    def codes(self):
+        return ["2330", "6488"]
+
+
+@pytest.fixture
+def resolver(tmp_path, monkeypatch):
+    monkeypatch.setattr(exchange_resolver, "get_symbol_index", lambda: _Index())
+    resolver = ExchangeResolver(path=str(tmp_path / "exchange_suffix.json"))
+    resolver.seed_from_symbol_index()
+    return resolver
+
+
+def test_seed_is_only_a_hint(resolver, tmp_path):
+    assert resolver.candidates("2330") == ["2330.TW", "2330.TWO"]
+    assert not (tmp_path / "exchange_suffix.json").exists()
+
+
+def test_fallback_suffix_is_learned(resolver, tmp_path):
+    def fetch(symbol):
+        if symbol != "6488.TWO":
+            raise ValueError("no data")
+        return "ok"
+
+    assert resolver.fetch("6488", fetch) == "ok"
+    assert resolver.candidates("6488") == ["6488.TWO", "6488.TW"]
+    assert ExchangeResolver(path=str(tmp_path / "exchange_suffix.json")).candidates("6488")[0] == "6488.TWO"
+
+
+def test_us_symbols_are_unchanged(resolver):
+    assert resolver.candidates("AAPL") == ["AAPL"]
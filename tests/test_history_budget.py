@@ -0,0 +1,49 @@
+from my_commands import history_budget
+from my_commands.llm_gateway import BUSY_MESSAGE
+from my_commands.conversation_store import ConversationStore
+from my_commands.history_budget import RollingSummarizer
+
+
+class _InlineExecutor:
+    def submit(self, fn, *args):
+        fn(*args)
+
+
+def _summarizer(monkeypatch, prompts):
+    def fake_reply(messages, profile):
+        prompts.append(messages[-1]["content"])
+        return f"摘要{len(prompts)}"
+    monkeypatch.setattr(history_budget, "get_reply", fake_reply)
+    store = ConversationStore(max_messages=20)
+    summarizer = RollingSummarizer(store)
+    summarizer._executor = _InlineExecutor()
+    return store, summarizer
+
+
+def test_evicted_turns_reach_summary(monkeypatch):
+    prompts = []
+    store, summarizer = _summarizer(monkeypatch, prompts)
+    for i in range(30):
+        summarizer.evicted("chat", store.append("chat", "user", f"問題{i}"))
+        summarizer.build_messages("chat", store.messages("chat"))
+        summarizer.evicted("chat", store.append("chat", "assistant", f"回答{i}"))
+    lines = "\n".join(prompts).splitlines()
+    # 短對話從未超出 token 預算，但離開 20 則緩衝區的訊息都應併入摘要，且只處理一次
+    for i in range(20):
+        assert lines.count(f"user: 問題{i}") == 1
+    messages = summarizer.build_messages("chat", store.messages("chat"))
+    assert messages[0]["content"].startswith("先前對話摘要：摘要")
+    assert [m["content"] for m in messages[1:3]] == ["問題20", "回答20"]
+    assert "chat" not in summarizer._backlog
+
+
+def test_failed_summary_keeps_backlog(monkeypatch):
+    prompts = []
+    store, summarizer = _summarizer(monkeypatch, prompts)
+    monkeypatch.setattr(history_budget, "get_reply", lambda messages, profile: BUSY_MESSAGE)
+    for i in range(11):
+        summarizer.evicted("chat", store.append("chat", "user", f"q{i}"))
+        summarizer.evicted("chat", store.append("chat", "assistant", f"a{i}"))
+    summarizer.build_messages("chat", store.messages("chat"))
+    assert [m["content"] for m in summarizer._backlog["chat"]] == ["q0", "a0"]
+    assert store.get_summary("chat") == ('', None)
@@ -0,0 +1,42 @@
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from my_commands.http_client import CappedRetry, HttpClient
+
+
+@pytest.fixture
+def throttled_server():
+    """第一次請求回 429 並要求等 60 秒，之後回 200"""
+    hits = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits.append(self.path)
+            status = 429 if len(hits) == 1 else 200
+            self.send_response(status)
+            if status == 429:
+                self.send_header("Retry-After", "60")
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/", hits
+    server.shutdown()
+
+
+def test_retry_after_is_capped(throttled_server, monkeypatch):
+    url, hits = throttled_server
+    monkeypatch.setattr(CappedRetry, "max_retry_after", 0.2)
+    start = time.perf_counter()
+    response = HttpClient().get(url)
+    assert response.status_code == 200
+    assert len(hits) == 2
+    assert time.perf_counter() - start < 5
@@ -0,0 +1,104 @@
+import pytest
+
+from my_commands.llm_gateway import BUSY_MESSAGE, ERROR_PREFIX, is_error_reply
+
+
+@pytest.mark.parametrize("reply, expected", [
+    ("", True),
+    (None, True),
+    (BUSY_MESSAGE, True),
+    (f"{ERROR_PREFIX}: groq/llama3-70b-8192: timeout", True),
+    ("台積電近期走勢偏多……", False),
+])
+def test_is_error_reply(reply, expected):
+    assert is_error_reply(reply) is expected
+
+
+class _FailingClient:
+    class chat:
+        class completions:
+            @staticmethod
+            def create(**params):
+                raise RuntimeError("upstream 503")
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    from my_commands import llm_gateway
+    from my_commands.rate_limiter import TokenBucketLimiter
+    limiter = TokenBucketLimiter(limits={"test-model": {"rpm": 3, "tpm": 3000}}, path="", safety=1.0)
+    monkeypatch.setattr(llm_gateway, "groq_limiter", limiter)
+    monkeypatch.setattr(llm_gateway, "get_client", lambda: _FailingClient)
+    return limiter
+
+
+def test_failed_call_returns_reserved_quota(limiter):
+    from my_commands import llm_gateway
+    profile = {"model": "test-model", "max_tokens": 500, "temperature": 1.0}
+    for _ in range(10):
+        with pytest.raises(RuntimeError):
+            llm_gateway._call_groq("test-model", [{"role": "user", "content": "hi"}], profile)
+    assert limiter.cancelled == 10
+    assert limiter.reserve("test-model", 500) == 0
+
+
+def test_throttled_call_does_not_sleep(limiter, monkeypatch):
+    from my_commands import llm_gateway
+    monkeypatch.setattr(llm_gateway.time, "sleep", lambda seconds: pytest.fail("slept in handler thread"))
+    for _ in range(3):
+        limiter.reserve("test-model", 1)
+    profile = {"model": "test-model", "max_tokens": 500, "temperature": 1.0}
+    with pytest.raises(llm_gateway.QuotaExceeded):
+        llm_gateway._call_groq("test-model", [{"role": "user", "content": "hi"}], profile)
+
+
+def test_background_call_does_not_fall_back_when_quota_is_used(monkeypatch):
+    from my_commands import llm_gateway
+    from my_commands.rate_limiter import TokenBucketLimiter
+    limiter = TokenBucketLimiter(path="", background_share=0.0)
+    monkeypatch.setattr(llm_gateway, "groq_limiter", limiter)
+    monkeypatch.setattr(llm_gateway, "get_client", lambda: pytest.fail("background call reached Groq"))
+    with llm_gateway.background_calls():
+        assert llm_gateway.get_reply([{"role": "user", "content": "hi"}], "stock") == BUSY_MESSAGE
+    assert not llm_gateway.in_background()
+
+
+def test_rate_limited_call_falls_back_without_sleeping(monkeypatch):
+    import groq
+    import httpx
+    from my_commands import llm_gateway
+    from my_commands.rate_limiter import TokenBucketLimiter
+
+    calls = []
+
+    class _RateLimitedClient:
+        class chat:
+            class completions:
+                @staticmethod
+                def create(**params):
+                    calls.append(params["model"])
+                    response = httpx.Response(429, request=httpx.Request("POST", "https://api.groq.com"))
+                    raise groq.RateLimitError("rate limited", response=response, body=None)
+
+    limiter = TokenBucketLimiter(path="")
+    monkeypatch.setattr(llm_gateway, "groq_limiter", limiter)
+    monkeypatch.setattr(llm_gateway, "get_client", lambda: _RateLimitedClient)
+    monkeypatch.setattr(llm_gateway.time, "sleep", lambda seconds: pytest.fail("slept in handler thread"))
+    assert llm_gateway.get_reply([{"role": "user", "content": "hi"}], "stock") == BUSY_MESSAGE
+    # 每個模型只嘗試一次，不重試
+    assert calls == ["llama3-70b-8192", "llama3-8b-8192"]
+    assert limiter.stats()["cancelled"] == 2
+
+
+def test_cancel_refunds_what_reserve_charged():
+    from my_commands.rate_limiter import TokenBucketLimiter
+    limiter = TokenBucketLimiter(limits={"m": {"rpm": 3, "tpm": 3000}}, path="", safety=1.0)
+    # 超過整個額度的請求只扣到上限，歸還時也只還上限，不會讓桶子超過容量或留下負值
+    assert limiter.reserve("m", 10000) == 0
+    assert limiter.reserve("m", 1) > 0
+    limiter.cancel("m", 10000)
+    assert limiter._state["m"]["tok"][0] == pytest.approx(3000, abs=1)
+    assert limiter.reserve("m", 3000) == 0
+    limiter.settle("m", 3000, 20000)
+    assert limiter._state["m"]["tok"][0] == pytest.approx(0, abs=1)
+    assert limiter.stats() == {"reserved": 2, "delayed": 1, "cancelled": 1, "background_denied": 0}
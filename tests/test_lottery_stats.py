@@ -0,0 +1,59 @@
+import pytest
+
+from my_commands.command_router import LOTTERY_KEYWORDS
+from my_commands.lottery_stats import GAMES, game_of
+
+
+@pytest.mark.parametrize("keyword", [k for k in LOTTERY_KEYWORDS if k != "運彩"])
+def test_every_routed_keyword_maps_to_a_game(keyword):
+    assert game_of(keyword) in GAMES
+
+
+@pytest.mark.parametrize("text, game", [("四星彩", "4星彩"), ("三星彩", "3星彩"), ("今天威力彩", "威力彩")])
+def test_game_aliases(text, game):
+    assert game_of(text) == game
+
+
+@pytest.fixture
+def fake_history(tmp_path, monkeypatch):
+    """假的大樂透開獎資料：2024-03 起每月 8 期"""
+    from my_commands import lottery_stats
+    calls = []
+
+    def crawl(game, year, month):
+        calls.append((year, month))
+        if (year, month) < (2024, 3):
+            return []
+        return [{"期別": f"{year}{month:02d}{i}", "開獎日期": f"{year}-{month:02d}-{i + 1:02d}T00:00:00",
+                 "獎號": [1, 2, 3, 4, 5, 6], "特別號": 7} for i in range(8)]
+
+    monkeypatch.setattr(lottery_stats, "_crawl", crawl)
+    monkeypatch.setattr(lottery_stats, "archive", lottery_stats.MonthArchive(str(tmp_path)))
+    monkeypatch.setattr(lottery_stats, "draw_cache", lottery_stats.TTLCache(maxsize=len(GAMES)))
+    return calls
+
+
+def test_full_history_stops_at_first_draw_and_is_archived(fake_history):
+    import datetime as dt
+    from my_commands import lottery_stats
+    now = dt.datetime(2026, 10, 18, 12, 0, tzinfo=lottery_stats.TZ)
+    records = lottery_stats.draw_history("大樂透", months=0, now=now)
+    assert len(records) == 32 * 8
+    assert records[0]["開獎日期"].startswith("2024-03-01")
+    # 以年為單位往回查，找到連續沒有資料的月份後停止，不會一路查到 HISTORY_START
+    assert min(fake_history) >= (2023, 1)
+
+    # 過去月份已存到磁碟，重新載入後不必再下載
+    fake_history.clear()
+    lottery_stats.archive = lottery_stats.MonthArchive(lottery_stats.archive.directory)
+    assert len(lottery_stats.draw_history("大樂透", months=0, now=now)) == 32 * 8
+    assert fake_history == []
+
+
+def test_history_months_limit(fake_history):
+    import datetime as dt
+    from my_commands import lottery_stats
+    now = dt.datetime(2026, 10, 18, 12, 0, tzinfo=lottery_stats.TZ)
+    records = lottery_stats.draw_history("大樂透", months=3, now=now)
+    assert sorted(fake_history) == [(2026, 8), (2026, 9), (2026, 10)]
+    assert len(records) == 24
@@ -0,0 +1,28 @@
+import datetime as dt
+
+from my_commands.stock import market_calendar
+from my_commands.stock.market_calendar import MARKETS, UNKNOWN_CALENDAR_TTL, trading_session
+
+TW = MARKETS["TW"]["tz"]
+
+
+def test_known_year_caches_until_next_open():
+    # 2026-02-13（五）收盤後，農曆年休市到 2026-02-23（一）
+    now = dt.datetime(2026, 2, 13, 14, 0, tzinfo=TW)
+    key, ttl = trading_session("2330", now)
+    assert key == "TW:2026-02-13:close"
+    assert ttl == int((dt.datetime(2026, 2, 23, 9, 0, tzinfo=TW) - now).total_seconds())
+
+
+def test_year_without_full_holiday_list_uses_short_ttl(monkeypatch):
+    monkeypatch.setattr(market_calendar, "HOLIDAY_YEARS", {"TW": {2026}, "US": {2026}})
+    now = dt.datetime(2027, 2, 5, 14, 0, tzinfo=TW)
+    _, ttl = trading_session("2330", now)
+    assert ttl == UNKNOWN_CALENDAR_TTL
+
+
+def test_year_end_close_uses_short_ttl_when_next_year_is_unknown(monkeypatch):
+    monkeypatch.setattr(market_calendar, "HOLIDAY_YEARS", {"TW": {2026}, "US": {2026}})
+    now = dt.datetime(2026, 12, 31, 14, 0, tzinfo=TW)
+    _, ttl = trading_session("2330", now)
+    assert ttl == UNKNOWN_CALENDAR_TTL
@@ -0,0 +1,69 @@
+import pytest
+
+from my_commands import partjob_gpt
+
+
+@pytest.fixture
+def pages(monkeypatch):
+    """假的搜尋結果：每頁 3 筆，共 total 筆"""
+    calls = []
+
+    def install(total, page_size=3):
+        def fetch_page(self, keyword, page):
+            calls.append(page)
+            start = (page - 1) * page_size
+            return [{"id": i} for i in range(start, min(start + page_size, total))]
+        monkeypatch.setattr(partjob_gpt.PartJobSpider, "fetch_page", fetch_page)
+        partjob_gpt.search_cache.clear()
+        return calls
+
+    return install
+
+
+def test_short_result_is_served_from_cache(pages):
+    calls = pages(total=4)
+    spider = partjob_gpt.PartJobSpider()
+    assert spider.search("桃園", max_num=10)[0] == 4
+    fetched = list(calls)
+    assert spider.search("桃園", max_num=10)[0] == 4
+    assert calls == fetched
+
+
+def test_larger_request_refetches_when_not_exhausted(pages):
+    calls = pages(total=30)
+    spider = partjob_gpt.PartJobSpider()
+    assert spider.search("桃園", max_num=3)[0] == 3
+    total, jobs = spider.search("桃園", max_num=9)
+    assert len(jobs) == 9
+    assert calls == [1, 1, 2, 3]
+
+
+def test_failed_page_is_not_cached(pages, monkeypatch):
+    calls = pages(total=30)
+    fetch_page = partjob_gpt.PartJobSpider.fetch_page
+
+    def flaky(self, keyword, page):
+        if page == 2 and calls.count(2) == 0:
+            calls.append(page)
+            raise ConnectionError("page 2 timed out")
+        return fetch_page(self, keyword, page)
+
+    monkeypatch.setattr(partjob_gpt.PartJobSpider, "fetch_page", flaky)
+    spider = partjob_gpt.PartJobSpider()
+    assert spider.search("桃園", max_num=9)[0] == 3
+    assert partjob_gpt.search_cache.get("桃園") is None
+    assert spider.search("桃園", max_num=9)[0] == 9
+
+
+def test_error_page_raises(monkeypatch):
+    import io
+
+    import requests
+    response = requests.Response()
+    response.status_code = 503
+    response.reason = "Service Unavailable"
+    response.url = "https://worknowapp.com/regions/"
+    response.raw = io.BytesIO("<html>維護中</html>".encode("utf-8"))
+    monkeypatch.setattr(partjob_gpt.http, "get", lambda url, **kwargs: response)
+    with pytest.raises(requests.HTTPError):
+        partjob_gpt.PartJobSpider().fetch_page("桃園", 1)
@@ -0,0 +1,54 @@
+import time
+
+from my_commands.command_router import Route
+from my_commands.prefetch import Prefetcher, _key
+from my_commands.rate_limiter import TokenBucketLimiter
+
+
+def _prefetcher(**kwargs):
+    return Prefetcher({"gold": lambda: "金價", "crypto": lambda coin: coin}, promote_hits=2, **kwargs)
+
+
+def test_promoted_keys_expire_but_pinned_keys_stay():
+    prefetcher = _prefetcher(key_idle=60)
+    pinned, promoted = Route("gold", ()), Route("crypto", ("dogecoin",))
+    prefetcher.register(pinned)
+    prefetcher.observe(promoted)
+    prefetcher.observe(promoted)
+    assert set(prefetcher._keys) == {_key(pinned), _key(promoted)}
+
+    # 超過 key_idle 沒有人查詢
+    for key in prefetcher._last_seen:
+        prefetcher._last_seen[key] = time.monotonic() - 61
+    with prefetcher._cond:
+        assert prefetcher._expire(_key(promoted)) is True
+        assert prefetcher._expire(_key(pinned)) is False
+    assert set(prefetcher._keys) == {_key(pinned)}
+    assert prefetcher.lookup(promoted) is None
+
+
+def test_queries_keep_promoted_keys_alive():
+    prefetcher = _prefetcher(key_idle=60)
+    route = Route("crypto", ("dogecoin",))
+    prefetcher.observe(route)
+    prefetcher.observe(route)
+    prefetcher._last_seen[_key(route)] = time.monotonic() - 61
+    prefetcher.observe(route)
+    with prefetcher._cond:
+        assert prefetcher._expire(_key(route)) is False
+
+
+def test_background_reservations_are_capped():
+    limiter = TokenBucketLimiter(limits={"m": {"rpm": 30, "tpm": 6000}}, path="", safety=1.0, background_share=0.3)
+    # 一次背景請求可以透支背景額度，但透支期間不再放行
+    assert limiter.reserve_background("m", 4000) is True
+    assert limiter.reserve_background("m", 100) is False
+    # 使用者請求不受背景額度影響
+    assert limiter.reserve("m", 1000) == 0
+    assert limiter.stats()["background_denied"] == 1
+
+
+def test_background_waits_for_user_quota():
+    limiter = TokenBucketLimiter(limits={"m": {"rpm": 30, "tpm": 6000}}, path="", safety=1.0)
+    limiter.reserve("m", 5900)
+    assert limiter.reserve_background("m", 500) is False
@@ -0,0 +1,40 @@
+import pandas as pd
+import pytest
+
+from my_commands.price_store import PriceSeries
+
+
+def _series(values, start="2026-10-01"):
+    return pd.Series(values, index=pd.date_range(start, periods=len(values), freq="D"))
+
+
+@pytest.fixture
+def store(tmp_path):
+    return PriceSeries("gold", fetcher=None, directory=str(tmp_path))
+
+
+def test_append_adds_only_newer_days(store):
+    assert store.append(_series([1.0, 2.0, 3.0])) == 3
+    assert store.append(_series([2.0, 3.0, 4.0], start="2026-10-02")) == 1
+    assert store.series(refresh=False).tolist() == [1.0, 2.0, 3.0, 4.0]
+
+
+def test_append_rewrites_todays_row(store):
+    store.append(_series([1.0, 2.0, 3.0]))
+    records = store.records()
+    # 銀行盤中更新：同一天的新價格覆寫最後一筆
+    assert store.append(_series([3.5], start="2026-10-03")) == 1
+    assert store.series(refresh=False).tolist() == [1.0, 2.0, 3.5]
+    assert records['value'][-1] == 3.5
+    assert store.append(_series([3.5], start="2026-10-03")) == 0
+
+
+def test_name_must_be_safe_for_file_names(tmp_path):
+    with pytest.raises(ValueError):
+        PriceSeries("../etc/passwd", fetcher=None, directory=str(tmp_path))
+
+
+def test_crypto_store_rejects_invalid_coin_id():
+    from my_commands.crypto_coin_gpt import price_store
+    with pytest.raises(ValueError):
+        price_store("bitcoin/../../x")
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from my_commands.stock import stock_compare
+from my_commands.stock.exchange_resolver import ExchangeResolver
+
+INDEX = pd.date_range("2026-07-01", periods=60, freq="B")
+
+
+def _fake_download(available):
+    """假的 yf.download：只回傳 available 中的代碼，價格為線性上漲"""
+    def download(symbols, start, end, **kwargs):
+        symbols = [s for s in symbols if s in available]
+        if not symbols:
+            return pd.DataFrame()
+        columns = pd.MultiIndex.from_product([["Close", "High", "Low"], symbols])
+        base = np.linspace(100, 130, len(INDEX))
+        data = np.column_stack([base * (1 + 0.01 * (field != "Close")) for field, _ in columns])
+        return pd.DataFrame(data, index=INDEX, columns=columns)
+    return download
+
+
+@pytest.fixture
+def resolver(tmp_path, monkeypatch):
+    resolver = ExchangeResolver(path=str(tmp_path / "exchange_suffix.json"))
+    monkeypatch.setattr(stock_compare, "resolver", resolver)
+    return resolver
+
+
+def test_compare_table():
+    close = pd.DataFrame({"A": np.linspace(100, 110, 30), "B": np.linspace(50, 40, 30)})
+    high, low = close * 1.01, close * 0.99
+    table, corr = stock_compare.compare_table(close, high, low)
+    assert table.loc["A", "收盤價"] == 110
+    assert table.loc["A", f"{stock_compare.COMPARE_DAYS}天報酬%"] == 10
+    assert table.loc["B", "最大回撤%"] == -20
+    assert list(corr.columns) == ["A", "B"] and corr.loc["A", "A"] == 1
+
+
+def test_otc_code_is_retried_with_two_suffix(resolver, monkeypatch):
+    monkeypatch.setattr(stock_compare.yf, "download", _fake_download({"2330.TW", "6488.TWO"}))
+    close, high, low = stock_compare.fetch_prices(["2330", "6488"])
+    assert list(close.columns) == ["2330", "6488"]
+    assert resolver.candidates("6488")[0] == "6488.TWO"
+
+
+def test_partial_result_is_cached_briefly(resolver, monkeypatch):
+    monkeypatch.setattr(stock_compare.yf, "download", _fake_download({"2330.TW"}))
+    monkeypatch.setattr(stock_compare, "get_reply", lambda messages, profile: "比較報告")
+    monkeypatch.setattr(stock_compare, "trading_session", lambda stock_id: ("TW:close", 100000))
+    cached = {}
+    monkeypatch.setattr(stock_compare.compare_cache, "set", lambda key, value, ttl: cached.update({key: ttl}))
+    content, missing = stock_compare.generate_content_msg(["2330", "9999"])
+    assert missing == ["9999"] and "9999" in content
+    assert stock_compare.stock_compare(["2330", "9999"]) == "比較報告"
+    assert list(cached.values()) == [stock_compare.PARTIAL_REPORT_TTL]
+
+
+def test_mixed_markets_use_shortest_session(resolver, monkeypatch):
+    monkeypatch.setattr(stock_compare.yf, "download", _fake_download({"2330.TW", "AAPL"}))
+    monkeypatch.setattr(stock_compare, "get_reply", lambda messages, profile: "比較報告")
+    sessions = {"2330": ("TW:2026-10-16:close", 60000), "AAPL": ("US:2026-10-16:open", 300)}
+    monkeypatch.setattr(stock_compare, "trading_session", lambda stock_id: sessions[stock_id])
+    cached = {}
+    monkeypatch.setattr(stock_compare.compare_cache, "set", lambda key, value, ttl: cached.update({key: ttl}))
+    stock_compare.stock_compare(["2330", "AAPL"])
+    [(key, ttl)] = cached.items()
+    assert ttl == 300
+    assert key[1] == ("TW:2026-10-16:close", "US:2026-10-16:open")
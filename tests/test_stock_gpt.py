@@ -0,0 +1,36 @@
+import pytest
+
+from my_commands.stock import stock_gpt
+
+
+@pytest.fixture
+def sources(monkeypatch):
+    monkeypatch.setattr(stock_gpt, "stock_price", lambda stock_id: "收盤價 100")
+    monkeypatch.setattr(stock_gpt, "stock_news", lambda name: [["AAPL", "2026-10-16", "標題", "內文"]])
+    monkeypatch.setattr(stock_gpt, "stock_fundamental", lambda stock_id: "營收成長")
+    monkeypatch.setattr(stock_gpt, "stock_dividend", lambda stock_id: "配息 1 元")
+    monkeypatch.setattr(stock_gpt, "get_reply", lambda messages, profile: "分析報告")
+    monkeypatch.setattr(stock_gpt, "trading_session", lambda symbol: ("US:2026-10-16:close", 200000))
+    cached = {}
+    monkeypatch.setattr(stock_gpt.report_cache, "set", lambda key, value, ttl: cached.update({key: ttl}))
+    monkeypatch.setattr(stock_gpt.report_cache, "get", lambda key: None)
+    return cached
+
+
+def test_complete_report_uses_session_ttl(sources):
+    assert stock_gpt.stock_gpt("AAPL") == "分析報告"
+    assert list(sources.values()) == [200000]
+
+
+def test_source_error_string_counts_as_missing(sources, monkeypatch):
+    monkeypatch.setattr(stock_gpt, "stock_price", lambda stock_id: "無法下載股票資料: HTTP 404")
+    stock_gpt.stock_gpt("AAPL")
+    assert list(sources.values()) == [stock_gpt.PARTIAL_REPORT_TTL]
+
+
+def test_failed_source_counts_as_missing(sources, monkeypatch):
+    def broken(name):
+        raise RuntimeError("timeout")
+    monkeypatch.setattr(stock_gpt, "stock_news", broken)
+    stock_gpt.stock_gpt("AAPL")
+    assert list(sources.values()) == [stock_gpt.PARTIAL_REPORT_TTL]
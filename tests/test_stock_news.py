@@ -0,0 +1,41 @@
+import pytest
+import requests
+
+from my_commands.stock import stock_news
+
+
+class _Response:
+    def __init__(self, status_code, content):
+        self.status_code = status_code
+        self.content = content.encode("utf-8")
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error")
+
+
+ARTICLE = "".join(f"<p>雜訊{i}</p>" for i in range(4)) + "<p>台積電營收創新高</p>"
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    stock_news.article_cache.clear()
+
+
+@pytest.mark.parametrize("status", [403, 404, 503])
+def test_error_page_is_not_cached(monkeypatch, status):
+    monkeypatch.setattr(stock_news.http, "get", lambda url, **kwargs: _Response(status, ARTICLE))
+    assert stock_news.fetch_article(1) == ""
+    assert stock_news.article_cache.get(1) is None
+
+
+def test_article_is_cached(monkeypatch):
+    monkeypatch.setattr(stock_news.http, "get", lambda url, **kwargs: _Response(200, ARTICLE))
+    assert stock_news.fetch_article(2) == "台積電營收創新高"
+    assert stock_news.article_cache.get(2) == "台積電營收創新高"
+
+
+def test_empty_article_is_not_cached(monkeypatch):
+    monkeypatch.setattr(stock_news.http, "get", lambda url, **kwargs: _Response(200, "<p>a</p>"))
+    assert stock_news.fetch_article(3) == ""
+    assert stock_news.article_cache.get(3) is None